@@ -1,15 +1,45 @@
-from backauth.auth.model.token import TokenOrm
-from backauth.auth.router import login_router, oauth_router
-from backauth.auth.service.token_service import TokenService
-from backauth.config.setting import Config
-from backauth.user.model import UserOrm, ScopeOrm, UserScopeOrm
-from backauth.user.router import users_router
-from backauth.user.service import UserService
-from backauth.user.schema import (
-    UserRegisterSchema,
-    UserUpdateSchema,
-    UserResponseSchema,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from backauth.auth.middleware import AuthenticationMiddleware
+    from backauth.auth.model.token import TokenOrm
+    from backauth.auth.revocation import RevocationClient, RevocationSet
+    from backauth.auth.router import login_router, oauth_router, revocation_router
+    from backauth.auth.service.token_service import TokenService
+    from backauth.config.setting import Config
+    from backauth.health import health_router
+    from backauth.user.model import UserOrm, ScopeOrm, UserScopeOrm
+    from backauth.user.router import users_router
+    from backauth.user.service import UserService
+    from backauth.user.schema import (
+        UserRegisterSchema,
+        UserUpdateSchema,
+        UserResponseSchema,
+    )
+
+# Public names are imported on first access so that e.g. importing the
+# models does not pull in FastAPI, httpx, Redis and the JWT library.
+_modules = {
+    "UserOrm": "backauth.user.model",
+    "TokenOrm": "backauth.auth.model.token",
+    "UserService": "backauth.user.service",
+    "login_router": "backauth.auth.router",
+    "users_router": "backauth.user.router",
+    "UserScopeOrm": "backauth.user.model",
+    "oauth_router": "backauth.auth.router",
+    "ScopeOrm": "backauth.user.model",
+    "Config": "backauth.config.setting",
+    "UserRegisterSchema": "backauth.user.schema",
+    "UserUpdateSchema": "backauth.user.schema",
+    "UserResponseSchema": "backauth.user.schema",
+    "TokenService": "backauth.auth.service.token_service",
+    "health_router": "backauth.health",
+    "revocation_router": "backauth.auth.router",
+    "RevocationClient": "backauth.auth.revocation",
+    "RevocationSet": "backauth.auth.revocation",
+    "AuthenticationMiddleware": "backauth.auth.middleware",
+}
 
 __all__ = (
     "UserOrm",
@@ -25,4 +55,21 @@ __all__ = (
     "UserUpdateSchema",
     "UserResponseSchema",
     "TokenService",
+    "health_router",
+    "revocation_router",
+    "RevocationClient",
+    "RevocationSet",
+    "AuthenticationMiddleware",
 )
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_modules[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted((*globals(), *__all__))
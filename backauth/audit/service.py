@@ -0,0 +1,171 @@
+import asyncio
+import json
+from datetime import datetime, UTC
+from typing import Any, Protocol, Type
+from uuid import UUID, uuid4
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backauth.audit.model import AuditEventOrm
+from backauth.config.setting import AuditSettings
+
+LOGIN = "login"
+LOGIN_FAILED = "login_failed"
+REFRESH = "refresh"
+REVOKE = "revoke"
+OAUTH_SIGNUP = "oauth_signup"
+SESSION_EVICTED = "session_evicted"
+
+# Queued by ``AuditLog.close`` to make the writer stop after the events before it.
+_STOP: dict[str, Any] = {}
+
+
+class AuditSink(Protocol):
+    async def write(self, events: list[dict[str, Any]]) -> None: ...
+
+
+class SqlAuditSink:
+    """Writes each batch with one multi-row INSERT in its own session."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        model: Type[AuditEventOrm],
+    ):
+        self.session_factory = session_factory
+        self.model = model
+
+    async def write(self, events: list[dict[str, Any]]) -> None:
+        async with self.session_factory() as session:
+            await session.execute(insert(self.model), events)
+            await session.commit()
+
+
+class FileAuditSink:
+    """Appends each batch to an NDJSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, lines: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def write(self, events: list[dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        await asyncio.to_thread(self._append, lines)
+
+
+class AuditLog:
+    """Write-behind audit log.
+
+    ``emit`` only puts the event on a bounded queue; a background task
+    writes batches to the sink once ``batch_size`` events are collected or
+    ``flush_interval_seconds`` passed since the first one. When the queue is
+    full the ``drop_policy`` decides between dropping the new event,
+    dropping the oldest one or making the caller wait.
+
+    Used as an async context manager (e.g. in the app lifespan) it becomes
+    the process-wide log used by ``emit`` and flushes everything on exit.
+    """
+
+    def __init__(self, sink: AuditSink, settings: AuditSettings):
+        self.sink = sink
+        self.settings = settings
+        self.dropped = 0
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(settings.queue_size)
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "AuditLog":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        global _audit_log
+        self._task = asyncio.create_task(self._run())
+        _audit_log = self
+
+    async def close(self) -> None:
+        global _audit_log
+        if _audit_log is self:
+            _audit_log = None
+        if self._task is not None:
+            # The writer drains everything queued before the stop marker and
+            # finishes its current write, nothing is cancelled mid-batch.
+            if not self._task.done():
+                await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+        batch = []
+        while not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not _STOP:
+                batch.append(record)
+        for i in range(0, len(batch), self.settings.batch_size):
+            await self._write(batch[i : i + self.settings.batch_size])
+
+    async def emit(
+        self, event: str, subject: UUID | str | None = None, **data: Any
+    ) -> None:
+        record = {
+            "id": uuid4(),
+            "event": event,
+            "subject": UUID(str(subject)) if subject is not None else None,
+            "created_at": datetime.now(UTC),
+            "data": data or None,
+        }
+        if self.settings.drop_policy == "block":
+            await self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.settings.drop_policy == "drop_oldest":
+                self._queue.get_nowait()
+                self._queue.put_nowait(record)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = loop.time() + self.settings.flush_interval_seconds
+            while len(batch) < self.settings.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write(batch)
+
+    async def _write(self, batch: list[dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            await self.sink.write(batch)
+        except Exception:
+            logger.exception("Failed to write {} audit events", len(batch))
+
+
+_audit_log: AuditLog | None = None
+
+
+async def emit(event: str, subject: UUID | str | None = None, **data: Any) -> None:
+    """Records an event on the running audit log, does nothing without one."""
+    if _audit_log is not None:
+        await _audit_log.emit(event, subject, **data)
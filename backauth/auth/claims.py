@@ -0,0 +1,63 @@
+from typing import Literal
+
+ClaimProfile = Literal["minimal", "standard", "full"]
+
+SHORT_CLAIMS = {
+    "user_id": "uid",
+    "scopes": "scp",
+    "email": "em",
+    "username": "un",
+    "first_name": "fn",
+    "last_name": "ln",
+}
+LONG_CLAIMS = {short: name for name, short in SHORT_CLAIMS.items()}
+
+PROFILE_FIELDS: dict[str, tuple[str, ...]] = {
+    "minimal": ("user_id", "scopes"),
+    "standard": ("user_id", "scopes", "email", "username"),
+}
+
+
+def compact_claims(payload: dict, profile: ClaimProfile) -> dict:
+    """Keeps the fields of ``profile`` under their short names.
+
+    The ``full`` profile keeps the payload as it is, including the fields
+    added by ``extend_payload``. Empty fields are left out.
+    """
+    if profile == "full":
+        return payload.copy()
+    return {
+        SHORT_CLAIMS[field]: payload[field]
+        for field in PROFILE_FIELDS[profile]
+        if payload.get(field) not in (None, [])
+    }
+
+
+def expand_claims(claims: dict) -> dict:
+    """Restores the long names of a compacted token, a no-op for full ones."""
+    if "uid" not in claims:
+        return claims
+    expanded = {LONG_CLAIMS.get(name, name): value for name, value in claims.items()}
+    expanded.setdefault("scopes", [])
+    return expanded
+
+
+def issued_at_ms(claims: dict) -> int:
+    """Returns the issue time of a token in milliseconds.
+
+    Tokens issued in watermark mode carry ``iat_ms``; for any other the
+    start of the ``iat`` second is assumed, so a revocation within that
+    second still covers them.
+    """
+    if "iat_ms" in claims:
+        return int(claims["iat_ms"])
+    return int(claims.get("iat", 0)) * 1000
+
+
+def check_size(token: str, max_bytes: int | None) -> str:
+    if max_bytes and len(token) > max_bytes:
+        raise ValueError(
+            f"Access token is {len(token)} bytes, over the budget of {max_bytes}"
+        )
+    return token
+
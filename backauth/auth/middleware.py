@@ -0,0 +1,97 @@
+import json
+import re
+from typing import Iterable
+
+from backauth.asgi import ASGIApp, Receive, Scope, Send
+from backauth.auth.model.token import TokenOrm
+from backauth.auth.service.token_service import TokenService
+from backauth.config.setting import Config
+
+_UNAUTHORIZED = json.dumps({"detail": "Not authenticated"}).encode()
+
+
+def compile_prefixes(prefixes: Iterable[str]) -> re.Pattern[str] | None:
+    """Compiles path prefixes into one pattern matching any of them.
+
+    A prefix matches whole path segments only, so ``/auth`` matches
+    ``/auth`` and ``/auth/login`` but not ``/authors``.
+    """
+    alternatives = sorted({re.escape(prefix.rstrip("/")) for prefix in prefixes})
+    if not alternatives:
+        return None
+    return re.compile(f"(?:{'|'.join(alternatives)})(?:/|$)")
+
+
+class AuthenticationMiddleware:
+    """Authenticates every request once, before it reaches the application.
+
+    The bearer token of the ``Authorization`` header is checked with
+    ``TokenService.authenticate``, so signature, expiry, blacklist and
+    watermarks are handled exactly like in the routers. The claims of a
+    valid token are stored in ``scope["auth"]``, where Starlette exposes
+    them as ``request.auth``; any other request gets a 401 JSON response
+    (websockets are closed with 1008). Paths starting with one of
+    ``exclude`` are passed through untouched, as are lifespan events.
+
+    Works with any ASGI application, FastAPI and Starlette included.
+    Verification never touches the database, so the token service is
+    built without a session.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        configuration: Config,
+        exclude: Iterable[str] = (),
+        token_service: TokenService | None = None,
+    ):
+        self.app = app
+        self.token_service = token_service or TokenService(
+            None, TokenOrm, configuration  # type: ignore[arg-type]
+        )
+        self._exclude = compile_prefixes(exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket") or (
+            self._exclude is not None and self._exclude.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        claims = None
+        token = self._get_token(scope)
+        if token is not None:
+            claims = await self.token_service.authenticate(token)
+        if claims is None:
+            await self._reject(scope, send)
+            return
+        scope["auth"] = claims
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _get_token(scope: Scope) -> str | None:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    return token.strip()
+                return None
+        return None
+
+    @staticmethod
+    async def _reject(scope: Scope, send: Send) -> None:
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_UNAUTHORIZED)).encode()),
+                    (b"www-authenticate", b"Bearer"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": _UNAUTHORIZED})
+
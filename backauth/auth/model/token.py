@@ -1,15 +1,17 @@
 from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 
 class TokenOrm:
     __tablename__="tokens"
+    __table_args__ = (Index("ix_tokens_subject_issued_at", "subject", "issued_at"),)
 
     id: Mapped[UUID] = mapped_column(primary_key=True)
-    subject: Mapped[UUID] = mapped_column(index=True)
-    refresh_token: Mapped[str] = mapped_column( nullable=False)
+    subject: Mapped[UUID] = mapped_column()
+    refresh_token: Mapped[str] = mapped_column( nullable=False, index=True)
     expires_at: Mapped[int] = mapped_column( nullable=False)
     issued_at: Mapped[int] = mapped_column( default=lambda: int(datetime.now().timestamp()))
     is_blocked_access: Mapped[bool] = mapped_column(default=False)
@@ -0,0 +1,148 @@
+import asyncio
+from typing import Any, Sequence
+from uuid import UUID
+
+from backauth.config.redis import RedisRouter, tag
+
+# KEYS[1] - family hash, ARGV[1] - presented generation, ARGV[2] - new jti.
+# Returns {new generation}, {-1} when the family is revoked, {0} when it is
+# unknown and {-1, jti} when an old generation was replayed: the family gets
+# revoked and the jti of its current access token is handed back to be
+# blacklisted.
+_ROTATE_SCRIPT = """
+local gen = redis.call('HGET', KEYS[1], 'gen')
+if not gen then
+    return {0}
+end
+if redis.call('HGET', KEYS[1], 'revoked') == '1' then
+    return {-1}
+end
+if tonumber(gen) ~= tonumber(ARGV[1]) then
+    redis.call('HSET', KEYS[1], 'revoked', '1')
+    return {-1, redis.call('HGET', KEYS[1], 'jti')}
+end
+local new_gen = tonumber(gen) + 1
+redis.call('HSET', KEYS[1], 'gen', new_gen, 'jti', ARGV[2])
+return {new_gen}
+"""
+
+# KEYS[1] - family set of a subject, ARGV[1] - family key prefix. Flags every
+# family that has not expired yet as revoked, drops the set and returns the
+# jti of the last access token of each revoked family.
+_REVOKE_SCRIPT = """
+local jtis = {}
+for _, family in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local key = ARGV[1] .. family
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('HSET', key, 'revoked', '1')
+        table.insert(jtis, redis.call('HGET', key, 'jti'))
+    end
+end
+redis.call('DEL', KEYS[1])
+return jtis
+"""
+
+
+class RefreshFamilyRepository:
+    """Keeps the per-family state of stateless refresh tokens in Redis.
+
+    A family is created on login and lives as long as its first refresh
+    token. Only the current generation, the jti of the last access token
+    and a revocation flag are stored, the token itself is never persisted.
+    All keys of a subject share its hash tag and live on the same node.
+    """
+
+    redis: RedisRouter
+
+    def __init__(self, redis: RedisRouter):
+        self.redis = redis
+        self._rotate = redis.register_script(_ROTATE_SCRIPT)
+        self._revoke = redis.register_script(_REVOKE_SCRIPT)
+
+    @staticmethod
+    def _family_key(subject: UUID | str, family: UUID | str = "") -> str:
+        return f"refresh_family:{tag(subject)}:{family}"
+
+    @staticmethod
+    def _subject_key(subject: UUID | str) -> str:
+        return f"refresh_families:{tag(subject)}"
+
+    def _queue_create(
+        self, pipe: Any, family: UUID, subject: UUID | str, jti: UUID, ttl: int
+    ) -> None:
+        pipe.hset(
+            self._family_key(subject, family),
+            mapping={"sub": str(subject), "gen": 0, "jti": str(jti)},
+        )
+        pipe.expire(self._family_key(subject, family), ttl)
+        pipe.sadd(self._subject_key(subject), str(family))
+        pipe.expire(self._subject_key(subject), ttl)
+
+    async def create(
+        self, family: UUID, subject: UUID | str, jti: UUID, ttl: int
+    ) -> None:
+        redis = self.redis.for_key(self._subject_key(subject))
+        async with redis.pipeline(transaction=True) as pipe:
+            self._queue_create(pipe, family, subject, jti, ttl)
+            await pipe.execute()
+
+    async def create_many(
+        self, families: Sequence[tuple[UUID, UUID | str, UUID]], ttl: int
+    ) -> None:
+        """Creates ``(family, subject, jti)`` families with one pipeline per node.
+
+        Unlike ``create`` the writes of a family are not a transaction: the
+        families of many subjects span several slots.
+        """
+        by_node: dict[int, list[tuple[UUID, UUID | str, UUID]]] = {}
+        for item in families:
+            index = self.redis.index(self._subject_key(item[1]))
+            by_node.setdefault(index, []).append(item)
+
+        async def create_on_node(
+            index: int, items: list[tuple[UUID, UUID | str, UUID]]
+        ) -> None:
+            async with self.redis.clients[index].pipeline(transaction=False) as pipe:
+                for family, subject, jti in items:
+                    self._queue_create(pipe, family, subject, jti, ttl)
+                await pipe.execute()
+
+        await asyncio.gather(
+            *(create_on_node(index, items) for index, items in by_node.items())
+        )
+
+    async def rotate(
+        self, subject: UUID | str, family: UUID | str, generation: int, jti: UUID
+    ) -> tuple[int, str | None]:
+        """Advances the family to the next generation.
+
+        Returns the new generation, or a value ``<= 0`` together with the
+        jti of the family's last access token when a replay revoked it.
+        """
+        result = await self._rotate(
+            keys=[self._family_key(subject, family)], args=[generation, str(jti)]
+        )
+        replayed = result[1] if len(result) > 1 and result[1] else None
+        if isinstance(replayed, bytes):
+            replayed = replayed.decode()
+        return int(result[0]), replayed
+
+    async def get_jti_by_sub(self, subject: UUID | str) -> list[str]:
+        redis = self.redis.for_key(self._subject_key(subject))
+        families = await redis.smembers(self._subject_key(subject))  # type: ignore[misc]
+        if not families:
+            return []
+        async with redis.pipeline(transaction=False) as pipe:
+            for family in families:
+                pipe.hget(self._family_key(subject, family.decode()), "jti")
+            jtis = await pipe.execute()
+        expired = [family for family, jti in zip(families, jtis) if jti is None]
+        if expired:
+            await redis.srem(self._subject_key(subject), *expired)  # type: ignore[misc]
+        return [jti.decode() for jti in jtis if jti is not None]
+
+    async def revoke_by_sub(self, subject: UUID | str) -> list[str]:
+        jtis = await self._revoke(
+            keys=[self._subject_key(subject)], args=[self._family_key(subject)]
+        )
+        return [jti.decode() for jti in jtis]
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Type
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backauth.auth.model.token import TokenOrm
+
+
+class GroupCommitWriter:
+    """Batches token inserts of concurrent requests into one transaction.
+
+    ``submit`` queues a row and waits until the transaction holding it is
+    committed. A batch is written ``max_delay_ms`` after its first row or as
+    soon as ``max_batch`` rows are waiting, whichever comes first. All rows
+    of a batch share its outcome: if the INSERT fails, every caller of that
+    batch gets the error.
+
+    Used as an async context manager (e.g. in the app lifespan) it becomes
+    the writer ``TokenRepository.create`` hands its inserts to.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        model: Type[TokenOrm],
+        max_delay_ms: float = 2.0,
+        max_batch: int = 500,
+    ):
+        self.session_factory = session_factory
+        self.model = model
+        self.max_delay_ms = max_delay_ms
+        self.max_batch = max_batch
+        self._pending: list[tuple[dict[str, Any], asyncio.Future[None]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "GroupCommitWriter":
+        global _writer
+        _writer = self
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        global _writer
+        if _writer is self:
+            _writer = None
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, row: dict[str, Any]) -> None:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[None] = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay_ms / 1000, self._flush)
+        await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._write(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: list[tuple[dict[str, Any], asyncio.Future[None]]]):
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(self.model), [row for row, _ in batch])
+                await session.commit()
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+
+_writer: GroupCommitWriter | None = None
+
+
+def get_writer() -> GroupCommitWriter | None:
+    return _writer
@@ -0,0 +1,450 @@
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, Type
+from uuid import UUID
+
+from backauth.auth.model.token import TokenOrm
+from backauth.auth.repository.tokenstore import random_token
+from backauth.config.redis import RedisRouter, RoutedScript, tag
+from backauth.tracing import traced
+
+# Shared by the scripts touching every session of a subject. The caller lists
+# the sessions it found: ARGV[n] is their count, followed by their ids, and
+# the session and refresh keys of the i-th id are KEYS[base + 2i - 1] and
+# KEYS[base + 2i]. Returns the key index of each id in ``ids``, or nil when
+# one of them was not listed because it was created after the caller looked.
+_KNOWN_SESSIONS = """
+local function known_sessions(ids, base, n)
+    local index = {}
+    for i = 1, tonumber(ARGV[n]) do
+        index[ARGV[n + i]] = base + 2 * i - 1
+    end
+    for _, id in ipairs(ids) do
+        if not index[id] then
+            return nil
+        end
+    end
+    return index
+end
+"""
+
+# KEYS: session hash, subject zset, refresh key, then the known sessions.
+# ARGV: id, subject, digest, expires_at, issued_at, now, number of sessions
+# to keep (-1 keeps all), then the known sessions. Evicts the oldest sessions
+# before adding the new one and returns the ids of the evicted sessions,
+# oldest first, or false when the known sessions are stale.
+_CREATE_SCRIPT = (
+    _KNOWN_SESSIONS
+    + """
+local evicted = {}
+local keep = tonumber(ARGV[7])
+if keep >= 0 then
+    local ids = redis.call('ZRANGE', KEYS[2], 0, -(keep + 1))
+    local index = known_sessions(ids, 3, 8)
+    if not index then
+        return false
+    end
+    for _, id in ipairs(ids) do
+        local key = KEYS[index[id]]
+        if redis.call('HEXISTS', key, 'digest') == 1 then
+            table.insert(evicted, id)
+            redis.call('DEL', KEYS[index[id] + 1])
+        end
+        redis.call('DEL', key)
+        redis.call('ZREM', KEYS[2], id)
+    end
+end
+redis.call('HSET', KEYS[1], 'subject', ARGV[2], 'digest', ARGV[3],
+    'expires_at', ARGV[4], 'issued_at', ARGV[5],
+    'is_blocked_access', '0', 'is_full_block', '0')
+redis.call('EXPIREAT', KEYS[1], ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+local ttl = redis.call('TTL', KEYS[2])
+if ttl < 0 or tonumber(ARGV[6]) + ttl < tonumber(ARGV[4]) then
+    redis.call('EXPIREAT', KEYS[2], ARGV[4])
+end
+redis.call('SET', KEYS[3], ARGV[1], 'EXAT', ARGV[4])
+return evicted
+"""
+)
+
+# KEYS: refresh key, subject zset, session hash. ARGV: session id the refresh
+# key pointed to. Consumes the refresh token and returns the session id and
+# fields, nil if the token is unknown, was consumed meanwhile or its session
+# was fully blocked.
+_POP_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return nil
+end
+redis.call('DEL', KEYS[1])
+local fields = redis.call('HMGET', KEYS[3], 'expires_at', 'issued_at',
+    'is_blocked_access', 'is_full_block')
+redis.call('DEL', KEYS[3])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if not fields[1] or fields[4] == '1' then
+    return nil
+end
+table.insert(fields, 1, ARGV[1])
+return fields
+"""
+
+# KEYS: subject zset, then the known sessions. ARGV: '1' for full block, then
+# the known sessions. Returns the ids of the blocked sessions, or false when
+# the known sessions are stale.
+_BLOCK_SCRIPT = (
+    _KNOWN_SESSIONS
+    + """
+local ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+local index = known_sessions(ids, 1, 2)
+if not index then
+    return false
+end
+local blocked = {}
+for _, id in ipairs(ids) do
+    local key = KEYS[index[id]]
+    if redis.call('HEXISTS', key, 'digest') == 1 then
+        redis.call('HSET', key, 'is_blocked_access', '1')
+        if ARGV[1] == '1' then
+            redis.call('HSET', key, 'is_full_block', '1')
+            redis.call('DEL', KEYS[index[id] + 1])
+        end
+        table.insert(blocked, id)
+    else
+        redis.call('ZREM', KEYS[1], id)
+    end
+end
+return blocked
+"""
+)
+
+# KEYS: session hash, its refresh key. Returns 1 if the session got blocked,
+# 0 if it is unknown or already blocked.
+_BLOCK_ONE_SCRIPT = """
+local fields = redis.call('HMGET', KEYS[1], 'digest', 'is_full_block')
+if not fields[1] or fields[2] == '1' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'is_blocked_access', '1', 'is_full_block', '1')
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# KEYS: subject zset, then the known sessions. ARGV: the known sessions.
+# Returns 1, or false when the known sessions are stale.
+_DELETE_BY_SUB_SCRIPT = (
+    _KNOWN_SESSIONS
+    + """
+local ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+local index = known_sessions(ids, 1, 1)
+if not index then
+    return false
+end
+for _, id in ipairs(ids) do
+    redis.call('DEL', KEYS[index[id]], KEYS[index[id] + 1])
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+)
+
+
+class RedisTokenRepository:
+    """Keeps sessions in Redis instead of the SQL ``tokens`` table.
+
+    Every session is a hash expiring at ``expires_at``, indexed by a
+    per-subject sorted set scored by ``issued_at`` and by the SHA-256
+    digest of its refresh token; the token itself is never stored. All keys
+    of a subject share its hash tag, so every write is one script on one
+    node and stays atomic. Refresh tokens start with their subject for the
+    same reason: the tag has to be known before the lookup. Consuming a
+    refresh token deletes its digest key in the same script, so only one
+    caller can use it.
+
+    Scripts get every key they touch through ``KEYS``, as Redis Cluster
+    requires. Scripts over all sessions of a subject are passed the sessions
+    read just before; when one was added meanwhile, the script changes
+    nothing and the call is retried with a fresh read.
+    """
+
+    redis: RedisRouter
+    model: type[TokenOrm]
+
+    def __init__(self, redis: RedisRouter, model: Type[TokenOrm]):
+        self.redis = redis
+        self.model = model
+        self._create = redis.register_script(_CREATE_SCRIPT)
+        self._pop = redis.register_script(_POP_SCRIPT)
+        self._block = redis.register_script(_BLOCK_SCRIPT)
+        self._block_one = redis.register_script(_BLOCK_ONE_SCRIPT)
+        self._delete_by_sub = redis.register_script(_DELETE_BY_SUB_SCRIPT)
+
+    @staticmethod
+    def digest(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    @staticmethod
+    def new_refresh_token(subject: UUID | str) -> str:
+        return f"{subject}.{random_token()}"
+
+    @staticmethod
+    def _subject_of(refresh_token: str) -> str | None:
+        subject, dot, rest = refresh_token.partition(".")
+        return subject if subject and dot and rest else None
+
+    @staticmethod
+    def _session_key(subject: UUID | str, _id: UUID | str = "") -> str:
+        return f"session:{tag(subject)}:{_id}"
+
+    @staticmethod
+    def _subject_key(subject: UUID | str) -> str:
+        return f"sessions:{tag(subject)}"
+
+    @staticmethod
+    def _refresh_key(subject: UUID | str, digest: str = "") -> str:
+        return f"refresh:{tag(subject)}:{digest}"
+
+    def _to_model(
+        self, _id: str, fields: dict[bytes, bytes], refresh_token: str = ""
+    ) -> TokenOrm:
+        data = {
+            "id": UUID(_id),
+            "subject": UUID(fields[b"subject"].decode()),
+            "refresh_token": refresh_token,
+            "expires_at": int(fields[b"expires_at"]),
+            "issued_at": int(fields[b"issued_at"]),
+            "is_blocked_access": fields[b"is_blocked_access"] == b"1",
+            "is_full_block": fields[b"is_full_block"] == b"1",
+        }
+        return self.model(**data)
+
+    async def _hgetall(self, key: str) -> dict[bytes, bytes]:
+        return await self.redis.for_key(key).hgetall(key)  # type: ignore[misc]
+
+    async def _fetch(
+        self, subject: UUID | str, ids: list[str]
+    ) -> tuple[list[TokenOrm], list[str]]:
+        """Returns the sessions still stored and the ids of expired ones."""
+        if not ids:
+            return [], []
+        redis = self.redis.for_key(self._subject_key(subject))
+        async with redis.pipeline(transaction=False) as pipe:
+            for _id in ids:
+                pipe.hgetall(self._session_key(subject, _id))
+            results = await pipe.execute()
+        tokens = [
+            self._to_model(_id, fields) for _id, fields in zip(ids, results) if fields
+        ]
+        return tokens, [_id for _id, fields in zip(ids, results) if not fields]
+
+    async def _prune(self, subject: UUID | str, expired: list[str]) -> None:
+        if expired:
+            key = self._subject_key(subject)
+            await self.redis.for_key(key).zrem(key, *expired)
+
+    async def _load(self, subject: UUID | str, ids: list[str]) -> list[TokenOrm]:
+        tokens, expired = await self._fetch(subject, ids)
+        await self._prune(subject, expired)
+        return tokens
+
+    async def _known_sessions(
+        self, subject: UUID | str
+    ) -> tuple[list[Any], list[str]]:
+        """Lists the sessions of a subject for the scripts over all of them.
+
+        Returns their count and ids for ``ARGV`` and their session and
+        refresh keys for ``KEYS``, in the layout of ``_KNOWN_SESSIONS``.
+        """
+        key = self._subject_key(subject)
+        redis = self.redis.for_key(key)
+        ids = [_id.decode() for _id in await redis.zrange(key, 0, -1)]
+        keys: list[str] = []
+        if ids:
+            async with redis.pipeline(transaction=False) as pipe:
+                for _id in ids:
+                    pipe.hget(self._session_key(subject, _id), "digest")
+                digests = await pipe.execute()
+            for _id, digest in zip(ids, digests):
+                keys.append(self._session_key(subject, _id))
+                keys.append(self._refresh_key(subject, (digest or b"").decode()))
+        return [len(ids), *ids], keys
+
+    async def _on_all_sessions(
+        self,
+        script: RoutedScript,
+        subject: UUID | str,
+        keys: list[str],
+        args: list[Any],
+    ) -> Any:
+        """Runs a script over all sessions, retrying while they are stale."""
+        while True:
+            known_args, known_keys = await self._known_sessions(subject)
+            result = await script(
+                keys=[*keys, *known_keys], args=[*args, *known_args]
+            )
+            if result is not None:
+                return result
+
+    @traced("RedisTokenRepository.create")
+    async def create(self, data: dict[str, Any]) -> TokenOrm:
+        data = {"issued_at": int(datetime.now().timestamp()), **data}
+        await self._insert(data, -1)
+        return self.model(**data)
+
+    @traced("RedisTokenRepository.create_capped")
+    async def create_capped(self, data: dict[str, Any], limit: int) -> list[UUID]:
+        data = {"issued_at": int(datetime.now().timestamp()), **data}
+        evicted = await self._insert(data, limit - 1)
+        return [UUID(_id.decode()) for _id in evicted]
+
+    async def _insert(self, data: dict[str, Any], keep: int) -> list[bytes]:
+        subject, _id = str(data["subject"]), str(data["id"])
+        digest = self.digest(data["refresh_token"])
+        keys = [
+            self._session_key(subject, _id),
+            self._subject_key(subject),
+            self._refresh_key(subject, digest),
+        ]
+        args = [
+            _id,
+            subject,
+            digest,
+            int(data["expires_at"]),
+            int(data["issued_at"]),
+            int(datetime.now().timestamp()),
+            keep,
+        ]
+        if keep < 0:
+            # Nothing is evicted, so no other session is touched.
+            return await self._create(keys=keys, args=[*args, 0])
+        return await self._on_all_sessions(self._create, subject, keys, args)
+
+    @traced("RedisTokenRepository.create_many")
+    async def create_many(self, rows: list[dict[str, Any]]) -> None:
+        await asyncio.gather(*(self.create(row) for row in rows))
+
+    @traced("RedisTokenRepository.get_by_sub")
+    async def get_by_sub(self, sub: UUID) -> list[TokenOrm]:
+        key = self._subject_key(sub)
+        ids = await self.redis.for_key(key).zrange(key, 0, -1)
+        return await self._load(sub, [_id.decode() for _id in ids])
+
+    @traced("RedisTokenRepository.get_page_by_sub")
+    async def get_page_by_sub(
+        self,
+        sub: UUID,
+        now: int,
+        limit: int,
+        after: tuple[int, UUID] | None = None,
+    ) -> list[TokenOrm]:
+        key = self._subject_key(sub)
+        redis = self.redis.for_key(key)
+        max_score: int | str = after[0] if after else "+inf"
+        cursor = (after[0], str(after[1])) if after else None
+        # Expired ids are only removed once the scan is done: removing them
+        # from the set while paging through it by offset would skip sessions.
+        offset = 0
+        tokens: list[TokenOrm] = []
+        expired: list[str] = []
+        while len(tokens) < limit:
+            chunk = await redis.zrevrangebyscore(
+                key, max_score, "-inf", start=offset, num=limit * 2, withscores=True
+            )
+            if not chunk:
+                break
+            offset += len(chunk)
+            ids = [
+                _id.decode()
+                for _id, score in chunk
+                if cursor is None or (int(score), _id.decode()) < cursor
+            ]
+            found, gone = await self._fetch(sub, ids)
+            expired += gone
+            tokens += [
+                token
+                for token in found
+                if not token.is_full_block and token.expires_at > now
+            ]
+        await self._prune(sub, expired)
+        return tokens[:limit]
+
+    @traced("RedisTokenRepository.full_block_one")
+    async def full_block_one(self, sub: UUID, _id: UUID) -> bool:
+        key = self._session_key(sub, _id)
+        # The digest of a session never changes, so its refresh key can be
+        # looked up before the script runs.
+        digest = await self.redis.for_key(key).hget(key, "digest")  # type: ignore[misc]
+        if digest is None:
+            return False
+        blocked = await self._block_one(
+            keys=[key, self._refresh_key(sub, digest.decode())]
+        )
+        return bool(blocked)
+
+    @traced("RedisTokenRepository.delete_by_sub")
+    async def delete_by_sub(self, sub: UUID) -> None:
+        await self._on_all_sessions(
+            self._delete_by_sub, sub, [self._subject_key(sub)], []
+        )
+
+    @traced("RedisTokenRepository.get_by_refresh_token")
+    async def get_by_refresh_token(self, refresh_token: str) -> TokenOrm | None:
+        subject = self._subject_of(refresh_token)
+        if subject is None:
+            return None
+        key = self._refresh_key(subject, self.digest(refresh_token))
+        _id = await self.redis.for_key(key).get(key)
+        if _id is None:
+            return None
+        fields = await self._hgetall(self._session_key(subject, _id.decode()))
+        if not fields or fields[b"is_full_block"] == b"1":
+            return None
+        return self._to_model(_id.decode(), fields, refresh_token)
+
+    @traced("RedisTokenRepository.pop_by_refresh_token")
+    async def pop_by_refresh_token(self, refresh_token: str) -> TokenOrm | None:
+        subject = self._subject_of(refresh_token)
+        if subject is None:
+            return None
+        key = self._refresh_key(subject, self.digest(refresh_token))
+        _id = await self.redis.for_key(key).get(key)
+        if _id is None:
+            return None
+        result = await self._pop(
+            keys=[
+                key,
+                self._subject_key(subject),
+                self._session_key(subject, _id.decode()),
+            ],
+            args=[_id],
+        )
+        if not result:
+            return None
+        _id, expires_at, issued_at, blocked, full_block = result
+        return self._to_model(
+            _id.decode(),
+            {
+                b"subject": subject.encode(),
+                b"expires_at": expires_at,
+                b"issued_at": issued_at,
+                b"is_blocked_access": blocked,
+                b"is_full_block": full_block,
+            },
+            refresh_token,
+        )
+
+    async def _block_sub(self, subject: UUID, full: bool) -> list[TokenOrm]:
+        ids = await self._on_all_sessions(
+            self._block, subject, [self._subject_key(subject)], ["1" if full else "0"]
+        )
+        return [
+            self.model(**{"id": UUID(_id.decode()), "subject": subject}) for _id in ids
+        ]
+
+    @traced("RedisTokenRepository.block")
+    async def block(self, subject: UUID) -> list[TokenOrm]:
+        return await self._block_sub(subject, full=False)
+
+    @traced("RedisTokenRepository.full_block")
+    async def full_block(self, subject: UUID) -> list[TokenOrm]:
+        return await self._block_sub(subject, full=True)
@@ -0,0 +1,70 @@
+import re
+from typing import Any
+
+from backauth.config.redis import RedisRouter
+
+JTI = "jti"
+WATERMARK = "watermark"
+
+_EVENT_ID = re.compile(r"^\d+(-\d+)?$")
+
+
+def is_event_id(value: str) -> bool:
+    return value == "$" or bool(_EVENT_ID.match(value))
+
+
+class RevocationStream:
+    """Publishes revocations on a Redis stream for services checking tokens locally.
+
+    Every event is a flat mapping: ``{"type": "jti", "jti", "exp"}`` for a
+    blacklisted access token or ``{"type": "watermark", "key", "field",
+    "before", "exp"}`` for a raised watermark, where ``key`` is a subject or
+    ``*`` and ``field`` is named like in ``WatermarkRepository``. ``before``
+    is in milliseconds, ``exp`` in seconds is when the event stops mattering. The stream is capped to about
+    ``max_length`` entries, so readers further behind start over from the
+    oldest entry left.
+    """
+
+    redis: RedisRouter
+
+    def __init__(self, redis: RedisRouter, key: str, max_length: int):
+        self.redis = redis
+        self.key = key
+        self.max_length = max_length
+
+    async def publish(self, events: list[dict[str, Any]]) -> None:
+        if not events:
+            return
+        async with self.redis.for_key(self.key).pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(
+                    self.key,
+                    event,  # type: ignore[arg-type]
+                    maxlen=self.max_length,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+    async def last_id(self) -> str:
+        entries = await self.redis.for_key(self.key).xrevrange(self.key, count=1)
+        return entries[0][0].decode() if entries else "0-0"
+
+    async def read(
+        self, after: str, count: int = 500, block_ms: int | None = None
+    ) -> list[tuple[str, dict[str, str]]]:
+        """Returns up to ``count`` events after the id ``after``, oldest first.
+
+        With ``block_ms`` waits that long for new events when there are none.
+        """
+        result = await self.redis.for_key(self.key).xread(
+            {self.key: after}, count=count, block=block_ms
+        )
+        if not result:
+            return []
+        return [
+            (
+                _id.decode(),
+                {field.decode(): value.decode() for field, value in fields.items()},
+            )
+            for _id, fields in result[0][1]
+        ]
@@ -0,0 +1,149 @@
+import heapq
+import time
+from typing import Any, Protocol, Sequence
+
+from loguru import logger
+
+from backauth.config.redis import RedisRouter, get_redis
+from backauth.config.setting import Config
+
+
+class StateStore(Protocol):
+    """Expiring key-value state used by ``TokenService``.
+
+    Holds the access token blacklist and the payload cache.
+    ``RedisStateStore`` shares it between processes, ``MemoryStateStore``
+    keeps it in the process for single-node deployments and tests.
+    """
+
+    async def get(self, key: str) -> Any: ...
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]: ...
+
+    async def set(self, key: str, value: Any, ex: int) -> None: ...
+
+    async def set_many(self, keys: Sequence[str], value: Any, ex: int) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+
+class RedisStateStore:
+    def __init__(self, redis: RedisRouter):
+        self.redis = redis
+
+    async def get(self, key: str) -> Any:
+        return await self.redis.for_key(key).get(key)
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        return await self.redis.mget(keys)
+
+    async def set(self, key: str, value: Any, ex: int) -> None:
+        await self.redis.for_key(key).set(key, value, ex=ex)
+
+    async def set_many(self, keys: Sequence[str], value: Any, ex: int) -> None:
+        await self.redis.set_many(keys, value, ex=ex)
+
+    async def delete(self, *keys: str) -> None:
+        await self.redis.delete(*keys)
+
+
+class MemoryStateStore:
+    """Keeps the state in a dict, expiring entries through a min-heap.
+
+    The heap is ordered by expiry time; every write pops the entries that
+    are due, so expired keys never pile up. Reads check the expiry
+    themselves. Entries are never dropped before they expire, as a missing
+    blacklist entry would let a revoked token through: writes beyond
+    ``max_entries`` are still stored, counted in ``overflows`` and logged
+    once each time the store goes over. Values are stored as bytes, like
+    Redis returns them.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self.overflows = 0
+        self._overflowing = False
+        self._data: dict[str, tuple[float, bytes]] = {}
+        self._expiry: list[tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self._data[key]
+        # Overwritten keys leave stale heap entries behind, drop them in bulk.
+        if len(self._expiry) > 2 * len(self._data) + 1024:
+            self._expiry = [(entry[0], key) for key, entry in self._data.items()]
+            heapq.heapify(self._expiry)
+        if self._overflowing and len(self._data) < self.max_entries:
+            self._overflowing = False
+
+    def _check_capacity(self, key: str) -> None:
+        if key in self._data or len(self._data) < self.max_entries:
+            return
+        self.overflows += 1
+        if not self._overflowing:
+            self._overflowing = True
+            logger.warning(
+                "Memory state store is over its {} entries, keeping them until "
+                "they expire",
+                self.max_entries,
+            )
+
+    def _get(self, key: str, now: float) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        return entry[1]
+
+    def _set(self, key: str, value: Any, ex: int, now: float) -> None:
+        if isinstance(value, str):
+            value = value.encode()
+        self._check_capacity(key)
+        expires_at = now + ex
+        self._data[key] = (expires_at, value)
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    async def get(self, key: str) -> bytes | None:
+        return self._get(key, time.monotonic())
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        now = time.monotonic()
+        return [self._get(key, now) for key in keys]
+
+    async def set(self, key: str, value: Any, ex: int) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        self._set(key, value, ex, now)
+
+    async def set_many(self, keys: Sequence[str], value: Any, ex: int) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        for key in keys:
+            self._set(key, value, ex, now)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+
+_memory_stores: dict[int, MemoryStateStore] = {}
+
+
+def get_state_store(conf: Config) -> StateStore:
+    """Returns the state store selected by ``conf.state_backend``.
+
+    The memory store is shared by every ``TokenService`` of the process.
+    """
+    if conf.state_backend == "redis":
+        return RedisStateStore(get_redis(conf))
+    store = _memory_stores.get(conf.state_max_entries)
+    if store is None:
+        store = _memory_stores[conf.state_max_entries] = MemoryStateStore(
+            conf.state_max_entries
+        )
+    return store
@@ -1,10 +1,24 @@
-from typing import Any, Type
+from typing import Any, Callable, Type
 from uuid import UUID
 
-from sqlalchemy import delete, select, and_
+from sqlalchemy import (
+    Executable,
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backauth.auth.model.token import TokenOrm
+from backauth.auth.repository.groupcommit import get_writer
+from backauth.auth.repository.tokenstore import random_token
+from backauth.database import cached_statement, commit, in_unit_of_work
+from backauth.tracing import traced
 
 
 class TokenRepository:
@@ -15,51 +29,226 @@ class TokenRepository:
         self.session = session
         self.model = model
 
+    def _statement(self, name: str, build: Callable[[], Executable]) -> Executable:
+        return cached_statement(self.model, name, build)
+
+    @staticmethod
+    def new_refresh_token(subject: UUID | str) -> str:
+        return random_token()
+
+    @traced("TokenRepository.create")
     async def create(self, data: dict[str, Any]) -> TokenOrm:
         token = self.model(**data)
+        writer = get_writer()
+        if (
+            writer is not None
+            and writer.model is self.model
+            and not in_unit_of_work(self.session)
+        ):
+            await writer.submit(data)
+            return token
         self.session.add(token)
-        await self.session.commit()
-        await self.session.refresh(token)
+        await commit(self.session)
         return token
 
+    @traced("TokenRepository.create_many")
+    async def create_many(self, rows: list[dict[str, Any]]) -> None:
+        if not rows:
+            return
+        stmt = self._statement("create_many", lambda: insert(self.model))
+        await self.session.execute(stmt, rows)
+        await commit(self.session)
+
+    @traced("TokenRepository.delete")
     async def delete(self, _id: UUID) -> None:
-        stmt = delete(self.model).where(self.model.id == _id)
-        await self.session.execute(stmt)
-        await self.session.commit()
+        stmt = self._statement(
+            "delete",
+            lambda: delete(self.model).where(self.model.id == bindparam("id_")),
+        )
+        await self.session.execute(stmt, {"id_": _id})
+        await commit(self.session)
 
+    @traced("TokenRepository.get_by_id")
     async def get_by_id(self, _id: UUID) -> TokenOrm | None:
-        stmt = select(self.model).where(
-            and_(self.model.id == _id, self.model.is_full_block == False)
+        stmt = self._statement(
+            "get_by_id",
+            lambda: select(self.model).where(
+                and_(self.model.id == bindparam("id_"), self.model.is_full_block == False)
+            ),
         )
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(stmt, {"id_": _id})
         return result.unique().scalar_one_or_none()
 
+    @traced("TokenRepository.get_by_sub")
     async def get_by_sub(self, sub: UUID) -> list[TokenOrm]:
-        stmt = select(self.model).where(self.model.subject == sub)
-        result = await self.session.execute(stmt)
+        stmt = self._statement(
+            "get_by_sub",
+            lambda: select(self.model).where(self.model.subject == bindparam("sub_")),
+        )
+        result = await self.session.execute(stmt, {"sub_": sub})
         return list(result.scalars().all())
 
+    @traced("TokenRepository.get_page_by_sub")
+    async def get_page_by_sub(
+        self,
+        sub: UUID,
+        now: int,
+        limit: int,
+        after: tuple[int, UUID] | None = None,
+    ) -> list[TokenOrm]:
+        def build() -> Executable:
+            stmt = select(self.model).where(
+                self.model.subject == bindparam("sub_"),
+                self.model.is_full_block == False,
+                self.model.expires_at > bindparam("now_"),
+            )
+            if after is not None:
+                stmt = stmt.where(
+                    tuple_(self.model.issued_at, self.model.id)
+                    < tuple_(
+                        bindparam("issued_at_", type_=self.model.issued_at.type),
+                        bindparam("id_", type_=self.model.id.type),
+                    )
+                )
+            return stmt.order_by(
+                self.model.issued_at.desc(), self.model.id.desc()
+            ).limit(bindparam("limit_"))
+
+        params: dict[str, Any] = {"sub_": sub, "now_": now, "limit_": limit}
+        if after is not None:
+            params.update(issued_at_=after[0], id_=after[1])
+        name = "get_page_by_sub" if after is None else "get_page_by_sub_after"
+        result = await self.session.execute(self._statement(name, build), params)
+        return list(result.scalars().all())
+
+    @traced("TokenRepository.full_block_one")
+    async def full_block_one(self, sub: UUID, _id: UUID) -> bool:
+        stmt = self._statement(
+            "full_block_one",
+            lambda: update(self.model)
+            .where(
+                self.model.id == bindparam("id_"),
+                self.model.subject == bindparam("sub_"),
+                self.model.is_full_block == False,
+            )
+            .values(is_full_block=True, is_blocked_access=True)
+            .returning(self.model.id),
+        )
+        result = await self.session.execute(stmt, {"id_": _id, "sub_": sub})
+        blocked = result.scalar_one_or_none() is not None
+        await commit(self.session)
+        return blocked
+
+    async def _lock_subject(self, subject: UUID) -> None:
+        """Serializes capped inserts of ``subject`` until the transaction ends.
+
+        Without it two concurrent logins each delete beyond the cap without
+        seeing the other's uncommitted insert, leaving the subject above it.
+        PostgreSQL takes a transaction-level advisory lock on the subject;
+        SQLite already serializes writing transactions.
+        """
+        if self.session.get_bind().dialect.name != "postgresql":
+            return
+        stmt = self._statement(
+            "lock_subject",
+            lambda: select(func.pg_advisory_xact_lock(bindparam("key_"))),
+        )
+        key = int.from_bytes(subject.bytes[:8], "big", signed=True)
+        await self.session.execute(stmt, {"key_": key})
+
+    @traced("TokenRepository.create_capped")
+    async def create_capped(self, data: dict[str, Any], limit: int) -> list[UUID]:
+        """Inserts a session, deleting the oldest of its subject beyond ``limit``.
+
+        The subject is locked first, then the delete walks the
+        ``(subject, issued_at)`` index backwards and commits together with
+        the insert. Returns the deleted session ids.
+        """
+
+        def build() -> Executable:
+            older = (
+                select(self.model.id)
+                .where(self.model.subject == bindparam("sub_"))
+                .order_by(self.model.issued_at.desc(), self.model.id.desc())
+                .offset(bindparam("keep_"))
+            )
+            return (
+                delete(self.model)
+                .where(self.model.id.in_(older))
+                .returning(self.model.id)
+            )
+
+        subject = UUID(str(data["subject"]))
+        await self._lock_subject(subject)
+        result = await self.session.execute(
+            self._statement("create_capped", build),
+            {"sub_": subject, "keep_": limit - 1},
+        )
+        ids = list(result.scalars().all())
+        self.session.add(self.model(**data))
+        await commit(self.session)
+        return ids
+
+    @traced("TokenRepository.delete_by_sub")
     async def delete_by_sub(self, sub: UUID) -> None:
-        stmt = delete(self.model).where(self.model.subject == sub)
-        await self.session.execute(stmt)
-        await self.session.commit()
+        stmt = self._statement(
+            "delete_by_sub",
+            lambda: delete(self.model).where(self.model.subject == bindparam("sub_")),
+        )
+        await self.session.execute(stmt, {"sub_": sub})
+        await commit(self.session)
 
+    @traced("TokenRepository.get_by_refresh_token")
     async def get_by_refresh_token(self, refresh_token: str) -> TokenOrm | None:
-        stmt = select(self.model).where(self.model.refresh_token == refresh_token)
-        result = await self.session.execute(stmt)
+        stmt = self._statement(
+            "get_by_refresh_token",
+            lambda: select(self.model).where(
+                self.model.refresh_token == bindparam("refresh_token_")
+            ),
+        )
+        result = await self.session.execute(stmt, {"refresh_token_": refresh_token})
         return result.unique().scalar_one_or_none()
 
+    @traced("TokenRepository.pop_by_refresh_token")
+    async def pop_by_refresh_token(self, refresh_token: str) -> TokenOrm | None:
+        stmt = self._statement(
+            "pop_by_refresh_token",
+            lambda: delete(self.model)
+            .where(
+                and_(
+                    self.model.refresh_token == bindparam("refresh_token_"),
+                    self.model.is_full_block == False,
+                )
+            )
+            .returning(self.model),
+        )
+        result = await self.session.execute(stmt, {"refresh_token_": refresh_token})
+        token = result.scalar_one_or_none()
+        if token is not None:
+            self.session.expunge(token)
+        await commit(self.session)
+        return token
+
+    async def _block_sub(self, subject: UUID, full: bool) -> list[TokenOrm]:
+        values = {"is_blocked_access": True}
+        if full:
+            values["is_full_block"] = True
+        stmt = self._statement(
+            "full_block" if full else "block",
+            lambda: update(self.model)
+            .where(self.model.subject == bindparam("sub_"))
+            .values(**values)
+            .returning(self.model.id),
+        )
+        result = await self.session.execute(stmt, {"sub_": subject})
+        ids = list(result.scalars().all())
+        await commit(self.session)
+        return [self.model(**{"id": _id, "subject": subject}) for _id in ids]
+
+    @traced("TokenRepository.block")
     async def block(self, subject: UUID) -> list[TokenOrm]:
-        tokens = await self.get_by_sub(subject)
-        for token in tokens:
-            token.is_blocked_access = True
-            await self.session.commit()
-        return tokens
+        return await self._block_sub(subject, full=False)
 
+    @traced("TokenRepository.full_block")
     async def full_block(self, subject: UUID) -> list[TokenOrm]:
-        tokens = await self.get_by_sub(subject)
-        for token in tokens:
-            token.is_full_block = True
-            token.is_blocked_access = True
-            await self.session.commit()
-        return tokens
+        return await self._block_sub(subject, full=True)
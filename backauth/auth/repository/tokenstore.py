@@ -0,0 +1,50 @@
+import secrets
+import string
+from typing import Any, Protocol
+from uuid import UUID
+
+from backauth.auth.model.token import TokenOrm
+
+_CHARSET = string.ascii_letters + string.digits
+
+
+def random_token(length: int = 128) -> str:
+    return "".join(secrets.choice(_CHARSET) for _ in range(length))
+
+
+class TokenStore(Protocol):
+    """Session storage used by ``TokenService``.
+
+    ``TokenRepository`` keeps sessions in the SQL ``tokens`` table,
+    ``RedisTokenRepository`` keeps them in Redis.
+    """
+
+    def new_refresh_token(self, subject: UUID | str) -> str: ...
+
+    async def create(self, data: dict[str, Any]) -> TokenOrm: ...
+
+    async def create_many(self, rows: list[dict[str, Any]]) -> None: ...
+
+    async def get_by_sub(self, sub: UUID) -> list[TokenOrm]: ...
+
+    async def get_page_by_sub(
+        self,
+        sub: UUID,
+        now: int,
+        limit: int,
+        after: tuple[int, UUID] | None = None,
+    ) -> list[TokenOrm]: ...
+
+    async def full_block_one(self, sub: UUID, _id: UUID) -> bool: ...
+
+    async def create_capped(self, data: dict[str, Any], limit: int) -> list[UUID]: ...
+
+    async def delete_by_sub(self, sub: UUID) -> None: ...
+
+    async def get_by_refresh_token(self, refresh_token: str) -> TokenOrm | None: ...
+
+    async def pop_by_refresh_token(self, refresh_token: str) -> TokenOrm | None: ...
+
+    async def block(self, subject: UUID) -> list[TokenOrm]: ...
+
+    async def full_block(self, subject: UUID) -> list[TokenOrm]: ...
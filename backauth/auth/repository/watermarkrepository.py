@@ -0,0 +1,112 @@
+import asyncio
+import time
+from uuid import UUID
+
+from backauth.config.redis import RedisRouter, tag
+
+ACCESS = "access"
+REFRESH = "refresh"
+GLOBAL = "*"
+
+# KEYS[1] - watermark hash, ARGV[1] - timestamp, ARGV[2] - ttl, ARGV[3..] -
+# fields. Watermarks only ever move forward.
+_RAISE_SCRIPT = """
+for i = 3, #ARGV do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(current) < tonumber(ARGV[1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+"""
+
+_cache: dict[str, tuple[float, dict[str, int]]] = {}
+_CACHE_MAX_SIZE = 100_000
+# Watermarks written before they had millisecond resolution are below this.
+_SECONDS_LIMIT = 10**11
+
+
+def cache_size() -> int:
+    """Returns how many watermark hashes this process currently caches."""
+    return len(_cache)
+
+
+class WatermarkRepository:
+    """Keeps "revoked before" timestamps, in milliseconds, in Redis.
+
+    Each subject has a hash with one watermark for access and one for
+    refresh tokens; a global hash has a watermark for every token (``*``)
+    and one per scope (``scope:<name>``). A token is revoked when its issue
+    time is not after a watermark that applies to it, so revoking any number of
+    sessions is a single write. Lookups are cached in process for
+    ``cache_ttl`` seconds, which is how long other processes may keep
+    accepting revoked tokens.
+    """
+
+    redis: RedisRouter
+
+    def __init__(self, redis: RedisRouter, ttl: int, cache_ttl: float = 1.0):
+        self.redis = redis
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self._raise = redis.register_script(_RAISE_SCRIPT)
+
+    @staticmethod
+    def _subject_key(subject: UUID | str) -> str:
+        return f"revoked_before:{tag(subject)}"
+
+    @staticmethod
+    def _global_key() -> str:
+        return f"revoked_before:{tag(GLOBAL)}"
+
+    async def _get(self, key: str) -> dict[str, int]:
+        now = time.monotonic()
+        cached = _cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        values = await self.redis.for_key(key).hgetall(key)  # type: ignore[misc]
+        watermarks = {
+            field.decode(): self._to_ms(int(value)) for field, value in values.items()
+        }
+        if len(_cache) >= _CACHE_MAX_SIZE:
+            _cache.clear()
+        _cache[key] = (now + self.cache_ttl, watermarks)
+        return watermarks
+
+    @staticmethod
+    def _to_ms(value: int) -> int:
+        return value * 1000 + 999 if value < _SECONDS_LIMIT else value
+
+    async def _set(self, key: str, fields: list[str], before: int) -> None:
+        await self._raise(keys=[key], args=[before, self.ttl, *fields])
+        _cache.pop(key, None)
+
+    async def revoke_subject(
+        self, subject: UUID | str, before: int, refresh: bool = False
+    ) -> None:
+        fields = [ACCESS, REFRESH] if refresh else [ACCESS]
+        await self._set(self._subject_key(subject), fields, before)
+
+    async def revoke_scope(self, scope: str, before: int) -> None:
+        await self._set(self._global_key(), [f"scope:{scope}"], before)
+
+    async def revoke_all(self, before: int) -> None:
+        await self._set(self._global_key(), [GLOBAL], before)
+
+    async def get_watermark(
+        self,
+        subject: UUID | str | None,
+        kind: str = ACCESS,
+        scopes: list[str] | None = None,
+    ) -> int:
+        """Returns the newest watermark applying to a token, 0 if there is none."""
+        keys = [self._global_key()]
+        if subject is not None:
+            keys.append(self._subject_key(subject))
+        results = await asyncio.gather(*(self._get(key) for key in keys))
+        global_marks = results[0]
+        candidates = [global_marks.get(GLOBAL, 0)]
+        candidates += [global_marks.get(f"scope:{scope}", 0) for scope in scopes or ()]
+        if subject is not None:
+            candidates.append(results[1].get(kind, 0))
+        return max(candidates)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+from typing import Any
+
+import httpx
+from loguru import logger
+
+from backauth.auth.claims import expand_claims, issued_at_ms
+from backauth.auth.repository.revocationrepository import JTI, WATERMARK
+from backauth.auth.repository.watermarkrepository import ACCESS, GLOBAL
+
+
+class RevocationSet:
+    """Local copy of the revocations published on the revocation stream.
+
+    Fed with the events of ``RevocationClient``, it answers the same
+    question as ``TokenService.validate_token`` without a network call:
+    whether a token was blacklisted by jti or is covered by a subject,
+    scope or global watermark. Entries are dropped once their ``exp`` has
+    passed, as the tokens they cover are expired by then.
+    """
+
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self) -> None:
+        self.jtis: dict[str, int] = {}
+        self.watermarks: dict[tuple[str, str], tuple[int, int]] = {}
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self.jtis) + len(self.watermarks)
+
+    def apply(self, event: dict[str, Any]) -> None:
+        expires_at = int(event["exp"])
+        if event["type"] == JTI:
+            self.jtis[event["jti"]] = expires_at
+        elif event["type"] == WATERMARK:
+            key = (event["key"], event["field"])
+            before = int(event["before"])
+            current = self.watermarks.get(key)
+            if current is None or current[0] < before:
+                self.watermarks[key] = (before, expires_at)
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+
+    def prune(self, now: int | None = None) -> None:
+        now = now or int(time.time())
+        self.jtis = {jti: exp for jti, exp in self.jtis.items() if exp > now}
+        self.watermarks = {
+            key: value for key, value in self.watermarks.items() if value[1] > now
+        }
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+
+    def _watermark(self, key: str, field: str) -> int:
+        value = self.watermarks.get((key, field))
+        return value[0] if value is not None else 0
+
+    def is_revoked(self, claims: dict) -> bool:
+        """Checks the claims of a verified token against the known revocations."""
+        claims = expand_claims(claims)
+        if claims.get("jti") in self.jtis:
+            return True
+        issued_at = issued_at_ms(claims)
+        subject = claims.get("user_id") or claims.get("sub")
+        marks = [self._watermark(GLOBAL, GLOBAL)]
+        marks += [
+            self._watermark(GLOBAL, f"scope:{scope}")
+            for scope in claims.get("scopes") or ()
+            if isinstance(scope, str)
+        ]
+        if subject is not None:
+            marks.append(self._watermark(str(subject), claims.get("type", ACCESS)))
+        return issued_at <= max(marks)
+
+
+class RevocationClient:
+    """Keeps a ``RevocationSet`` in sync with the revocation endpoint.
+
+    Reads the server-sent events of ``GET /auth/revocations`` and
+    reconnects with the last seen event id after any error, so no event is
+    missed while the server keeps it in the stream.
+
+    Example::
+
+        revocations = RevocationSet()
+        client = RevocationClient("https://auth/auth/revocations", revocations)
+        task = asyncio.create_task(client.run())
+        ...
+        if revocations.is_revoked(claims):
+            raise Unauthorized()
+    """
+
+    def __init__(
+        self,
+        url: str,
+        revocations: RevocationSet | None = None,
+        headers: dict[str, str] | None = None,
+        retry_seconds: float = 1.0,
+        last_event_id: str | None = None,
+    ):
+        self.url = url
+        self.revocations = revocations if revocations is not None else RevocationSet()
+        self.headers = headers or {}
+        self.retry_seconds = retry_seconds
+        self.last_event_id = last_event_id
+
+    async def run(self) -> None:
+        """Follows the stream until cancelled."""
+        async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, read=None)) as client:
+            while True:
+                try:
+                    await self._follow(client)
+                except httpx.HTTPError as e:
+                    logger.warning("Revocation stream interrupted: {}", e)
+                await asyncio.sleep(self.retry_seconds)
+
+    async def _follow(self, client: httpx.AsyncClient) -> None:
+        headers = {"Accept": "text/event-stream", **self.headers}
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = self.last_event_id
+        async with client.stream("GET", self.url, headers=headers) as response:
+            response.raise_for_status()
+            event: dict[str, str] = {}
+            async for line in response.aiter_lines():
+                if line:
+                    name, _, value = line.partition(":")
+                    event[name] = value.removeprefix(" ")
+                    continue
+                self._dispatch(event)
+                event = {}
+
+    def _dispatch(self, event: dict[str, str]) -> None:
+        if "retry" in event and event["retry"].isdigit():
+            self.retry_seconds = int(event["retry"]) / 1000
+        if "data" not in event:
+            return
+        self.revocations.apply(json.loads(event["data"]))
+        if "id" in event:
+            self.last_event_id = event["id"]
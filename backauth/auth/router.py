@@ -1,13 +1,20 @@
-from typing import Annotated, Type, Any
-from fastapi import APIRouter, Depends, Form
+import json
+from typing import Annotated, Type, Any, AsyncIterator, Sequence
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, Header, status
+from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, ORJSONResponse, StreamingResponse
 
 from backauth.auth.model.token import TokenOrm
+from backauth.auth.repository.revocationrepository import (
+    RevocationStream,
+    is_event_id,
+)
 from backauth.auth.schemas import Token
+from backauth.config.redis import get_redis
 from backauth.config.setting import Config, OAuthBase
 from backauth.user.model import UserOrm
 from backauth.user.schema import UserLoginSchema
@@ -20,7 +27,9 @@ def oauth_router(
     user_model: Type[UserOrm],
     configuration: Config,
 ):
-    router = APIRouter(prefix="/oauth", tags=["oauth"])
+    router = APIRouter(
+        prefix="/oauth", tags=["oauth"], default_response_class=ORJSONResponse
+    )
 
     def create_user_service_dep(
         session: AsyncSession = Depends(get_session),
@@ -65,7 +74,9 @@ def login_router(
     configuration: Config,
 ):
 
-    router = APIRouter(prefix="/auth", tags=["auth"])
+    router = APIRouter(
+        prefix="/auth", tags=["auth"], default_response_class=ORJSONResponse
+    )
 
     def create_user_service_dep(
         session: AsyncSession = Depends(get_session),
@@ -77,10 +88,11 @@ def login_router(
     @router.post("/login")
     async def login(
         service: service_user,
+        background_tasks: BackgroundTasks,
         form_data: OAuth2PasswordRequestForm = Depends(),
     ) -> Token:
         data = UserLoginSchema(email=form_data.username, password=form_data.password)
-        return await service.login(data)
+        return await service.login(data, background_tasks)
 
     @router.post("/token")
     async def login_for_access_token(
@@ -89,3 +101,66 @@ def login_router(
         return await service.get_token_by_refresh(refresh_token)
 
     return router
+
+
+def revocation_router(configuration: Config, dependencies: Sequence[Any] = ()):
+    """
+    Creates the endpoint streaming revocation events as server-sent events.
+
+    Args:
+        configuration: Application configuration, with
+            ``revocation_stream.enabled`` set.
+        dependencies: Dependencies guarding the endpoint, e.g. a check that
+            the caller is a trusted service.
+
+    Returns:
+        APIRouter: Router with ``GET /auth/revocations``. Every event carries
+        its stream id, so a client reconnecting with ``Last-Event-ID`` (or
+        ``?after=``) resumes where it stopped. Without either it replays the
+        retained stream; ``after=$`` starts at the newest event.
+    """
+    settings = configuration.revocation_stream
+    if not settings.enabled:
+        raise ValueError("revocation_stream.enabled must be set")
+    stream = RevocationStream(
+        get_redis(configuration), settings.key, settings.max_length
+    )
+    router = APIRouter(
+        prefix="/auth",
+        tags=["auth"],
+        dependencies=list(dependencies),
+        default_response_class=ORJSONResponse,
+    )
+
+    @router.get("/revocations")
+    async def revocations(
+        request: Request,
+        after: str = "0-0",
+        last_event_id: str | None = Header(None),
+    ) -> StreamingResponse:
+        position = last_event_id or after
+        if not is_event_id(position):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid event id"
+            )
+        if position == "$":
+            position = await stream.last_id()
+
+        async def events(position: str) -> AsyncIterator[str]:
+            yield "retry: 1000\n\n"
+            while not await request.is_disconnected():
+                entries = await stream.read(position, block_ms=settings.block_ms)
+                if not entries:
+                    yield ": keepalive\n\n"
+                    continue
+                for position, event in entries:
+                    data = json.dumps(event)
+                    yield f"id: {position}\nevent: revoke\ndata: {data}\n\n"
+
+        return StreamingResponse(
+            events(position),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return router
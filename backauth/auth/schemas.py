@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 
 class UserType(BaseModel):
@@ -95,6 +97,14 @@ class UserGithub(UserType):
         return self.login
 
 
+class GithubEmail(BaseModel):
+    email: str
+    primary: bool = False
+
+
+github_emails_adapter = TypeAdapter(list[GithubEmail])
+
+
 class UserDiscord(UserType):
     id: str
     username: str
@@ -116,3 +126,12 @@ class Token(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str = "Bearer"
+
+
+class SessionSchema(BaseModel):
+    id: UUID
+    issued_at: int
+    expires_at: int
+    is_blocked_access: bool
+
+    model_config = ConfigDict(from_attributes=True)
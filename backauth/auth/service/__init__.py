@@ -1,3 +1,28 @@
-from .discord import DiscordAuthService
-from .github import GithubAuthService
-from .google import GoogleAuthService
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .discord import DiscordAuthService
+    from .github import GithubAuthService
+    from .google import GoogleAuthService
+
+# Provider name -> (module, class). Modules are imported on first use only.
+PROVIDERS = {
+    "discord": ("backauth.auth.service.discord", "DiscordAuthService"),
+    "github": ("backauth.auth.service.github", "GithubAuthService"),
+    "google": ("backauth.auth.service.google", "GoogleAuthService"),
+}
+
+__all__ = ("DiscordAuthService", "GithubAuthService", "GoogleAuthService")
+
+
+def load_provider(service: str) -> Any:
+    module, name = PROVIDERS[service]
+    return getattr(import_module(module), name)
+
+
+def __getattr__(name: str) -> Any:
+    for service, (_, class_name) in PROVIDERS.items():
+        if class_name == name:
+            return load_provider(service)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,14 @@
 from typing import Any, TypeVar, Generic, Type
 
-from httpx import AsyncClient
+from httpx import AsyncClient, AsyncBaseTransport, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from backauth.auth.service import *  # type: ignore
+from backauth.auth.service import PROVIDERS, load_provider
 from backauth.auth.model.token import TokenOrm
 from backauth.auth.schemas import UserType, TokenType
+from backauth.auth.service.resilience import call_with_retry, get_breaker
 from backauth.auth.service.token_service import TokenService
-from backauth.config.setting import Config
+from backauth.config.setting import Config, OAuthBase
+from backauth.tracing import span
 
 V = TypeVar("V", bound=TokenType)
 
@@ -14,6 +16,8 @@ V = TypeVar("V", bound=TokenType)
 class AuthService(Generic[V]):
     service_name: str = NotImplementedError  # type: ignore
     model: Type[V] = NotImplementedError  # type: ignore
+    # Overridden in tests with ``httpx.MockTransport`` to fake the provider.
+    transport: AsyncBaseTransport | None = None
 
     _service_urls = {
         "google": "https://accounts.google.com/o/oauth2/v2/auth",
@@ -46,6 +50,44 @@ class AuthService(Generic[V]):
     async def get_user(self, token) -> UserType:
         raise NotImplementedError
 
+    @property
+    def settings(self) -> OAuthBase:
+        return self.conf[self.service_name]
+
+    def client(self) -> AsyncClient:
+        return AsyncClient(timeout=self.settings.timeout, transport=self.transport)
+
+    async def request(
+        self,
+        client: AsyncClient,
+        method: str,
+        url: str,
+        retries: int | None = None,
+        **kwargs: Any,
+    ) -> Response:
+        """Sends a provider request through its circuit breaker.
+
+        ``retries`` defaults to the provider settings. Pass ``0`` for requests
+        that must not be repeated, e.g. exchanging a single-use code.
+        """
+        with span(
+            f"http {method}",
+            **{
+                "http.method": method,
+                "http.url": url.split("?")[0],
+                "oauth.provider": self.service_name,
+            },
+        ) as current:
+            response = await call_with_retry(
+                lambda: client.request(method, url, **kwargs),
+                get_breaker(self.service_name, self.settings),
+                self.settings.retries if retries is None else retries,
+                self.settings.retry_backoff,
+            )
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+            return response
+
     def build_params_auth(self, service: str) -> dict[str, str]:
         data: dict[str, dict[str, Any]] = {
             "google": {
@@ -75,25 +117,25 @@ class AuthService(Generic[V]):
         }
         return data[service]
 
-    async def get_token(self, code: str, state: str) -> V:
-        service = await self.valid_state(state)
+    async def get_token(self, code: str) -> V:
         query_params = {
             "code": code,
-            "client_id": self.conf[service].id,
-            "client_secret": self.conf[service].secret,
+            "client_id": self.settings.id,
+            "client_secret": self.settings.secret,
             "redirect_uri": self.conf.redirect_uri,
-            **self.build_params_token(service),
+            **self.build_params_token(self.service_name),
         }
-        async with AsyncClient() as client:
-            response = await client.post(
+        async with self.client() as client:
+            response = await self.request(
+                client,
+                "POST",
                 self._token_urls[self.service_name],
+                retries=0,
                 params=query_params,
                 headers={"Accept": "application/json"},
             )
             if response.status_code == 200:
-                data = response.json()
-                token = self.model.model_validate(data)
-                return token
+                return self.model.model_validate_json(response.content)
             raise Exception("Invalid code")
 
     def get_auth_url(self, service: str, redirect_url: str) -> str:
@@ -110,7 +152,7 @@ class AuthService(Generic[V]):
         )
 
     def generate_state(self, service: str, redirect_uri: str):
-        return self.token_service.create_access_token(
+        return self.token_service.create_state_token(
             {
                 "service": service,
                 "redirect_url": redirect_uri,
@@ -118,14 +160,15 @@ class AuthService(Generic[V]):
         )
 
     async def valid_state(self, state: str) -> str:
-        await self.token_service.validate_token(state)
-        return self.token_service.get_token_info(state).get("service", "")
+        claims = await self.token_service.validate_state_token(state)
+        if claims is None:
+            raise ValueError("Invalid state")
+        return claims.get("service", "")
 
     def get_service(self, service: str):
-        for subclass in AuthService.__subclasses__():
-            if getattr(subclass, "service_name", None) == service:
-                return subclass(self.db, self.token_model, self.conf)
-        raise Exception("Invalid service")
+        if service not in PROVIDERS or not self.conf[service].enabled:
+            raise Exception("Invalid service")
+        return load_provider(service)(self.db, self.token_model, self.conf)
 
     async def get_service_by_state(self, state: str):
         return self.get_service(await self.valid_state(state))
@@ -1,8 +1,6 @@
-from httpx import AsyncClient
-from pydantic.v1.class_validators import Validator
 from pydantic_core import ValidationError
 
-from backauth.auth.schemas import GithubAssessToken, DiscordAssessToken, UserDiscord
+from backauth.auth.schemas import DiscordAssessToken, UserDiscord
 from backauth.auth.service.auth_service import AuthService
 
 
@@ -11,36 +9,36 @@ class DiscordAuthService(AuthService[DiscordAssessToken]):
     model = DiscordAssessToken
 
     async def get_user(self, token: DiscordAssessToken):
-        async with AsyncClient() as client:
-            response = await client.get(
+        async with self.client() as client:
+            response = await self.request(
+                client,
+                "GET",
                 "https://discord.com/api/v10/users/@me",
                 headers={"Authorization": f"Bearer {token.access_token}"},
             )
             if response.status_code == 200:
-                data = response.json()
                 try:
-                    return UserDiscord.model_validate(data)
+                    return UserDiscord.model_validate_json(response.content)
                 except ValidationError:
                     raise ValueError("Not email")
             raise Exception("Invalid token")
 
-    async def get_token(self, code: str, state: str) -> DiscordAssessToken:
-        service = await self.valid_state(state)
+    async def get_token(self, code: str) -> DiscordAssessToken:
         query_params = {
             "code": code,
             "redirect_uri": self.conf.redirect_uri,
-            **self.build_params_token(service),
+            **self.build_params_token(self.service_name),
         }
-        async with AsyncClient() as client:
-            response = await client.post(
+        async with self.client() as client:
+            response = await self.request(
+                client,
+                "POST",
                 self._token_urls[self.service_name],
+                retries=0,
                 data=query_params,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
-                auth=(self.conf[service].id, self.conf[service].secret),
+                auth=(self.settings.id, self.settings.secret),
             )
             if response.status_code == 200:
-                data = response.json()
-                token = self.model.model_validate(data)
-                return token
-            print(response.json())
-            raise Exception("Invalid code", response.json())
+                return self.model.model_validate_json(response.content)
+            raise Exception("Invalid code", response.text)
@@ -1,10 +1,10 @@
+import asyncio
 import json
 from typing import Any
 
-from httpx import AsyncClient
 from pydantic import ValidationError
 
-from backauth.auth.schemas import GithubAssessToken, UserGithub
+from backauth.auth.schemas import GithubAssessToken, UserGithub, github_emails_adapter
 from backauth.auth.service.auth_service import AuthService
 
 
@@ -13,34 +13,33 @@ class GithubAuthService(AuthService[GithubAssessToken]):
     model = GithubAssessToken
 
     async def get_user(self, token: GithubAssessToken):
-        async with AsyncClient() as client:
-            response = await client.get(
-                "https://api.github.com/user",
-                headers={"Authorization": f"Bearer {token.access_token}"},
+        headers = {"Authorization": f"Bearer {token.access_token}"}
+        async with self.client() as client:
+            response, emails = await asyncio.gather(
+                self.request(client, "GET", "https://api.github.com/user", headers=headers),
+                self.request(
+                    client, "GET", "https://api.github.com/user/emails", headers=headers
+                ),
+                return_exceptions=True,
             )
-            if response.status_code == 200:
-                data = response.json()
-                try:
-                    return UserGithub.model_validate(data)
-                except ValidationError:
-                    try:
-                        emails = await self.get_email(token)
-                        data.update({"email": emails})
-                        return UserGithub.model_validate(data)
-                    except ValidationError:
-                        raise ValueError("Not email")
-
+        if isinstance(response, BaseException):
+            raise response
+        if response.status_code != 200:
             raise Exception("Invalid token")
+        try:
+            return UserGithub.model_validate_json(response.content)
+        except ValidationError:
+            pass
+        data = json.loads(response.content)
+        data["email"] = self.get_primary_email(emails)
+        try:
+            return UserGithub.model_validate(data)
+        except ValidationError:
+            raise ValueError("Not email")
 
-    async def get_email(self, token: GithubAssessToken) -> str:
-        async with AsyncClient() as client:
-            response = await client.get(
-                "https://api.github.com/user/emails",
-                headers={"Authorization": f"Bearer {token.access_token}"},
-            )
-            if response.status_code == 200:
-                data: list[dict[str, Any]] = response.json()
-                return next(filter(lambda x: x.get("primary") is True, data), {}).get(
-                    "email", ""
-                )
-            raise Exception("Invalid token")
+    @staticmethod
+    def get_primary_email(response: Any) -> str | None:
+        if isinstance(response, BaseException) or response.status_code != 200:
+            return None
+        emails = github_emails_adapter.validate_json(response.content)
+        return next((email.email for email in emails if email.primary), None)
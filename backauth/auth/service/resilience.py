@@ -0,0 +1,125 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+from httpx import Response, TransportError
+from loguru import logger
+
+from backauth.config.setting import OAuthBase
+from backauth.error.exception import ProviderUnavailable
+
+
+class CircuitBreaker:
+    """Fails fast while a provider keeps failing.
+
+    After ``threshold`` consecutive failures the breaker opens and rejects
+    calls for ``reset_seconds``. Then a single trial call is let through:
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: int, reset_seconds: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial_running):
+            raise ProviderUnavailable(f"{self.name} is unavailable")
+        if state == "half-open":
+            self.trial_running = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            logger.warning("Circuit breaker for {} opened", self.name)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, settings: OAuthBase) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name, settings.breaker_threshold, settings.breaker_reset_seconds
+        )
+    return _breakers[name]
+
+
+async def call_with_retry(
+    call: Callable[[], Awaitable[Response]],
+    breaker: CircuitBreaker,
+    retries: int,
+    backoff: float,
+) -> Response:
+    """Runs ``call`` through ``breaker``, retrying transport errors and 5xx.
+
+    Retries wait a random time up to ``backoff * 2 ** attempt`` (full jitter).
+    Responses below 500 are returned as they are, the caller decides what
+    an unexpected status means. Anything else ending the call, cancellation
+    included, counts as a failure, so a half-open trial is never left
+    running.
+    """
+    breaker.before_call()
+    succeeded = False
+    try:
+        for attempt in range(retries + 1):
+            try:
+                response = await call()
+            except TransportError:
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code < 500:
+                    succeeded = True
+                    return response
+                if attempt == retries:
+                    return response
+            await asyncio.sleep(random.uniform(0, backoff * 2**attempt))
+        raise AssertionError("unreachable")
+    finally:
+        if succeeded:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+class StageTimer:
+    def __init__(self, name: str):
+        self.name = name
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = (time.perf_counter() - start) * 1000
+
+    def log(self) -> None:
+        logger.info(
+            "{} took {}",
+            self.name,
+            ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in self.timings.items()),
+        )
@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from backauth.config.setting import TokenSettings
+
+if TYPE_CHECKING:
+    from jwt import AbstractJWKBase
+
+_keys: dict[str, "AbstractJWKBase"] = {}
+
+
+def _load_key(path: str) -> "AbstractJWKBase":
+    key = _keys.get(path)
+    if key is None:
+        from jwt import jwk_from_pem
+
+        with open(path, "rb") as f:
+            key = _keys[path] = jwk_from_pem(f.read())
+    return key
+
+
+def loaded_key_count() -> int:
+    """Returns how many PEM keys this process has parsed and kept."""
+    return len(_keys)
+
+
+def sign_many(claims: list[dict], key_path: str, algorithm: str) -> list[str]:
+    """Signs a batch of claims.
+
+    Module level so process pools can pickle it; every worker parses the
+    private key once and keeps it.
+    """
+    from jwt import JWT
+
+    instance = JWT()
+    key = _load_key(key_path)
+    return [instance.encode(item, key, alg=algorithm) for item in claims]
+
+
+def signer_pool(settings: TokenSettings, workers: int | None = None) -> ProcessPoolExecutor:
+    """A process pool whose workers load the private key on start."""
+    return ProcessPoolExecutor(
+        workers, initializer=_load_key, initargs=(settings.private_key_path,)
+    )
@@ -1,30 +1,77 @@
 import asyncio
-import random
-import string
+import json
+import os
 import uuid
+from collections import Counter, deque
+from concurrent.futures import Executor
 from datetime import datetime, timedelta, UTC
-from typing import Optional, Type
+from typing import Any, AsyncIterator, Iterable, Optional, Type
 
 from jwt import JWT
 from jwt.exceptions import JWTDecodeError as JWTError
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backauth import tracing
+from backauth.audit import service as audit
+from backauth.auth.claims import (
+    check_size,
+    compact_claims,
+    expand_claims,
+    issued_at_ms,
+)
 from backauth.auth.model.token import TokenOrm
+from backauth.auth.repository.familyrepository import RefreshFamilyRepository
+from backauth.auth.repository.redistokenrepository import RedisTokenRepository
+from backauth.auth.repository.revocationrepository import (
+    JTI,
+    WATERMARK,
+    RevocationStream,
+)
+from backauth.auth.repository.statestore import StateStore, get_state_store
 from backauth.auth.repository.tokenrepository import TokenRepository
-from backauth.auth.schemas import Token
+from backauth.auth.repository.tokenstore import TokenStore, random_token
+from backauth.auth.repository.watermarkrepository import (
+    ACCESS,
+    GLOBAL,
+    REFRESH,
+    WatermarkRepository,
+)
+from backauth.auth.schemas import Token, SessionSchema
+from backauth.auth.service.signing import sign_many
+from backauth.config.redis import get_redis, tag
 from backauth.config.setting import Config
+from backauth.database import after_commit
+from backauth.pagination import Page, encode_cursor, decode_cursor
 from backauth.user.model import UserOrm
-from redis.asyncio import Redis
 
 jwt_instance = JWT()
-encode = jwt_instance.encode
-decode = jwt_instance.decode
+
+# Process-wide event counts, reported by the readiness endpoint.
+counters: Counter[str] = Counter()
+
+
+def encode(*args: Any, **kwargs: Any) -> str:
+    with tracing.span("jwt.sign"):
+        return jwt_instance.encode(*args, **kwargs)
+
+
+def decode(*args: Any, **kwargs: Any) -> dict:
+    with tracing.span("jwt.verify"):
+        try:
+            return jwt_instance.decode(*args, **kwargs)
+        except JWTError:
+            raise
+        except ValueError as e:
+            # Malformed segments fail in base64, UTF-8 or JSON decoding.
+            raise JWTError("Malformed token") from e
 
 
 class TokenService:
     ACCESS_TOKEN_TYPE = "access"
     REFRESH_TOKEN_TYPE = "refresh"
+    STATE_TOKEN_TYPE = "state"
+    REFRESH_TOKEN_VERSION = 1
 
     def __init__(
         self,
@@ -33,8 +80,52 @@ class TokenService:
         configuration: Config,
     ):
         self.conf = configuration
-        self.token_repository = TokenRepository(db, token_model)
-        self.redis = Redis.from_url(self.conf.redis)
+        self.db = db
+        tracing.setup(self.conf.tracing)
+        if self.conf.state_backend == "memory" and self._needs_redis():
+            raise ValueError(
+                "The memory state backend supports only SQL sessions, session "
+                "refresh tokens and jti revocation, without the revocation stream"
+            )
+        self.state: StateStore = get_state_store(self.conf)
+        self.redis = get_redis(self.conf)
+        self.token_repository: TokenStore
+        if self.conf.token.session_store == "redis":
+            self.token_repository = RedisTokenRepository(self.redis, token_model)
+        else:
+            self.token_repository = TokenRepository(db, token_model)
+        self.family_repository = RefreshFamilyRepository(self.redis)
+        self.watermark_repository = WatermarkRepository(
+            self.redis,
+            ttl=max(
+                self.conf.token.access_token_expire_minutes * 60,
+                self.conf.token.refresh_token_expire_days * 86400,
+            ),
+            cache_ttl=self.conf.token.watermark_cache_ttl_seconds,
+        )
+        self.revocation_stream: RevocationStream | None = None
+        if self.conf.revocation_stream.enabled:
+            self.revocation_stream = RevocationStream(
+                self.redis,
+                self.conf.revocation_stream.key,
+                self.conf.revocation_stream.max_length,
+            )
+
+    def _needs_redis(self) -> bool:
+        return (
+            self.conf.token.session_store == "redis"
+            or self.conf.token.refresh_mode == "stateless"
+            or self.conf.token.revocation_mode == "watermark"
+            or self.conf.revocation_stream.enabled
+        )
+
+    @property
+    def is_stateless_refresh(self) -> bool:
+        return self.conf.token.refresh_mode == "stateless"
+
+    @property
+    def is_watermark_revocation(self) -> bool:
+        return self.conf.token.revocation_mode == "watermark"
 
     async def get_token_by_oauth(self): ...
     async def get_token(self, user: UserOrm) -> Token:
@@ -50,25 +141,50 @@ class TokenService:
         jti: uuid.UUID | None = None,
         expires_delta: Optional[timedelta] = None,
     ) -> str:
-        to_encode = data.copy()
+        encoded_jwt = encode(
+            self._access_claims(data, jti, expires_delta),
+            self.conf.token.private_key,
+            alg=self.conf.token.algorithm,
+        )
+        return check_size(encoded_jwt, self.conf.token.max_token_bytes)
+
+    def create_state_token(self, data: dict) -> str:
+        """Signs an OAuth ``state``; its type keeps it from passing as an access token."""
+        return encode(
+            self._access_claims(data, token_type=self.STATE_TOKEN_TYPE),
+            self.conf.token.private_key,
+            alg=self.conf.token.algorithm,
+        )
+
+    def _access_claims(
+        self,
+        data: dict,
+        jti: uuid.UUID | None = None,
+        expires_delta: Optional[timedelta] = None,
+        token_type: str = ACCESS_TOKEN_TYPE,
+    ) -> dict:
+        if "user_id" in data:
+            to_encode = compact_claims(data, self.conf.token.claim_profile)
+        else:
+            to_encode = data.copy()
         if expires_delta:
             expire = datetime.now(UTC) + expires_delta
         else:
             expire = datetime.now(UTC) + timedelta(
                 minutes=self.conf.token.access_token_expire_minutes
             )
+        now = datetime.now(UTC)
         to_encode.update(
             {
-                "iat": int(datetime.now(UTC).timestamp()),
+                "iat": int(now.timestamp()),
                 "exp": int(expire.timestamp()),
-                "type": self.ACCESS_TOKEN_TYPE,
-                "jti": str(jti) or str(uuid.uuid4()),
+                "type": token_type,
+                "jti": str(jti or uuid.uuid4()),
             }
         )
-        encoded_jwt = encode(
-            to_encode, self.conf.token.private_key, alg=self.conf.token.algorithm
-        )
-        return encoded_jwt
+        if self.is_watermark_revocation:
+            to_encode["iat_ms"] = int(now.timestamp() * 1000)
+        return to_encode
 
     async def create_refresh_token(
         self, jti: uuid.UUID, data: dict, expires_delta: Optional[timedelta] = None
@@ -79,26 +195,41 @@ class TokenService:
             expire = datetime.now(UTC) + timedelta(
                 days=self.conf.token.refresh_token_expire_days
             )
-        res = await self.token_repository.create(
-            {
-                "id": jti,
-                "subject": str(data["user_id"]),
-                "refresh_token": self.generate_random_string(),
-                "expires_at": expire.timestamp(),
-            }
-        )
+        if self.is_stateless_refresh:
+            return await self.create_stateless_refresh_token(
+                jti, str(data["user_id"]), expire
+            )
+        refresh_token = self.token_repository.new_refresh_token(data["user_id"])
+        session = {
+            "id": jti,
+            "subject": str(data["user_id"]),
+            "refresh_token": refresh_token,
+            "expires_at": int(expire.timestamp()),
+        }
+        limit = self.conf.token.max_sessions_per_subject
+        if limit:
+            ids = await self.token_repository.create_capped(session, limit)
+            await self._sessions_evicted(data["user_id"], ids)
+        else:
+            await self.token_repository.create(session)
+        return refresh_token
 
-        return res.refresh_token
+    async def _sessions_evicted(
+        self, subject: uuid.UUID | str, ids: list[uuid.UUID]
+    ) -> None:
+        """Blacklists the access tokens of sessions evicted by the cap."""
+        if not ids:
+            return
+        counters["sessions_evicted"] += len(ids)
+        await audit.emit(audit.SESSION_EVICTED, subject, count=len(ids))
+        await after_commit(self.db, lambda: self._blacklist([str(_id) for _id in ids]))
 
     async def create_access_token_by_refresh(
-        self, refresh_token: str, user: UserOrm
+        self, token_entity: TokenOrm, payload: dict
     ) -> Token:
-        token_entity = await self.get_info_from_refresh(refresh_token)
-        payload = await self.get_payload(user)
         exp = timedelta(seconds=token_entity.expires_at) - timedelta(
             seconds=datetime.now(UTC).timestamp()
         )
-        await self.token_repository.delete(token_entity.id)
         _id = uuid.uuid4()
         access_token = self.create_access_token(payload, jti=_id)
         new_refresh_token = await self.create_refresh_token(
@@ -106,19 +237,227 @@ class TokenService:
         )
         return Token(access_token=access_token, refresh_token=new_refresh_token)
 
-    async def validate_token(self, token: str) -> bool:
+    async def create_stateless_refresh_token(
+        self, jti: uuid.UUID, subject: str, expire: datetime
+    ) -> str:
+        family = uuid.uuid4()
+        ttl = int(expire.timestamp() - datetime.now(UTC).timestamp())
+        await self.family_repository.create(family, subject, jti, max(ttl, 1))
+        return self._encode_refresh_token(
+            subject, str(family), 0, int(expire.timestamp())
+        )
+
+    async def rotate_stateless_refresh_token(self, refresh_token: str) -> dict:
         try:
+            claims = decode(refresh_token, self.conf.token.public_key)
+        except JWTError:
+            raise ValueError("Invalid refresh token")
+        if (
+            claims.get("type") != self.REFRESH_TOKEN_TYPE
+            or claims.get("ver") != self.REFRESH_TOKEN_VERSION
+        ):
+            raise ValueError("Invalid refresh token")
+        if await self.is_revoked(claims["sub"], issued_at_ms(claims), REFRESH):
+            raise ValueError("Invalid refresh token")
+        jti = uuid.uuid4()
+        generation, replayed = await self.family_repository.rotate(
+            claims["sub"], claims["fam"], claims["gen"], jti
+        )
+        if replayed is not None:
+            await audit.emit(
+                audit.REVOKE, claims["sub"], reason="refresh_replay", jti=replayed
+            )
+            await self._blacklist([replayed])
+        if generation <= 0:
+            raise ValueError("Invalid refresh token")
+        claims.update({"gen": generation, "jti": str(jti)})
+        return claims
 
-            payload = decode(
-                token,
-                self.conf.token.public_key,
+    async def create_access_token_by_stateless_refresh(
+        self, claims: dict, payload: dict
+    ) -> Token:
+        access_token = self.create_access_token(payload, jti=uuid.UUID(claims["jti"]))
+        refresh_token = self._encode_refresh_token(
+            claims["sub"], claims["fam"], claims["gen"], claims["exp"]
+        )
+        return Token(access_token=access_token, refresh_token=refresh_token)
+
+    def _encode_refresh_token(
+        self, subject: str, family: str, generation: int, expires_at: int
+    ) -> str:
+        return encode(
+            self._refresh_claims(subject, family, generation, expires_at),
+            self.conf.token.private_key,
+            alg=self.conf.token.algorithm,
+        )
+
+    def _refresh_claims(
+        self, subject: str, family: str, generation: int, expires_at: int
+    ) -> dict:
+        now = datetime.now(UTC)
+        claims = {
+            "sub": subject,
+            "fam": family,
+            "gen": generation,
+            "ver": self.REFRESH_TOKEN_VERSION,
+            "type": self.REFRESH_TOKEN_TYPE,
+            "iat": int(now.timestamp()),
+            "exp": expires_at,
+        }
+        if self.is_watermark_revocation:
+            claims["iat_ms"] = int(now.timestamp() * 1000)
+        return claims
+
+    async def mint_tokens(
+        self,
+        users: Iterable[UserOrm | dict],
+        executor: Executor | None = None,
+        batch_size: int = 500,
+        concurrency: int | None = None,
+    ) -> AsyncIterator[Token]:
+        """Issues tokens for many users or payloads, yielding them in order.
+
+        Claims are signed in batches on ``executor`` (e.g. ``signer_pool``;
+        the loop's default executor when not given) with up to
+        ``concurrency`` batches in flight, one per CPU by default, while
+        finished batches have their sessions stored with one write each.
+        """
+        if concurrency is None:
+            concurrency = os.cpu_count() or 1
+        loop = asyncio.get_running_loop()
+        in_flight: deque[tuple[asyncio.Future[list[str]], list[dict]]] = deque()
+        batch: list[dict] = []
+        for user in users:
+            batch.append(user if isinstance(user, dict) else await self.get_payload(user))
+            if len(batch) < batch_size:
+                continue
+            in_flight.append(self._sign_batch(loop, executor, batch))
+            batch = []
+            if len(in_flight) >= concurrency:
+                for token in await self._store_batch(*in_flight.popleft()):
+                    yield token
+        if batch:
+            in_flight.append(self._sign_batch(loop, executor, batch))
+        while in_flight:
+            for token in await self._store_batch(*in_flight.popleft()):
+                yield token
+
+    def _sign_batch(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        executor: Executor | None,
+        payloads: list[dict],
+    ) -> tuple[asyncio.Future[list[str]], list[dict]]:
+        expire = int(
+            (
+                datetime.now(UTC)
+                + timedelta(days=self.conf.token.refresh_token_expire_days)
+            ).timestamp()
+        )
+        sessions: list[dict[str, Any]] = []
+        claims = []
+        for payload in payloads:
+            jti = uuid.uuid4()
+            claims.append(self._access_claims(payload, jti))
+            sessions.append(
+                {
+                    "id": jti,
+                    "subject": str(payload["user_id"]),
+                    "expires_at": expire,
+                }
             )
-            if await self.is_token_blacklisted(payload.get("jti", "")):
-                return False
-            return True
+        if self.is_stateless_refresh:
+            for session in sessions:
+                session["family"] = uuid.uuid4()
+                claims.append(
+                    self._refresh_claims(
+                        session["subject"], str(session["family"]), 0, expire
+                    )
+                )
+        future = loop.run_in_executor(
+            executor,
+            sign_many,
+            claims,
+            self.conf.token.private_key_path,
+            self.conf.token.algorithm,
+        )
+        return future, sessions
+
+    async def _store_batch(
+        self, future: asyncio.Future[list[str]], sessions: list[dict]
+    ) -> list[Token]:
+        signed = await future
+        access_tokens = [
+            check_size(token, self.conf.token.max_token_bytes)
+            for token in signed[: len(sessions)]
+        ]
+        if self.is_stateless_refresh:
+            refresh_tokens = signed[len(sessions) :]
+            ttl = max(sessions[0]["expires_at"] - self._now(), 1)
+            await self.family_repository.create_many(
+                [
+                    (session["family"], session["subject"], session["id"])
+                    for session in sessions
+                ],
+                ttl,
+            )
+        else:
+            refresh_tokens = [
+                self.token_repository.new_refresh_token(session["subject"])
+                for session in sessions
+            ]
+            await self.token_repository.create_many(
+                [
+                    {**session, "refresh_token": refresh_token}
+                    for session, refresh_token in zip(sessions, refresh_tokens)
+                ]
+            )
+        return [
+            Token(access_token=access_token, refresh_token=refresh_token)
+            for access_token, refresh_token in zip(access_tokens, refresh_tokens)
+        ]
+
+    async def validate_token(self, token: str) -> bool:
+        return await self.authenticate(token) is not None
 
+    async def authenticate(self, token: str) -> dict | None:
+        """Returns the claims of a valid, not revoked access token, otherwise ``None``.
+
+        Refresh and state tokens are signed with the same key, so the type,
+        the user id and the jti are checked before anything else.
+        """
+        try:
+            payload = expand_claims(decode(token, self.conf.token.public_key))
         except JWTError:
-            return False
+            return None
+        if (
+            payload.get("type") != self.ACCESS_TOKEN_TYPE
+            or not payload.get("user_id")
+            or not payload.get("jti")
+        ):
+            return None
+        if await self.is_token_blacklisted(payload["jti"]):
+            return None
+        if await self.is_revoked(
+            payload.get("user_id"),
+            issued_at_ms(payload),
+            ACCESS,
+            payload.get("scopes"),
+        ):
+            return None
+        return payload
+
+    async def validate_state_token(self, state: str) -> dict | None:
+        """Returns the claims of a valid, not blacklisted OAuth state, otherwise ``None``."""
+        try:
+            payload = decode(state, self.conf.token.public_key)
+        except JWTError:
+            return None
+        if payload.get("type") != self.STATE_TOKEN_TYPE:
+            return None
+        if await self.is_token_blacklisted(payload.get("jti", "")):
+            return None
+        return expand_claims(payload)
 
     def get_token_info(self, token: str) -> dict:
         payload = decode(
@@ -126,7 +465,7 @@ class TokenService:
             self.conf.token.public_key,
             do_verify=True,
         )
-        return payload
+        return expand_claims(payload)
 
     async def get_info_from_refresh(self, refresh_token: str) -> TokenOrm:
         token_entity = await self.token_repository.get_by_refresh_token(refresh_token)
@@ -134,6 +473,45 @@ class TokenService:
             raise ValueError("Invalid refresh token")
         return token_entity
 
+    async def pop_refresh_token(self, refresh_token: str) -> TokenOrm:
+        token_entity = await self.token_repository.pop_by_refresh_token(refresh_token)
+        if not token_entity or token_entity.expires_at < datetime.now(UTC).timestamp():
+            raise ValueError("Invalid refresh token")
+        if await self.is_revoked(
+            token_entity.subject, token_entity.issued_at * 1000, REFRESH
+        ):
+            raise ValueError("Invalid refresh token")
+        return token_entity
+
+    async def get_cached_payload(self, subject: uuid.UUID | str) -> dict | None:
+        if self.conf.token.payload_cache_ttl_seconds <= 0:
+            return None
+        key = self._payload_key(subject)
+        res = await self.state.get(key)
+        if res is None:
+            return None
+        return json.loads(res)
+
+    async def cache_payload(self, payload: dict) -> None:
+        if self.conf.token.payload_cache_ttl_seconds <= 0:
+            return
+        key = self._payload_key(payload["user_id"])
+        await self.state.set(
+            key, json.dumps(payload), ex=self.conf.token.payload_cache_ttl_seconds
+        )
+
+    async def invalidate_payload(self, subject: uuid.UUID | str) -> None:
+        key = self._payload_key(subject)
+        await after_commit(self.db, lambda: self.state.delete(key))
+
+    @staticmethod
+    def _payload_key(subject: uuid.UUID | str) -> str:
+        return f"payload:{tag(subject)}"
+
+    @staticmethod
+    def _blacklist_key(jti: uuid.UUID | str) -> str:
+        return f"token:{tag(jti)}"
+
     @staticmethod
     async def get_payload(user: UserOrm) -> dict:
         payload = {
@@ -150,38 +528,161 @@ class TokenService:
         return payload
 
     async def blacklist_access_token(self, subject: uuid.UUID):
+        if self.is_watermark_revocation:
+            await after_commit(self.db, lambda: self._revoke_subject(subject))
+            return
         tokens = await self.token_repository.block(subject)
-        task = []
-        for token in tokens:
-            task.append(
-                self.redis.set(
-                    f"token:{token.id}",
-                    "block",
-                    ex=self.conf.token.access_token_expire_minutes * 60,
-                )
-            )
-        await asyncio.gather(*task)
+        jtis = [str(token.id) for token in tokens]
+
+        async def revoke() -> None:
+            if self.is_stateless_refresh:
+                jtis.extend(await self.family_repository.get_jti_by_sub(subject))
+            await self._blacklist(jtis)
+
+        await after_commit(self.db, revoke)
 
     async def blacklist_refresh_token(self, subject: uuid.UUID):
+        if self.is_watermark_revocation:
+            await after_commit(
+                self.db, lambda: self._revoke_subject(subject, refresh=True)
+            )
+            return
         tokens = await self.token_repository.full_block(subject)
-        task = []
-        for token in tokens:
-            task.append(
-                self.redis.set(
-                    f"token:{token.id}",
-                    "block",
-                    ex=self.conf.token.access_token_expire_minutes * 60,
-                )
+        jtis = [str(token.id) for token in tokens]
+
+        async def revoke() -> None:
+            if self.is_stateless_refresh:
+                jtis.extend(await self.family_repository.revoke_by_sub(subject))
+            await self._blacklist(jtis)
+
+        await after_commit(self.db, revoke)
+
+    async def _revoke_subject(self, subject: uuid.UUID, refresh: bool = False) -> None:
+        before = self._now_ms()
+        await self.watermark_repository.revoke_subject(subject, before, refresh)
+        fields = [ACCESS, REFRESH] if refresh else [ACCESS]
+        await self._publish_watermark(str(subject), fields, before)
+
+    async def revoke_scope(self, scope: str, before: int | None = None) -> None:
+        """Revokes every access token carrying ``scope`` issued up to ``before``.
+
+        ``before`` is a Unix timestamp in seconds and includes that whole
+        second; by default everything issued so far is revoked.
+        """
+        before = self._before_ms(before)
+        await self.watermark_repository.revoke_scope(scope, before)
+        await self._publish_watermark(GLOBAL, [f"scope:{scope}"], before)
+
+    async def revoke_all(self, before: int | None = None) -> None:
+        """Revokes every token issued up to ``before``, for incidents."""
+        before = self._before_ms(before)
+        await self.watermark_repository.revoke_all(before)
+        await self._publish_watermark(GLOBAL, [GLOBAL], before)
+
+    async def _publish_watermark(
+        self, key: str, fields: list[str], before: int
+    ) -> None:
+        if self.revocation_stream is None:
+            return
+        expires_at = self._now() + self.watermark_repository.ttl
+        await self.revocation_stream.publish(
+            [
+                {
+                    "type": WATERMARK,
+                    "key": key,
+                    "field": field,
+                    "before": before,
+                    "exp": expires_at,
+                }
+                for field in fields
+            ]
+        )
+
+    async def is_revoked(
+        self,
+        subject: uuid.UUID | str | None,
+        issued_at: int,
+        kind: str = ACCESS,
+        scopes: list | None = None,
+    ) -> bool:
+        """Checks an issue time in milliseconds against the watermarks."""
+        if not self.is_watermark_revocation:
+            return False
+        watermark = await self.watermark_repository.get_watermark(
+            subject,
+            kind,
+            [scope for scope in scopes or () if isinstance(scope, str)],
+        )
+        return issued_at <= watermark
+
+    @staticmethod
+    def _now() -> int:
+        return int(datetime.now(UTC).timestamp())
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(datetime.now(UTC).timestamp() * 1000)
+
+    def _before_ms(self, before: int | None) -> int:
+        return before * 1000 + 999 if before else self._now_ms()
+
+    async def get_sessions(
+        self, subject: uuid.UUID, limit: int, cursor: str | None = None
+    ) -> Page[SessionSchema]:
+        after = None
+        if cursor:
+            issued_at, _id = decode_cursor(cursor, 2)
+            try:
+                after = (int(issued_at), uuid.UUID(_id))
+            except ValueError:
+                raise ValueError("Invalid cursor")
+        tokens = await self.token_repository.get_page_by_sub(
+            subject, int(datetime.now(UTC).timestamp()), limit + 1, after
+        )
+        items = [SessionSchema.model_validate(token) for token in tokens]
+        if self.is_watermark_revocation:
+            # Sessions come newest first, so revoked ones form the tail.
+            access_mark, refresh_mark = await asyncio.gather(
+                self.watermark_repository.get_watermark(subject, ACCESS),
+                self.watermark_repository.get_watermark(subject, REFRESH),
+            )
+            items = [item for item in items if item.issued_at * 1000 > refresh_mark]
+            for item in items:
+                item.is_blocked_access |= item.issued_at * 1000 <= access_mark
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].issued_at, items[-1].id)
+        return Page[SessionSchema](items=items, next_cursor=next_cursor)
+
+    async def revoke_session(self, subject: uuid.UUID, jti: uuid.UUID) -> None:
+        if not await self.token_repository.full_block_one(subject, jti):
+            raise ValueError("Session not found")
+        await audit.emit(audit.REVOKE, subject, reason="revoke_session", jti=str(jti))
+        await after_commit(self.db, lambda: self._blacklist([str(jti)]))
+
+    async def _blacklist(self, jtis: list[str]) -> None:
+        ttl = self.conf.token.access_token_expire_minutes * 60
+        await self.state.set_many(
+            [self._blacklist_key(jti) for jti in jtis], "block", ex=ttl
+        )
+        if self.revocation_stream is not None:
+            expires_at = self._now() + ttl
+            await self.revocation_stream.publish(
+                [{"type": JTI, "jti": jti, "exp": expires_at} for jti in jtis]
             )
-        await asyncio.gather(*task)
 
     async def is_token_blacklisted(self, _id: str) -> bool:  # type: ignore
-        res = await self.redis.get(f"token:{_id}")
+        key = self._blacklist_key(_id)
+        res = await self.state.get(key)
         if res:
             return True
         return False
 
+    async def are_tokens_blacklisted(self, ids: list[str]) -> list[bool]:
+        res = await self.state.get_many([self._blacklist_key(_id) for _id in ids])
+        return [value is not None for value in res]
+
     @staticmethod
     def generate_random_string(length: int = 128) -> str:
-        charset = string.ascii_letters + string.digits
-        return "".join(random.choice(charset) for _ in range(length))
+        return random_token(length)
@@ -0,0 +1,136 @@
+import asyncio
+from typing import Any, Sequence
+
+from redis.asyncio import Redis, RedisCluster
+from redis.commands.core import AsyncScript
+from redis.crc import key_slot
+
+from backauth.config.setting import Config
+from backauth.tracing import instrument_redis
+
+RedisClient = Redis | RedisCluster
+
+
+def tag(value: Any) -> str:
+    """Wraps ``value`` in a hash tag, so every key built with it maps to one slot."""
+    return "{" + str(value) + "}"
+
+
+class RoutedScript:
+    """A Lua script registered on every node, run on the node owning ``keys[0]``.
+
+    All keys of one call must share a hash tag. Scripts are run directly on
+    the client, which loads them into a node's script cache on ``NOSCRIPT``;
+    cluster pipelines do neither, so scripts are never queued in a pipeline.
+    """
+
+    def __init__(self, router: "RedisRouter", script: str):
+        self.router = router
+        self._scripts: list[AsyncScript] = [
+            client.register_script(script)  # type: ignore[misc]
+            for client in router.clients
+        ]
+
+    async def __call__(self, keys: Sequence[str], args: Sequence[Any] = ()) -> Any:
+        script = self._scripts[self.router.index(keys[0])]
+        return await script(keys=keys, args=args)
+
+
+class RedisRouter:
+    """Picks the Redis client owning a key.
+
+    With one Redis node or a Redis Cluster there is a single client (the
+    cluster client routes by slot itself). With client-side sharding every
+    key goes to the node picked by the cluster slot of its hash tag, so keys
+    sharing a tag always end up on the same node and can be used together in
+    pipelines and scripts. Batch reads and writes are split per node and run
+    in parallel.
+    """
+
+    def __init__(self, clients: list[RedisClient]):
+        if not clients:
+            raise ValueError("At least one Redis client is required")
+        self.clients = clients
+
+    def index(self, key: str) -> int:
+        if len(self.clients) == 1:
+            return 0
+        return key_slot(key.encode()) % len(self.clients)
+
+    def for_key(self, key: str) -> RedisClient:
+        return self.clients[self.index(key)]
+
+    def register_script(self, script: str) -> RoutedScript:
+        return RoutedScript(self, script)
+
+    def _group(self, keys: Sequence[str]) -> dict[int, list[int]]:
+        groups: dict[int, list[int]] = {}
+        for position, key in enumerate(keys):
+            groups.setdefault(self.index(key), []).append(position)
+        return groups
+
+    async def mget(self, keys: Sequence[str]) -> list[Any]:
+        if not keys:
+            return []
+
+        async def shard_mget(index: int, positions: list[int]) -> list[Any]:
+            client = self.clients[index]
+            shard_keys = [keys[position] for position in positions]
+            if isinstance(client, RedisCluster):
+                return await client.mget_nonatomic(shard_keys)
+            return await client.mget(shard_keys)
+
+        groups = self._group(keys)
+        results = await asyncio.gather(
+            *(shard_mget(index, positions) for index, positions in groups.items())
+        )
+        values: list[Any] = [None] * len(keys)
+        for positions, shard_values in zip(groups.values(), results):
+            for position, value in zip(positions, shard_values):
+                values[position] = value
+        return values
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        groups = self._group(keys)
+        await asyncio.gather(
+            *(
+                self.clients[index].delete(*(keys[position] for position in positions))
+                for index, positions in groups.items()
+            )
+        )
+
+    async def set_many(self, keys: Sequence[str], value: Any, ex: int) -> None:
+        async def shard_set(index: int, positions: list[int]) -> None:
+            async with self.clients[index].pipeline(transaction=False) as pipe:
+                for position in positions:
+                    pipe.set(keys[position], value, ex=ex)
+                await pipe.execute()
+
+        if keys:
+            await asyncio.gather(
+                *(shard_set(index, positions) for index, positions in self._group(keys).items())
+            )
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(client.aclose() for client in self.clients))
+
+
+_routers: dict[tuple[str, tuple[str, ...]], RedisRouter] = {}
+
+
+def get_redis(conf: Config) -> RedisRouter:
+    """Returns the router for ``conf``, creating its clients on first use."""
+    urls = tuple(conf.redis_shards) if conf.redis_mode == "sharded" else ()
+    key = (conf.redis_mode, urls or (conf.redis,))
+    router = _routers.get(key)
+    if router is None:
+        if conf.redis_mode == "cluster":
+            clients: list[RedisClient] = [RedisCluster.from_url(conf.redis)]
+        else:
+            clients = [Redis.from_url(url) for url in key[1]]
+        router = _routers[key] = RedisRouter(
+            [instrument_redis(client) for client in clients]
+        )
+    return router
@@ -1,11 +1,23 @@
 import os
+from functools import cached_property
+from typing import Literal, TYPE_CHECKING
 
-from jwt import jwk_from_pem, AbstractJWKBase
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
+
+if TYPE_CHECKING:
+    from jwt import AbstractJWKBase
+
+
 class OAuthBase(BaseSettings):
     client_id: str
     client_secret: str
     enabled: bool = False
+    timeout: float = 10.0
+    retries: int = 2
+    retry_backoff: float = 0.2
+    breaker_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
 
     @property
     def id(self) -> str:
@@ -41,21 +53,82 @@ class TokenSettings(BaseSettings):
     algorithm: str = "RS256"
     access_token_expire_minutes: int = 60
     refresh_token_expire_days: int = 7
+    payload_cache_ttl_seconds: int = 60
+    refresh_mode: Literal["session", "stateless"] = "session"
+    session_store: Literal["sql", "redis"] = "sql"
+    revocation_mode: Literal["jti", "watermark"] = "jti"
+    watermark_cache_ttl_seconds: float = 1.0
+    claim_profile: Literal["minimal", "standard", "full"] = "full"
+    max_token_bytes: int | None = None
+    max_sessions_per_subject: int | None = Field(default=None, ge=1)
+
+    @cached_property
+    def private_key(self)  -> "AbstractJWKBase":
+        from jwt import jwk_from_pem
 
-    @property
-    def private_key(self)  -> AbstractJWKBase:
         if not os.path.exists(self.private_key_path):
             raise FileNotFoundError(f"Private key file not found: {self.private_key_path}")
         with open(self.private_key_path, "rb") as f:
             return  jwk_from_pem(f.read())
 
-    @property
-    def public_key(self) -> AbstractJWKBase:
+    @cached_property
+    def public_key(self) -> "AbstractJWKBase":
+        from jwt import jwk_from_pem
+
         if not os.path.exists(self.public_key_path):
-            raise FileNotFoundError(f"Private key file not found: {self.private_key_path}")
+            raise FileNotFoundError(f"Public key file not found: {self.public_key_path}")
         with open(self.public_key_path, "rb") as f:
             return  jwk_from_pem(f.read())
 
+class PasswordSettings(BaseSettings):
+    bcrypt_rounds: int | None = None
+    target_verify_ms: float = 250.0
+    min_rounds: int = 10
+    max_rounds: int = 16
+
+
+class AuditSettings(BaseSettings):
+    queue_size: int = 10000
+    batch_size: int = 500
+    flush_interval_seconds: float = 1.0
+    drop_policy: Literal["drop_new", "drop_oldest", "block"] = "drop_new"
+
+
+class DatabaseSettings(BaseSettings):
+    query_cache_size: int = 1200
+    prepared_statement_cache_size: int = 500
+    pool_size: int = 10
+    max_overflow: int = 20
+    unit_of_work: bool = False
+
+
+class ProfilingSettings(BaseSettings):
+    enabled: bool = False
+    sample_rate: float = 0.0
+    header: str = "x-backauth-profile"
+    header_token: str = ""
+    interval_ms: float = 1.0
+    output_dir: str = "profiles"
+
+
+class TracingSettings(BaseSettings):
+    exporter: Literal["none", "memory", "file", "otel"] = "none"
+    file_path: str = "traces.ndjson"
+
+
+class WarmupSettings(BaseSettings):
+    enabled: bool = True
+    db_connections: int = 2
+    redis_connections: int = 2
+
+
+class RevocationStreamSettings(BaseSettings):
+    enabled: bool = False
+    key: str = "revocations"
+    max_length: int = 100_000
+    block_ms: int = 15_000
+
+
 class Config(BaseSettings):
 
     redirect_uri: str
@@ -65,7 +138,18 @@ class Config(BaseSettings):
     github: GithubOAuth = GithubOAuth()
 
     token: TokenSettings = TokenSettings()
+    password: PasswordSettings = PasswordSettings()
+    audit: AuditSettings = AuditSettings()
+    database: DatabaseSettings = DatabaseSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    tracing: TracingSettings = TracingSettings()
+    warmup: WarmupSettings = WarmupSettings()
+    revocation_stream: RevocationStreamSettings = RevocationStreamSettings()
     redis: str = "redis://localhost:6379"
+    redis_mode: Literal["single", "cluster", "sharded"] = "single"
+    redis_shards: list[str] = []
+    state_backend: Literal["redis", "memory"] = "redis"
+    state_max_entries: int = 1_000_000
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore",
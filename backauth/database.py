@@ -0,0 +1,133 @@
+import inspect
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar, cast
+
+from loguru import logger
+from sqlalchemy import Executable
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from backauth.config.setting import DatabaseSettings
+
+S = TypeVar("S", bound=Executable)
+
+_statements: dict[tuple[type, str], Any] = {}
+
+_UNIT_OF_WORK = "backauth_unit_of_work"
+
+
+def cached_statement(model: type, name: str, build: Callable[[], S]) -> S:
+    """Builds a statement once per model and returns the same object afterwards.
+
+    Values must be passed as bound parameters at execution time, so the
+    statement is constructed once and SQLAlchemy finds its compiled form
+    through the memoized cache key.
+    """
+    key = (model, name)
+    statement = _statements.get(key)
+    if statement is None:
+        statement = _statements[key] = build()
+    return statement
+
+
+def statement_cache_size() -> int:
+    """Returns how many statements ``cached_statement`` has built so far."""
+    return len(_statements)
+
+
+def create_engine(
+    url: str, settings: DatabaseSettings = DatabaseSettings(), **kwargs: Any
+) -> AsyncEngine:
+    """Creates an engine with the statement caches sized from ``settings``.
+
+    On asyncpg every connection also keeps up to
+    ``prepared_statement_cache_size`` prepared statements.
+    """
+    parsed = make_url(url)
+    connect_args = kwargs.pop("connect_args", {})
+    if parsed.get_driver_name() == "asyncpg":
+        connect_args.setdefault(
+            "prepared_statement_cache_size", settings.prepared_statement_cache_size
+        )
+    options: dict[str, Any] = {"query_cache_size": settings.query_cache_size}
+    if parsed.get_backend_name() != "sqlite":
+        options.update(pool_size=settings.pool_size, max_overflow=settings.max_overflow)
+    return create_async_engine(url, connect_args=connect_args, **options | kwargs)
+
+
+@asynccontextmanager
+async def open_session(get_session: Any) -> AsyncIterator[AsyncSession]:
+    """Opens a session from a FastAPI session dependency outside of a request.
+
+    Used where the work outlives the request scope, e.g. the warmup or the
+    body of a streaming response, which FastAPI sends after closing the
+    request's dependencies.
+    """
+    source = get_session()
+    if inspect.isasyncgen(source):
+        try:
+            yield cast(AsyncSession, await anext(source))
+        finally:
+            await source.aclose()
+        return
+    if inspect.isawaitable(source):
+        source = await source
+    async with source as session:
+        yield session
+
+
+def in_unit_of_work(session: AsyncSession) -> bool:
+    return _UNIT_OF_WORK in session.info
+
+
+async def commit(session: AsyncSession) -> None:
+    """Commits the session, or only flushes it inside a unit of work."""
+    if in_unit_of_work(session):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+async def after_commit(
+    session: AsyncSession, callback: Callable[[], Awaitable[Any]]
+) -> None:
+    """Runs ``callback`` once the data written so far is committed.
+
+    Inside a unit of work the callback is queued until its commit succeeds
+    and dropped on rollback; outside of one it runs right away.
+    """
+    callbacks = session.info.get(_UNIT_OF_WORK)
+    if callbacks is None:
+        await callback()
+    else:
+        callbacks.append(callback)
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """Runs the block in one transaction with a single commit.
+
+    Repository writes only flush while the block runs; the session is
+    committed when it exits and rolled back if it raises. Callbacks queued
+    with ``after_commit`` run after the commit, in order; their failures
+    are logged, as the transaction cannot be undone anymore. A nested
+    block joins the outer one.
+    """
+    if in_unit_of_work(session):
+        yield session
+        return
+    callbacks: list[Callable[[], Awaitable[Any]]] = []
+    session.info[_UNIT_OF_WORK] = callbacks
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        del session.info[_UNIT_OF_WORK]
+    for callback in callbacks:
+        try:
+            await callback()
+        except Exception:
+            logger.exception("After-commit callback failed")
@@ -20,3 +20,6 @@ class ClientNotFound(GoogleException): ...
 
 
 class ClientSecretNotFound(GoogleException): ...
+
+
+class ProviderUnavailable(CustomException): ...
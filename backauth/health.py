@@ -0,0 +1,271 @@
+import asyncio
+import inspect
+import time
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Sequence, Type
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from backauth.auth.model.token import TokenOrm
+from backauth.auth.repository import watermarkrepository
+from backauth.auth.repository.statestore import MemoryStateStore, get_state_store
+from backauth.auth.repository.tokenrepository import TokenRepository
+from backauth.auth.service import signing
+from backauth.auth.service import token_service
+from backauth.auth.service.token_service import TokenService
+from backauth.config.redis import RedisRouter, get_redis
+from backauth.config.setting import Config
+from backauth.database import open_session, statement_cache_size
+from backauth.user.model import UserOrm
+from backauth.user.password import get_rounds, measure_verify_ms
+from backauth.user.repository import UserRepository
+
+_warmup: dict[str, Any] = {"done": False, "stages": {}, "errors": {}}
+
+
+def _engine(session: AsyncSession) -> AsyncEngine | None:
+    bind = session.bind
+    return bind if isinstance(bind, AsyncEngine) else None
+
+
+async def _open_db_connections(engine: AsyncEngine, count: int) -> None:
+    size = getattr(engine.sync_engine.pool, "size", None)
+    if size is not None:
+        count = min(count, size())
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(text("SELECT 1"))
+
+
+async def _open_redis_connections(redis: RedisRouter, count: int) -> None:
+    # Concurrent pings each take a connection, so the pools grow to ``count``.
+    await asyncio.gather(
+        *(client.ping() for client in redis.clients for _ in range(count))
+    )
+
+
+async def _compile_statements(
+    session: AsyncSession,
+    token_model: Type[TokenOrm],
+    user_model: Type[UserOrm],
+    configuration: Config,
+) -> None:
+    missing = uuid.uuid4()
+    users = UserRepository(session, user_model)
+    await users.get_by_id(missing)
+    await users.get_by_email("")
+    await users.get_by_username("")
+    if configuration.token.session_store == "sql":
+        tokens = TokenRepository(session, token_model)
+        await tokens.get_by_id(missing)
+        await tokens.get_by_refresh_token("")
+        await tokens.get_page_by_sub(missing, 0, 1)
+    await session.rollback()
+
+
+def _sign_and_verify(service: TokenService) -> None:
+    token = service.create_access_token({"user_id": str(uuid.uuid4()), "scopes": []})
+    service.get_token_info(token)
+
+
+def _warm_bcrypt(configuration: Config) -> None:
+    get_rounds(configuration.password)
+    measure_verify_ms(configuration.password.min_rounds, samples=1)
+
+
+async def warmup(
+    get_session: Any,
+    token_model: Type[TokenOrm],
+    user_model: Type[UserOrm],
+    configuration: Config,
+) -> dict[str, Any]:
+    """Pays the first-request costs before the app takes traffic.
+
+    Opens ``configuration.warmup`` DB and Redis connections, loads the PEM
+    keys, compiles the hot lookups by running them for a missing id, signs
+    and verifies one access token and calibrates bcrypt. A failing stage is
+    logged and its exception type reported by the readiness endpoint, but
+    it does not stop the others. Returns the duration of every stage in milliseconds.
+    """
+    settings = configuration.warmup
+    stages: dict[str, float] = {}
+    errors: dict[str, str] = {}
+
+    async def stage(name: str, run: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        try:
+            result = run()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.exception("Warmup stage {} failed", name)
+            errors[name] = type(e).__name__
+        stages[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    async with open_session(get_session) as session:
+        service = TokenService(session, token_model, configuration)
+        if configuration.state_backend == "redis":
+            await stage(
+                "redis",
+                lambda: _open_redis_connections(
+                    service.redis, settings.redis_connections
+                ),
+            )
+        engine = _engine(session)
+        if engine is not None:
+            await stage(
+                "database",
+                lambda: _open_db_connections(engine, settings.db_connections),
+            )
+        await stage(
+            "statements",
+            lambda: _compile_statements(
+                session, token_model, user_model, configuration
+            ),
+        )
+        await stage(
+            "keys",
+            lambda: (configuration.token.private_key, configuration.token.public_key),
+        )
+        await stage("jwt", lambda: _sign_and_verify(service))
+        await stage("bcrypt", lambda: asyncio.to_thread(_warm_bcrypt, configuration))
+    _warmup.update(done=True, stages=stages, errors=errors)
+    logger.info("Warmup finished in {:.1f} ms", sum(stages.values()))
+    return stages
+
+
+def warmup_lifespan(
+    get_session: Any,
+    token_model: Type[TokenOrm],
+    user_model: Type[UserOrm],
+    configuration: Config,
+) -> Callable[[Any], Any]:
+    """Returns a lifespan running ``warmup`` once on startup.
+
+    Pass it to ``FastAPI(lifespan=...)`` or to an ``APIRouter``; the health
+    router registers it itself.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: Any) -> AsyncIterator[None]:
+        if configuration.warmup.enabled and not _warmup["done"]:
+            await warmup(get_session, token_model, user_model, configuration)
+        yield
+
+    return lifespan
+
+
+def _pool_stats(engine: AsyncEngine | None) -> dict[str, Any]:
+    if engine is None:
+        return {}
+    pool = engine.sync_engine.pool
+    stats: dict[str, Any] = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    return stats
+
+
+def _redis_pool_stats(client: Any) -> dict[str, Any]:
+    pool = getattr(client, "connection_pool", None)
+    if pool is None:
+        return {"class": type(client).__name__}
+    return {
+        "max": pool.max_connections,
+        "created": len(getattr(pool, "_in_use_connections", ()))
+        + len(getattr(pool, "_available_connections", ())),
+        "in_use": len(getattr(pool, "_in_use_connections", ())),
+    }
+
+
+async def _timed(check: Callable[[], Any]) -> dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        await check()
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+
+def health_router(
+    get_session: Any,
+    token_model: Type[TokenOrm],
+    user_model: Type[UserOrm],
+    configuration: Config,
+    dependencies: Sequence[Any] = (),
+) -> APIRouter:
+    """
+    Creates the liveness and readiness endpoints and registers the warmup.
+
+    Args:
+        get_session: Session factory function for database access.
+        token_model: Token ORM model class.
+        user_model: User ORM model class.
+        configuration: Application configuration.
+        dependencies: Dependencies guarding both endpoints, e.g. a check that
+            the caller is inside the cluster. Readiness exposes pool sizes
+            and counters.
+
+    Returns:
+        APIRouter: Router with ``/health/live`` and ``/health/ready``. Readiness
+        answers 503 until the warmup finished or while the database or a
+        Redis node does not respond.
+    """
+    router = APIRouter(
+        prefix="/health",
+        tags=["health"],
+        dependencies=list(dependencies),
+        default_response_class=ORJSONResponse,
+        lifespan=warmup_lifespan(get_session, token_model, user_model, configuration),
+    )
+
+    @router.get("/live")
+    async def live() -> dict:
+        return {"status": "ok"}
+
+    @router.get("/ready")
+    async def ready(session: AsyncSession = Depends(get_session)) -> ORJSONResponse:
+        clients = []
+        if configuration.state_backend == "redis":
+            clients = get_redis(configuration).clients
+        database, *nodes = await asyncio.gather(
+            _timed(lambda: session.execute(text("SELECT 1"))),
+            *(_timed(client.ping) for client in clients),
+        )
+        state = get_state_store(configuration)
+        is_ready = (
+            (_warmup["done"] or not configuration.warmup.enabled)
+            and database["ok"]
+            and all(node["ok"] for node in nodes)
+        )
+        body = {
+            "status": "ready" if is_ready else "unavailable",
+            "warmup": _warmup,
+            "dependencies": {"database": database, "redis": nodes},
+            "pools": {
+                "database": _pool_stats(_engine(session)),
+                "redis": [_redis_pool_stats(client) for client in clients],
+            },
+            "counters": dict(token_service.counters),
+            "caches": {
+                "statements": statement_cache_size(),
+                "watermarks": watermarkrepository.cache_size(),
+                "signing_keys": signing.loaded_key_count(),
+                "state_entries": (
+                    len(state) if isinstance(state, MemoryStateStore) else None
+                ),
+                "state_overflows": (
+                    state.overflows if isinstance(state, MemoryStateStore) else None
+                ),
+            },
+        }
+        return ORJSONResponse(body, status_code=200 if is_ready else 503)
+
+    return router
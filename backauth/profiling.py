@@ -0,0 +1,152 @@
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+from backauth.asgi import ASGIApp, Message, Receive, Scope, Send
+from backauth.config.setting import ProfilingSettings
+
+AWAITING = "(awaiting)"
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+    return name.replace(";", ":")
+
+
+class _Profile:
+    """Stack samples of one request."""
+
+    def __init__(self, root: FrameType):
+        self.root = root
+        self.stacks: Counter[str] = Counter()
+
+    def sample(self, frame: FrameType | None) -> None:
+        names = []
+        while frame is not None and frame is not self.root:
+            names.append(_frame_name(frame))
+            frame = frame.f_back
+        if frame is None:
+            # The loop runs another task or waits, this request is awaiting.
+            self.stacks[AWAITING] += 1
+        elif names:
+            self.stacks[";".join(reversed(names))] += 1
+
+
+class _Sampler:
+    """Samples the event loop thread while at least one request is profiled."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: set[_Profile] = set()
+        self.thread_id = threading.get_ident()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, profile: _Profile) -> None:
+        self.profiles.add(profile)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="backauth-profiler", daemon=True
+            )
+            self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, profile: _Profile) -> None:
+        self.profiles.discard(profile)
+
+    def _run(self) -> None:
+        while True:
+            # Cleared before the check: an ``add`` racing with it either
+            # shows up in ``profiles`` or sets the event after the clear.
+            self._wakeup.clear()
+            if not self.profiles:
+                self._wakeup.wait()
+                continue
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            for profile in list(self.profiles):
+                profile.sample(frame)
+
+
+class ProfilingMiddleware:
+    """Opt-in sampling profiler for single requests.
+
+    A request is profiled when it carries ``settings.header`` with the
+    value of ``settings.header_token``, or otherwise with probability
+    ``settings.sample_rate``. While it runs, a background thread samples
+    the event loop stack every ``settings.interval_ms``; samples where the
+    request was not on the stack are counted as ``(awaiting)``. Each
+    profile is written to ``settings.output_dir`` in the collapsed-stack
+    format read by flamegraph.pl and speedscope, with the method, route
+    and status as the root frame and in the file name.
+
+    When ``settings.enabled`` is false the request is passed on untouched.
+    """
+
+    def __init__(self, app: ASGIApp, settings: ProfilingSettings):
+        self.app = app
+        self.settings = settings
+        self._header = settings.header.lower().encode()
+        self._token = settings.header_token.encode()
+        self._sampler: _Sampler | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.settings.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send)
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self._token:
+            for name, value in scope["headers"]:
+                if name == self._header:
+                    return hmac.compare_digest(value, self._token)
+        return random.random() < self.settings.sample_rate
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._sampler is None:
+            self._sampler = _Sampler(self.settings.interval_ms / 1000)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profile = _Profile(sys._getframe())
+        self._sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._sampler.remove(profile)
+            route = str(getattr(scope.get("route"), "path", scope["path"]))
+            await asyncio.to_thread(
+                self._write, profile, scope["method"], route, status
+            )
+
+    def _write(self, profile: _Profile, method: str, route: str, status: int) -> None:
+        if not profile.stacks:
+            return
+        os.makedirs(self.settings.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(
+            self.settings.output_dir,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}"
+            f"-{method}-{slug}-{status}.folded",
+        )
+        root = f"{method} {route} {status}"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{root};{stack} {count}\n")
@@ -0,0 +1,223 @@
+import functools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterator,
+    ParamSpec,
+    Protocol,
+    TypeVar,
+)
+
+from backauth.config.setting import TracingSettings
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class Span:
+    """A finished or running span, shaped like an OpenTelemetry span."""
+
+    trace_id: str
+    span_id: str
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "end",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time_ns()
+        self.end: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time_ns()) - self.start) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class InMemoryExporter:
+    """Keeps finished spans in ``spans``, for tests."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class FileExporter:
+    """Appends finished spans to an NDJSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+_exporter: SpanExporter | None = None
+_otel_tracer: Any = None
+_settings: TracingSettings | None = None
+_current: ContextVar[Span | None] = ContextVar("backauth_span", default=None)
+
+
+def configure(exporter: SpanExporter | None) -> None:
+    """Sends spans to ``exporter``; ``None`` turns tracing off."""
+    global _exporter, _otel_tracer
+    _exporter = exporter
+    _otel_tracer = None
+
+
+def setup(settings: TracingSettings) -> None:
+    """Configures tracing from ``settings``, once per settings object."""
+    global _settings, _otel_tracer
+    if settings is _settings:
+        return
+    _settings = settings
+    if settings.exporter == "memory":
+        configure(InMemoryExporter())
+    elif settings.exporter == "file":
+        configure(FileExporter(settings.file_path))
+    elif settings.exporter == "otel":
+        try:
+            from opentelemetry import trace  # type: ignore[import-not-found]
+        except ImportError:
+            raise RuntimeError(
+                "tracing.exporter is 'otel' but opentelemetry-api is not installed"
+            )
+        configure(None)
+        _otel_tracer = trace.get_tracer("backauth")
+    else:
+        configure(None)
+
+
+def get_exporter() -> SpanExporter | None:
+    return _exporter
+
+
+def is_enabled() -> bool:
+    return _exporter is not None or _otel_tracer is not None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Records the block as a span, a no-op while tracing is off.
+
+    Attributes must never contain secrets: no tokens, passwords or codes.
+    """
+    if _otel_tracer is not None:
+        with _otel_tracer.start_as_current_span(name, attributes=attributes) as s:
+            yield s
+        return
+    if _exporter is None:
+        yield None
+        return
+    current = Span(name, _current.get(), attributes)
+    reset = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.end = time.time_ns()
+        _current.reset(reset)
+        _exporter.export(current)
+
+
+def traced(
+    name: str,
+) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Coroutine[Any, Any, T]]]:
+    """Decorates a coroutine function to run inside a span."""
+
+    def decorator(
+        func: Callable[P, Awaitable[T]],
+    ) -> Callable[P, Coroutine[Any, Any, T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            if not is_enabled():
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_redis(client: Any) -> Any:
+    """Wraps the commands and pipelines of a Redis client in spans."""
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def traced_command(*args: Any, **options: Any) -> Any:
+        if not is_enabled():
+            return await execute_command(*args, **options)
+        command = str(args[0]).split(" ")[0].upper()
+        with span(f"redis {command}", **{"db.system": "redis", "db.operation": command}):
+            return await execute_command(*args, **options)
+
+    def traced_pipeline(*args: Any, **kwargs: Any) -> Any:
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def traced_execute(*a: Any, **kw: Any) -> Any:
+            if not is_enabled():
+                return await execute(*a, **kw)
+            with span(
+                "redis pipeline",
+                **{"db.system": "redis", "db.redis.commands": len(pipe)},
+            ):
+                return await execute(*a, **kw)
+
+        pipe.execute = traced_execute
+        return pipe
+
+    client.execute_command = traced_command
+    client.pipeline = traced_pipeline
+    return client
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import sys
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, UTC
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Literal, Type
+from uuid import uuid4
+
+from bcrypt import gensalt, hashpw
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backauth.database import create_engine
+from backauth.user.model import UserOrm
+from backauth.user.repository import UserRepository
+from backauth.user.schema import (
+    UserImportSchema,
+    UserImportErrorSchema,
+    UserImportReportSchema,
+)
+
+Format = Literal["csv", "ndjson"]
+
+EXPORT_FIELDS = (
+    "id",
+    "email",
+    "username",
+    "hashed_password",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_superuser",
+    "oauth_provider",
+    "oauth_id",
+    "created_at",
+)
+
+HASH_CHUNK_SIZE = 64
+
+
+def hash_passwords(passwords: list[str], rounds: int | None = None) -> list[bytes]:
+    """Hashes a chunk of passwords. Module level so process pools can pickle it."""
+    return [
+        hashpw(password.encode(), gensalt(rounds) if rounds else gensalt())
+        for password in passwords
+    ]
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode().rstrip("\r")
+    if buffer:
+        yield buffer.decode().rstrip("\r")
+
+
+async def export_lines(
+    rows: AsyncIterable[dict[str, Any]], fmt: Format
+) -> AsyncIterator[str]:
+    header: list[str] | None = None
+    async for row in rows:
+        if fmt == "ndjson":
+            yield json.dumps(row, default=str) + "\n"
+            continue
+        if header is None:
+            header = list(row)
+            yield _csv_line(header)
+        yield _csv_line(
+            [
+                " ".join(map(str, value)) if isinstance(value, list) else value
+                for value in (row.get(field) for field in header)
+            ]
+        )
+
+
+def _csv_line(values: Iterable[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(
+        "" if value is None else value for value in values
+    )
+    return buffer.getvalue()
+
+
+def user_to_row(user: UserOrm) -> dict[str, Any]:
+    row = {field: getattr(user, field) for field in EXPORT_FIELDS}
+    if row["hashed_password"] is not None:
+        row["hashed_password"] = row["hashed_password"].decode()
+    row["id"] = str(row["id"])
+    row["created_at"] = row["created_at"].isoformat()
+    return row
+
+
+class UserImporter:
+    """Imports users from CSV or NDJSON lines in batches.
+
+    Rows are validated with ``UserImportSchema``; plain passwords are hashed
+    on ``executor`` (the loop's default executor when not given) and every
+    batch is written with one multi-row ``INSERT ... ON CONFLICT DO NOTHING``.
+    Invalid and conflicting rows end up in the report instead of aborting
+    the import.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        model: Type[UserOrm],
+        batch_size: int = 1000,
+        executor: Executor | None = None,
+        rounds: int | None = None,
+    ):
+        self.repository = UserRepository(session, model)
+        self.batch_size = batch_size
+        self.executor = executor
+        self.rounds = rounds
+
+    async def run(
+        self, lines: AsyncIterable[str], fmt: Format
+    ) -> UserImportReportSchema:
+        report = UserImportReportSchema()
+        batch: list[tuple[int, UserImportSchema]] = []
+        async for line, data in self._parse(lines, fmt, report):
+            try:
+                batch.append((line, UserImportSchema.model_validate(data)))
+            except ValidationError as e:
+                error = e.errors()[0]
+                message = error["msg"]
+                if error["loc"]:
+                    message = ".".join(map(str, error["loc"])) + ": " + message
+                report.errors.append(UserImportErrorSchema(line=line, error=message))
+                continue
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, report)
+                batch = []
+        if batch:
+            await self._flush(batch, report)
+        return report
+
+    def _parse(
+        self, lines: AsyncIterable[str], fmt: Format, report: UserImportReportSchema
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        if fmt == "ndjson":
+            return self._parse_ndjson(lines, report)
+        return self._parse_csv(lines, report)
+
+    async def _parse_ndjson(
+        self, lines: AsyncIterable[str], report: UserImportReportSchema
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                report.errors.append(
+                    UserImportErrorSchema(line=line_number, error="Invalid JSON")
+                )
+                continue
+            if not isinstance(data, dict):
+                report.errors.append(
+                    UserImportErrorSchema(
+                        line=line_number, error="Expected a JSON object"
+                    )
+                )
+                continue
+            yield line_number, data
+
+    async def _parse_csv(
+        self, lines: AsyncIterable[str], report: UserImportReportSchema
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        # Quoted fields may span lines. Lines are collected until their quotes
+        # balance, and each complete record is fed to the one reader, which
+        # keeps the newlines inside its quoted fields.
+        records: deque[str] = deque()
+        reader = csv.reader(iter(records.popleft, None))
+        header: list[str] | None = None
+        pending: list[str] = []
+        quotes = 0
+        line_number = start = 0
+        async for line in lines:
+            line_number += 1
+            if not pending:
+                if not line.strip():
+                    continue
+                start = line_number
+            pending.append(line)
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            records.append("\n".join(pending))
+            pending, quotes = [], 0
+            try:
+                values = next(reader)
+            except csv.Error as e:
+                report.errors.append(UserImportErrorSchema(line=start, error=str(e)))
+                continue
+            if header is None:
+                header = values
+                continue
+            if len(values) != len(header):
+                report.errors.append(
+                    UserImportErrorSchema(
+                        line=start,
+                        error=f"Expected {len(header)} columns, got {len(values)}",
+                    )
+                )
+                continue
+            yield start, {
+                key: value for key, value in zip(header, values) if value != ""
+            }
+        if pending:
+            report.errors.append(
+                UserImportErrorSchema(line=start, error="Unterminated quoted field")
+            )
+
+    async def _hash(self, passwords: list[str]) -> list[bytes]:
+        loop = asyncio.get_running_loop()
+        chunks = [
+            passwords[i : i + HASH_CHUNK_SIZE]
+            for i in range(0, len(passwords), HASH_CHUNK_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor, hash_passwords, chunk, self.rounds
+                )
+                for chunk in chunks
+            )
+        )
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def _flush(
+        self,
+        batch: list[tuple[int, UserImportSchema]],
+        report: UserImportReportSchema,
+    ) -> None:
+        plain = [user.password for _, user in batch if user.password]
+        hashes = iter(await self._hash(plain)) if plain else iter(())
+        now = datetime.now(UTC)
+        rows = []
+        for _, user in batch:
+            data = user.model_dump(exclude={"password", "hashed_password"})
+            if user.password:
+                data["hashed_password"] = next(hashes)
+            elif user.hashed_password:
+                data["hashed_password"] = user.hashed_password.encode()
+            else:
+                data["hashed_password"] = None
+            data.update({"id": uuid4(), "created_at": now, "updated_at": now})
+            rows.append(data)
+        inserted = Counter(await self.repository.insert_many(rows))
+        report.inserted += inserted.total()
+        for line, user in batch:
+            if inserted[user.email] > 0:
+                inserted[user.email] -= 1
+            else:
+                report.errors.append(
+                    UserImportErrorSchema(
+                        line=line, error="Email or username already exists"
+                    )
+                )
+
+
+def _load_model(path: str) -> Type[UserOrm]:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+async def _file_lines(file: Iterable[str]) -> AsyncIterator[str]:
+    for line in file:
+        yield line.rstrip("\r\n")
+
+
+async def _iter_user_rows(
+    repository: UserRepository, page_size: int
+) -> AsyncIterator[dict[str, Any]]:
+    after = None
+    while True:
+        users = await repository.get_page(page_size, after)
+        for user in users:
+            yield user_to_row(user)
+        if len(users) < page_size:
+            return
+        after = (users[-1].created_at, users[-1].id)
+        repository.session.expunge_all()
+
+
+async def _run(args: argparse.Namespace) -> int:
+    model = _load_model(args.user_model)
+    engine = create_engine(args.database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with session_factory() as session:
+            if args.command == "export":
+                # Only files opened here are closed, never stdout.
+                output = (
+                    nullcontext(sys.stdout)
+                    if args.path == "-"
+                    else open(args.path, "w", encoding="utf-8", newline="")
+                )
+                with output as file:
+                    rows = _iter_user_rows(
+                        UserRepository(session, model), args.batch_size
+                    )
+                    async for line in export_lines(rows, args.format):
+                        file.write(line)
+                return 0
+
+            source = (
+                nullcontext(sys.stdin)
+                if args.path == "-"
+                else open(args.path, encoding="utf-8", newline="")
+            )
+            with source as file, ProcessPoolExecutor(args.workers) as executor:
+                report = await UserImporter(
+                    session, model, args.batch_size, executor, args.rounds
+                ).run(_file_lines(file), args.format)
+            print(report.model_dump_json(indent=2))
+            return 1 if report.errors else 0
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m backauth.user.bulk",
+        description="Bulk import or export users as CSV or NDJSON.",
+    )
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="Input or output file, - for stdin/stdout")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument(
+        "--user-model",
+        required=True,
+        help="Import path of the user model, e.g. app.models:User",
+    )
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--rounds", type=int, default=None, help="bcrypt cost of hashed passwords"
+    )
+    return asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,8 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from bcrypt import hashpw, gensalt, checkpw
 
+from backauth.tracing import span
+
 
 class UserScopeOrm:
     __tablename__ = "user_scope"
@@ -51,21 +53,23 @@ class UserOrm:
     oauth_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), default=datetime.now(tz=UTC), nullable=False
+        DateTime(timezone=True), default=lambda: datetime.now(tz=UTC), nullable=False
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
-        onupdate=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
         nullable=False,
     )
 
     def is_valid_password(self, password: str) -> bool:
         if not self.hashed_password:
             return False
-        return checkpw(password.encode(), self.hashed_password)
+        with span("bcrypt.verify"):
+            return checkpw(password.encode(), self.hashed_password)
 
-    def set_password(self, password: str) -> None:
-        salt = gensalt()
-        hashed = hashpw(password.encode(), salt)
+    def set_password(self, password: str, rounds: int | None = None) -> None:
+        salt = gensalt(rounds) if rounds else gensalt()
+        with span("bcrypt.hash", rounds=rounds):
+            hashed = hashpw(password.encode(), salt)
         self.hashed_password = hashed
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from bcrypt import checkpw, gensalt, hashpw
+
+from backauth.config.setting import PasswordSettings
+from backauth.tracing import span
+
+# bcrypt's own default cost, calibration never goes below it.
+MIN_CALIBRATED_ROUNDS = 12
+
+_calibrated: dict[tuple[float, int, int], int] = {}
+
+
+def measure_verify_ms(rounds: int, samples: int = 3) -> float:
+    hashed = hashpw(b"calibration", gensalt(rounds))
+    start = time.perf_counter()
+    for _ in range(samples):
+        checkpw(b"calibration", hashed)
+    return (time.perf_counter() - start) * 1000 / samples
+
+
+def hash_password(password: str, rounds: int | None = None) -> bytes:
+    with span("bcrypt.hash", rounds=rounds):
+        return hashpw(password.encode(), gensalt(rounds) if rounds else gensalt())
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Returns the highest cost whose verify time stays within ``target_ms``.
+
+    Only ``min_rounds`` is measured, every further round doubles the work.
+    """
+    verify_ms = measure_verify_ms(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and verify_ms * 2 <= target_ms:
+        rounds += 1
+        verify_ms *= 2
+    return rounds
+
+
+def _calibration_key(settings: PasswordSettings) -> tuple[float, int, int]:
+    return settings.target_verify_ms, settings.min_rounds, settings.max_rounds
+
+
+def get_rounds(settings: PasswordSettings) -> int:
+    """Returns the configured cost, calibrating it once per process.
+
+    Calibration hashes with bcrypt and blocks; from a coroutine use
+    ``load_rounds``.
+    """
+    if settings.bcrypt_rounds:
+        return settings.bcrypt_rounds
+    key = _calibration_key(settings)
+    if key not in _calibrated:
+        _calibrated[key] = max(calibrate_rounds(*key), MIN_CALIBRATED_ROUNDS)
+    return _calibrated[key]
+
+
+async def load_rounds(settings: PasswordSettings) -> int:
+    """Like ``get_rounds``, but calibrates in a worker thread."""
+    if settings.bcrypt_rounds:
+        return settings.bcrypt_rounds
+    rounds = _calibrated.get(_calibration_key(settings))
+    if rounds is None:
+        rounds = await asyncio.to_thread(get_rounds, settings)
+    return rounds
+
+
+def get_cost(hashed: bytes) -> int:
+    return int(hashed.split(b"$")[2])
+
+
+def needs_rehash(hashed: bytes, rounds: int) -> bool:
+    """Only upgrades: a hash stronger than ``rounds`` is kept as it is."""
+    return get_cost(hashed) < rounds
+
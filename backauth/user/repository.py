@@ -1,9 +1,15 @@
-from typing import Any, Type
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Type
 from uuid import UUID
 
-from sqlalchemy import select, update, delete, Executable, or_
+from sqlalchemy import bindparam, select, update, delete, Executable, or_, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
+from backauth.database import cached_statement, commit
+from backauth.tracing import traced
 from backauth.user.model import UserOrm
 
 
@@ -11,54 +17,155 @@ class UserRepository:
     session: AsyncSession
     model: type[UserOrm]
 
-    def __init__(self, session: AsyncSession, model: Type[UserOrm]):
+    def __init__(
+        self,
+        session: AsyncSession,
+        model: Type[UserOrm],
+        password_rounds: int | None = None,
+    ):
         self.session = session
         self.model = model
+        self.password_rounds = password_rounds
+
+    def _statement(self, name: str, build: Callable[[], Executable]) -> Executable:
+        return cached_statement(self.model, name, build)
 
-    async def _get_user(self, statement: Executable):
-        result = await self.session.execute(statement)
+    async def _get_user(self, statement: Executable, params: dict[str, Any]):
+        result = await self.session.execute(statement, params)
         return result.unique().scalar_one_or_none()
 
+    @traced("UserRepository.get_by_id")
     async def get_by_id(self, _id: UUID) -> UserOrm | None:
-        stmt = select(self.model).where(self.model.id == _id)
-        return await self._get_user(stmt)
+        stmt = self._statement(
+            "get_by_id",
+            lambda: select(self.model).where(self.model.id == bindparam("id_")),
+        )
+        return await self._get_user(stmt, {"id_": _id})
 
+    @traced("UserRepository.get_by_email")
     async def get_by_email(self, email: str) -> UserOrm | None:
-        stmt = select(self.model).where(self.model.email == email)
-        return await self._get_user(stmt)
+        stmt = self._statement(
+            "get_by_email",
+            lambda: select(self.model).where(self.model.email == bindparam("email_")),
+        )
+        return await self._get_user(stmt, {"email_": email})
 
+    @traced("UserRepository.get_by_email_and_username_and_provider")
     async def get_by_email_and_username_and_provider(
         self, email: str, username: str, provider: str
     ):
-        stmt = select(self.model).where(
-            or_(self.model.email == email, self.model.username == username),
-            self.model.oauth_provider != provider,
+        stmt = self._statement(
+            "get_by_email_and_username_and_provider",
+            lambda: select(self.model).where(
+                or_(
+                    self.model.email == bindparam("email_"),
+                    self.model.username == bindparam("username_"),
+                ),
+                self.model.oauth_provider != bindparam("provider_"),
+            ),
+        )
+        return await self._get_user(
+            stmt, {"email_": email, "username_": username, "provider_": provider}
         )
 
-        return await self._get_user(stmt)
+    @traced("UserRepository.get_by_email_or_username")
+    async def get_by_email_or_username(
+        self, email: str, username: str
+    ) -> list[UserOrm]:
+        stmt = self._statement(
+            "get_by_email_or_username",
+            lambda: select(self.model).where(
+                or_(
+                    self.model.email == bindparam("email_"),
+                    self.model.username == bindparam("username_"),
+                )
+            ),
+        )
+        result = await self.session.execute(
+            stmt, {"email_": email, "username_": username}
+        )
+        return list(result.unique().scalars().all())
 
+    @traced("UserRepository.get_by_username")
     async def get_by_username(self, username: str) -> UserOrm | None:
-        stmt = select(self.model).where(self.model.username == username)
-        return await self._get_user(stmt)
+        stmt = self._statement(
+            "get_by_username",
+            lambda: select(self.model).where(
+                self.model.username == bindparam("username_")
+            ),
+        )
+        return await self._get_user(stmt, {"username_": username})
+
+    @traced("UserRepository.get_page")
+    async def get_page(
+        self,
+        limit: int,
+        after: tuple[datetime, UUID] | None = None,
+        oauth_provider: str | None = None,
+        is_active: bool | None = None,
+        scope: str | None = None,
+        search: str | None = None,
+    ) -> list[UserOrm]:
+        stmt = select(self.model).options(selectinload(self.model.scopes))
+        if after is not None:
+            stmt = stmt.where(tuple_(self.model.created_at, self.model.id) > after)
+        if oauth_provider is not None:
+            stmt = stmt.where(self.model.oauth_provider == oauth_provider)
+        if is_active is not None:
+            stmt = stmt.where(self.model.is_active == is_active)
+        if scope is not None:
+            stmt = stmt.where(self.model.scopes.any(name=scope))
+        if search:
+            stmt = stmt.where(
+                or_(
+                    self.model.email.startswith(search, autoescape=True),
+                    self.model.username.startswith(search, autoescape=True),
+                )
+            )
+        stmt = stmt.order_by(self.model.created_at, self.model.id).limit(limit)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
 
+    @traced("UserRepository.update")
     async def update(self, _id: UUID, data: dict[str, Any]) -> None:
         stmt = update(self.model).where(self.model.id == _id).values(**data)
         await self.session.execute(stmt)
-        await self.session.commit()
+        await commit(self.session)
 
+    @traced("UserRepository.delete")
     async def delete(self, _id: UUID) -> None:
-        stmt = delete(self.model).where(self.model.id == _id)
-        await self.session.execute(stmt)
-        await self.session.commit()
+        stmt = self._statement(
+            "delete",
+            lambda: delete(self.model).where(self.model.id == bindparam("id_")),
+        )
+        await self.session.execute(stmt, {"id_": _id})
+        await commit(self.session)
 
+    @traced("UserRepository.create")
     async def create(self, data: dict[str, Any]) -> UserOrm:
         password = None
         if data.get("password"):
             password = data.pop("password")
         user = self.model(**data)
         if password:
-            user.set_password(password)
+            await asyncio.to_thread(user.set_password, password, self.password_rounds)
         self.session.add(user)
-        await self.session.commit()
+        await commit(self.session)
         await self.session.refresh(user)
         return user
+
+    @traced("UserRepository.insert_many")
+    async def insert_many(self, rows: list[dict[str, Any]]) -> list[str]:
+        dialect = self.session.get_bind().dialect.name
+        stmt: postgresql.Insert | sqlite.Insert
+        if dialect == "postgresql":
+            stmt = postgresql.insert(self.model)
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(self.model)
+        else:
+            raise ValueError(f"Bulk insert is not supported for {dialect}")
+        result = await self.session.execute(
+            stmt.on_conflict_do_nothing().returning(self.model.email), rows
+        )
+        await commit(self.session)
+        return list(result.scalars().all())
@@ -2,18 +2,24 @@ from typing import Annotated, Type, AsyncGenerator, Any, Awaitable, Callable
 from uuid import UUID
 from fastapi.exceptions import HTTPException
 from fastapi import status
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Query, Request
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backauth.auth.model.token import TokenOrm
+from backauth.auth.schemas import SessionSchema
 from backauth.auth.service.token_service import TokenService
 from backauth.config.setting import Config
+from backauth.database import open_session
+from backauth.pagination import Page
+from backauth.user.bulk import Format, export_lines, iter_lines
 from backauth.user.model import UserOrm
 from backauth.user.schema import (
     UserRegisterSchema,
     UserResponseSchema,
     UserUpdateSchema,
     UserPayloadSchema,
+    UserImportReportSchema,
 )
 from backauth.user.service import UserService
 from fastapi.security import (
@@ -21,6 +27,10 @@ from fastapi.security import (
 )
 
 
+# Output keys of UserPayloadSchema, /@me returns them straight from full claims.
+PAYLOAD_FIELDS = ("user_id", "username", "email", "first_name", "last_name", "scopes")
+
+
 def users_router(
     get_session: Any,
     token_model: Type[TokenOrm],
@@ -44,6 +54,8 @@ def users_router(
         dependency_overrides: Dictionary of dependency overrides. Should contain:
             - is_authenticated: Dependency function for authentication path /@me.
             - update_delete_get: Dependency function for CRUD operations.
+            - is_admin: Optional dependency function guarding the user
+              listing and export endpoints. They are not registered without it.
         configuration: Application configuration.
 
     Returns:
@@ -82,26 +94,45 @@ def users_router(
     is_owner = dependency_overrides["update_delete_get"]
 
     router = APIRouter(
-        prefix="", tags=["users"], dependencies=[Depends(is_authenticated)]
+        prefix="",
+        tags=["users"],
+        dependencies=[Depends(is_authenticated)],
+        default_response_class=ORJSONResponse,
+    )
+    public_router = APIRouter(
+        prefix="/users", tags=["users"], default_response_class=ORJSONResponse
     )
-    public_router = APIRouter(prefix="/users", tags=["users"])
     service_user = Annotated[UserService, Depends(create_user_service_dep)]
     service_token_depends = Annotated[TokenService, Depends(create_token_service)]
 
     @router.get("/@me", response_model=UserPayloadSchema)
     async def read_users_me(
-        service: service_token_depends, token: str = Depends(oauth2_scheme)
+        service: service_user, token: str = Depends(oauth2_scheme)
     ):
-        """Gets current authenticated user's information from token.
+        """Gets current authenticated user's information.
+
+        Tokens of the ``full`` claim profile carry every field, so they are
+        answered from the claims; the compact profiles leave some out and
+        the missing ones are read from the user in the database.
 
         Args:
-            service: Token service instance
+            service: User service instance
             token: OAuth2 access token
 
         Returns:
             Current user payload data
         """
-        return service.get_token_info(token)
+        claims = await service.token_service.authenticate(token)
+        if claims is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if not all(field in claims for field in PAYLOAD_FIELDS):
+            user = await service.get_user(UUID(claims["user_id"]))
+            claims = {**await service.token_service.get_payload(user), **claims}
+        return ORJSONResponse({field: claims[field] for field in PAYLOAD_FIELDS})
 
     @public_router.post("/", response_model=user_read_schema)
     async def create_user(user: user_register_schema, service: service_user):  # type: ignore
@@ -116,6 +147,113 @@ def users_router(
         """
         return await service.register(user)
 
+    if is_admin := dependency_overrides.get("is_admin"):
+
+        @router.get(
+            "/",
+            response_model=Page[user_read_schema],  # type: ignore
+            dependencies=[Depends(is_admin)],
+        )
+        async def get_users(
+            service: service_user,
+            limit: int = Query(50, ge=1, le=500),
+            cursor: str | None = None,
+            oauth_provider: str | None = None,
+            is_active: bool | None = None,
+            scope: str | None = None,
+            search: str | None = None,
+        ):
+            """Lists users ordered by creation time.
+
+            Args:
+                service: User service instance
+                limit: Maximum number of users per page
+                cursor: Cursor returned as next_cursor by the previous page
+                oauth_provider: Only users registered through this provider
+                is_active: Only active or only inactive users
+                scope: Only users having this scope
+                search: Email or username prefix
+
+            Returns:
+                Page of users
+            """
+            users, next_cursor = await service.get_users(
+                limit,
+                cursor,
+                oauth_provider=oauth_provider,
+                is_active=is_active,
+                scope=scope,
+                search=search,
+            )
+            return {"items": users, "next_cursor": next_cursor}
+
+        @router.get("/export", dependencies=[Depends(is_admin)])
+        async def export_users(
+            format: Format = "ndjson",
+            oauth_provider: str | None = None,
+            is_active: bool | None = None,
+            scope: str | None = None,
+            search: str | None = None,
+        ) -> StreamingResponse:
+            """Streams all matching users as NDJSON or CSV.
+
+            The body streams after the request's dependencies are closed, so
+            it reads through a session of its own.
+
+            Args:
+                format: Output format, ndjson or csv
+                oauth_provider: Only users registered through this provider
+                is_active: Only active or only inactive users
+                scope: Only users having this scope
+                search: Email or username prefix
+
+            Returns:
+                Streaming response with one user per line
+            """
+
+            async def rows():
+                async with open_session(get_session) as session:
+                    service = UserService(
+                        session, user_model, token_model, configuration
+                    )
+                    async for user in service.iter_users(
+                        oauth_provider=oauth_provider,
+                        is_active=is_active,
+                        scope=scope,
+                        search=search,
+                    ):
+                        yield user_read_schema.model_validate(user).model_dump(
+                            mode="json"
+                        )
+
+            return StreamingResponse(
+                export_lines(rows(), format),
+                media_type="application/x-ndjson" if format == "ndjson" else "text/csv",
+            )
+
+        @router.post(
+            "/import",
+            response_model=UserImportReportSchema,
+            dependencies=[Depends(is_admin)],
+        )
+        async def import_users(
+            service: service_user, request: Request, format: Format = "ndjson"
+        ):
+            """Imports users streamed in the request body.
+
+            Each line is a user in NDJSON, or a CSV row after a header line.
+            Rows carry either ``password`` or a bcrypt ``hashed_password``.
+
+            Args:
+                service: User service instance
+                request: Incoming request whose body is read as a stream
+                format: Input format, ndjson or csv
+
+            Returns:
+                Number of inserted users and per-line errors
+            """
+            return await service.import_users(iter_lines(request.stream()), format)
+
     @router.put("/{_id}", status_code=204, dependencies=[Depends(is_owner)])
     async def update_user(
         _id: UUID,
@@ -156,5 +294,42 @@ def users_router(
         """
         return await service.get_user(_id)
 
+    @router.get(
+        "/{_id}/sessions",
+        response_model=Page[SessionSchema],
+        dependencies=[Depends(is_owner)],
+    )
+    async def get_sessions(
+        _id: UUID,
+        service: service_token_depends,
+        limit: int = Query(50, ge=1, le=100),
+        cursor: str | None = None,
+    ):
+        """Lists active sessions of a user, newest first.
+
+        Args:
+            _id: User ID whose sessions are listed
+            service: Token service instance
+            limit: Maximum number of sessions per page
+            cursor: Cursor returned as next_cursor by the previous page
+
+        Returns:
+            Page of sessions
+        """
+        return await service.get_sessions(_id, limit, cursor)
+
+    @router.delete(
+        "/{_id}/sessions/{jti}", status_code=204, dependencies=[Depends(is_owner)]
+    )
+    async def revoke_session(_id: UUID, jti: UUID, service: service_token_depends):
+        """Revokes a single session of a user.
+
+        Args:
+            _id: User ID owning the session
+            jti: Session ID to revoke
+            service: Token service instance
+        """
+        return await service.revoke_session(_id, jti)
+
     public_router.include_router(router)
     return public_router
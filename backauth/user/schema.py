@@ -38,6 +38,37 @@ class UserUpdateSchema(BaseModel):
     last_name: str | None
 
 
+class UserImportSchema(BaseModel):
+    email: str
+    username: str
+    password: str | None = None
+    hashed_password: str | None = Field(
+        default=None, pattern=r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$"
+    )
+    first_name: str | None = None
+    last_name: str | None = None
+    is_active: bool = True
+    is_superuser: bool = False
+    oauth_provider: str | None = None
+    oauth_id: str | None = None
+
+    @model_validator(mode="after")
+    def check_single_password(self) -> "UserImportSchema":
+        if self.password and self.hashed_password:
+            raise ValueError("Only one of password and hashed_password is allowed")
+        return self
+
+
+class UserImportErrorSchema(BaseModel):
+    line: int
+    error: str
+
+
+class UserImportReportSchema(BaseModel):
+    inserted: int = 0
+    errors: list[UserImportErrorSchema] = []
+
+
 class UserPayloadSchema(BaseModel):
     id: UUID = Field(alias="user_id")
     username: str
@@ -66,5 +97,5 @@ class UserResponseSchema(UserPayloadSchema):
     )
 
     @field_serializer("scopes", when_used="json")
-    def serialize_scopes(self, scopes: list["ScopeOrm"], _info) -> list[str]:
-        return [scope.name for scope in scopes]
+    def serialize_scopes(self, scopes: list["ScopeOrm | str"], _info) -> list[str]:
+        return [scope if isinstance(scope, str) else scope.name for scope in scopes]
@@ -1,17 +1,41 @@
-from typing import Type
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Type,
+    AsyncIterator,
+    AsyncIterable,
+    AsyncContextManager,
+    Any,
+)
 from uuid import UUID
 
+from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
-from watchfiles import awatch
 
+from backauth.audit import service as audit
 from backauth.auth.model.token import TokenOrm
 from backauth.auth.schemas import Token
-from backauth.auth.service.auth_service import AuthService
 from backauth.auth.service.token_service import TokenService
 from backauth.config.setting import Config
+from backauth.database import unit_of_work
+from backauth.pagination import encode_cursor, decode_cursor
 from backauth.user.model import UserOrm
+from backauth.tracing import traced
+from backauth.user.password import hash_password, load_rounds, needs_rehash
+from backauth.user.bulk import Format, UserImporter
 from backauth.user.repository import UserRepository
-from backauth.user.schema import UserLoginSchema, UserRegisterSchema, UserUpdateSchema
+from backauth.user.schema import (
+    UserLoginSchema,
+    UserRegisterSchema,
+    UserUpdateSchema,
+    UserImportReportSchema,
+)
+
+if TYPE_CHECKING:
+    from fastapi import BackgroundTasks
 
 
 class UserService:
@@ -29,48 +53,137 @@ class UserService:
         self.db = db
         self.token_model = token_model
 
+    async def _password_rounds(self) -> int:
+        """The bcrypt cost; calibrated off the event loop on first use."""
+        rounds = await load_rounds(self.conf.password)
+        self.user_repository.password_rounds = rounds
+        return rounds
+
+    def _transaction(self) -> AsyncContextManager[Any]:
+        """One transaction for the whole operation in unit-of-work mode."""
+        if self.conf.database.unit_of_work:
+            return unit_of_work(self.db)
+        return nullcontext()
+
+    @traced("UserService.create_user_from_oauth")
     async def create_user_from_oauth(self, code: str, state: str) -> tuple[str, Token]:
-        auth_service = await AuthService(
-            self.db, self.token_model, self.conf
-        ).get_service_by_state(state)
-        token = await auth_service.get_token(code, state)
-        user_data = await auth_service.get_user(token)
-        user = await self.user_repository.get_by_email_and_username_and_provider(
-            user_data.get_email(), user_data.get_username(), auth_service.service_name
-        )
-        if user:
-            raise ValueError("Email or username already exists")
-        user_or_username = await self.user_repository.get_by_username(
-            user_data.get_username()
-        ) or await self.user_repository.get_by_email(user_data.get_email())
-        if not user_or_username:
-            data = user_data.get_orn_dict()
-            data["oauth_provider"] = auth_service.service_name
-            user_or_username = await self.user_repository.create(data)
-        return self.token_service.get_token_info(state).get(
-            "redirect_url", ""
-        ), await self.token_service.get_token(user_or_username)
-
-    async def login(self, user_login: UserLoginSchema) -> Token:
+        from backauth.auth.service.auth_service import AuthService
+        from backauth.auth.service.resilience import StageTimer
+
+        timer = StageTimer("OAuth callback")
+        # The code is single-use, so it is only spent on a valid state.
+        with timer.stage("state"):
+            state_info = await self.token_service.validate_state_token(state)
+            if state_info is None:
+                raise ValueError("Invalid state")
+            auth_service = AuthService(
+                self.db, self.token_model, self.conf
+            ).get_service(state_info.get("service", ""))
+        with timer.stage("exchange"):
+            token = await auth_service.get_token(code)
+        with timer.stage("profile"):
+            user_data = await auth_service.get_user(token)
+        async with self._transaction():
+            with timer.stage("lookup"):
+                users = await self.user_repository.get_by_email_or_username(
+                    user_data.get_email(), user_data.get_username()
+                )
+            if any(
+                user.oauth_provider is not None
+                and user.oauth_provider != auth_service.service_name
+                for user in users
+            ):
+                raise ValueError("Email or username already exists")
+            user_or_username = next(
+                (user for user in users if user.username == user_data.get_username()),
+                users[0] if users else None,
+            )
+            if not user_or_username:
+                with timer.stage("create"):
+                    data = user_data.get_orn_dict()
+                    data["oauth_provider"] = auth_service.service_name
+                    user_or_username = await self.user_repository.create(data)
+                await audit.emit(
+                    audit.OAUTH_SIGNUP,
+                    user_or_username.id,
+                    provider=auth_service.service_name,
+                )
+            else:
+                await audit.emit(
+                    audit.LOGIN,
+                    user_or_username.id,
+                    provider=auth_service.service_name,
+                )
+            with timer.stage("issue"):
+                result = await self.token_service.get_token(user_or_username)
+        timer.log()
+        return state_info.get("redirect_url", ""), result
+
+    @traced("UserService.login")
+    async def login(
+        self,
+        user_login: UserLoginSchema,
+        background_tasks: "BackgroundTasks | None" = None,
+    ) -> Token:
+        """Issues a token pair for valid credentials.
+
+        A hash weaker than the configured cost is upgraded after the token is
+        issued, in its own transaction; with ``background_tasks`` only once
+        the response has been sent.
+        """
         user = await self.user_repository.get_by_email(user_login.email)
         if not user:
+            await audit.emit(audit.LOGIN_FAILED, email=user_login.email)
             raise ValueError("Invalid email")
-        if not user.is_valid_password(user_login.password):
+        if not await asyncio.to_thread(user.is_valid_password, user_login.password):
+            await audit.emit(audit.LOGIN_FAILED, user.id)
             raise ValueError("Invalid password")
-        return await self.token_service.get_token(user)
+        await audit.emit(audit.LOGIN, user.id)
+        rounds = await self._password_rounds()
+        async with self._transaction():
+            token = await self.token_service.get_token(user)
+        if needs_rehash(user.hashed_password, rounds):  # type: ignore
+            rehash = partial(
+                self._rehash_password, user.id, user_login.password, rounds
+            )
+            if background_tasks is None:
+                await rehash()
+            else:
+                background_tasks.add_task(rehash)
+        return token
+
+    async def _rehash_password(self, user_id: UUID, password: str, rounds: int):
+        """Stores a stronger hash in a session and transaction of its own.
+
+        A failure is only logged: the login it belongs to has already
+        succeeded and must not be rolled back or failed by it.
+        """
+        try:
+            hashed = await asyncio.to_thread(hash_password, password, rounds)
+            async with AsyncSession(self.db.bind, expire_on_commit=False) as session:
+                repository = UserRepository(session, self.user_repository.model)
+                await repository.update(user_id, {"hashed_password": hashed})
+        except Exception:
+            logger.exception("Failed to rehash password of user {}", user_id)
 
+    @traced("UserService.register")
     async def register(self, user_register: UserRegisterSchema):
         user = await self.user_repository.get_by_email(user_register.email)
         username = await self.user_repository.get_by_username(user_register.username)
         if user or username:
             raise ValueError("Email or username already exists")
-        return await self.user_repository.create(
-            user_register.model_dump(exclude={"confirm_password"})
-        )
+        await self._password_rounds()
+        async with self._transaction():
+            return await self.user_repository.create(
+                user_register.model_dump(exclude={"confirm_password"})
+            )
 
     async def delete_user(self, user_id: UUID):
-        await self.token_service.blacklist_refresh_token(user_id)
-        await self.user_repository.delete(user_id)
+        await audit.emit(audit.REVOKE, user_id, reason="delete_user")
+        async with self._transaction():
+            await self.token_service.blacklist_refresh_token(user_id)
+            await self.user_repository.delete(user_id)
+            await self.token_service.invalidate_payload(user_id)
 
     async def get_user(self, user_id: UUID) -> UserOrm:
         result = await self.user_repository.get_by_id(user_id)
@@ -78,6 +191,48 @@ class UserService:
             raise ValueError("User not found")
         return result
 
+    async def get_users(
+        self, limit: int, cursor: str | None = None, **filters: Any
+    ) -> tuple[list[UserOrm], str | None]:
+        after = None
+        if cursor:
+            created_at, _id = decode_cursor(cursor, 2)
+            try:
+                after = (datetime.fromisoformat(created_at), UUID(_id))
+            except ValueError:
+                raise ValueError("Invalid cursor")
+        users = await self.user_repository.get_page(limit + 1, after, **filters)
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor(users[-1].created_at.isoformat(), users[-1].id)
+        return users, next_cursor
+
+    async def iter_users(
+        self, page_size: int = 500, **filters: Any
+    ) -> AsyncIterator[UserOrm]:
+        """Iterates over all users matching the filters page by page.
+
+        Loaded pages are expunged from the session, so memory stays bounded
+        by ``page_size`` however many users are exported.
+        """
+        cursor = None
+        while True:
+            users, cursor = await self.get_users(page_size, cursor, **filters)
+            for user in users:
+                yield user
+            if cursor is None:
+                return
+            self.db.expunge_all()
+
+    async def import_users(
+        self, lines: AsyncIterable[str], fmt: Format
+    ) -> UserImportReportSchema:
+        rounds = await self._password_rounds()
+        return await UserImporter(
+            self.db, self.user_repository.model, rounds=rounds
+        ).run(lines, fmt)
+
     async def update_user(self, user_id: UUID, data: UserUpdateSchema) -> None:
         user, username = None, None
         if data.email:
@@ -86,19 +241,54 @@ class UserService:
             username = await self.user_repository.get_by_username(data.username)
         if user or username:
             raise ValueError("Email or username already exists")
-        await self.user_repository.update(user_id, data.model_dump(exclude_none=True))
-        await self.token_service.blacklist_access_token(user_id)
+        async with self._transaction():
+            await self.user_repository.update(
+                user_id, data.model_dump(exclude_none=True)
+            )
+            await self.token_service.invalidate_payload(user_id)
+            await audit.emit(audit.REVOKE, user_id, reason="update_user")
+            await self.token_service.blacklist_access_token(user_id)
+
+    async def invalidate_claims(self, user_id: UUID) -> None:
+        """Drops the cached token claims of a user.
 
+        Call it after changing data that ends up in the token payload
+        outside of ``update_user``, e.g. after granting or revoking scopes.
+        """
+        await self.token_service.invalidate_payload(user_id)
+
+    @traced("UserService.get_token_by_refresh")
     async def get_token_by_refresh(self, refresh_token: str) -> Token:
-        subject = await self.token_service.get_info_from_refresh(refresh_token)
-        user = await self.user_repository.get_by_id(subject.subject)
-        if not user:
-            raise ValueError("Invalid refresh token")
-        return await self.token_service.create_access_token_by_refresh(
-            refresh_token, user
-        )
+        if self.token_service.is_stateless_refresh:
+            claims = await self.token_service.rotate_stateless_refresh_token(
+                refresh_token
+            )
+            payload = await self._get_refresh_payload(UUID(claims["sub"]))
+            await audit.emit(audit.REFRESH, claims["sub"])
+            return await self.token_service.create_access_token_by_stateless_refresh(
+                claims, payload
+            )
+        async with self._transaction():
+            token_entity = await self.token_service.pop_refresh_token(refresh_token)
+            payload = await self._get_refresh_payload(token_entity.subject)
+            await audit.emit(audit.REFRESH, token_entity.subject)
+            return await self.token_service.create_access_token_by_refresh(
+                token_entity, payload
+            )
+
+    async def _get_refresh_payload(self, subject: UUID) -> dict:
+        payload = await self.token_service.get_cached_payload(subject)
+        if payload is None:
+            user = await self.user_repository.get_by_id(subject)
+            if not user:
+                raise ValueError("Invalid refresh token")
+            payload = await self.token_service.get_payload(user)
+            await self.token_service.cache_payload(payload)
+        return payload
 
     def get_auth_url(self, service: str, redirect_url: str) -> str:
+        from backauth.auth.service.auth_service import AuthService
+
         auth_service = AuthService(self.db, self.token_model, self.conf).get_service(
             service
         )
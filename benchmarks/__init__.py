@@ -0,0 +1,4 @@
+"""Benchmarks, run from the repository root with ``python -m benchmarks.<name>``.
+
+They are not part of the installed package and not collected by pytest.
+"""
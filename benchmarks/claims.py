@@ -0,0 +1,49 @@
+"""Access token size and verify time per claim profile."""
+
+import argparse
+import time
+import uuid
+from functools import partial
+
+from jwt import JWT
+
+from backauth.auth.claims import compact_claims
+from benchmarks.common import add_key_arguments, measure_us, print_table, token_settings
+
+PROFILES = ("minimal", "standard", "full")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.claims", description=__doc__
+    )
+    add_key_arguments(parser)
+    parser.add_argument("--scopes", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=500)
+    args = parser.parse_args(argv)
+    settings = token_settings(args)
+    private_key, public_key = settings.private_key, settings.public_key
+    instance = JWT()
+    payload = {
+        "user_id": str(uuid.uuid4()),
+        "scopes": [f"scope:{i}" for i in range(args.scopes)],
+        "email": "someone.with.a.long.name@example.com",
+        "username": "someone_with_a_long_name",
+        "first_name": "Someone",
+        "last_name": "Withalongname",
+    }
+    now = int(time.time())
+    rows = []
+    for profile in PROFILES:
+        claims = compact_claims(payload, profile)  # type: ignore[arg-type]
+        claims.update(
+            {"iat": now, "exp": now + 3600, "type": "access", "jti": str(uuid.uuid4())}
+        )
+        token = instance.encode(claims, private_key, alg=args.algorithm)
+        verify = partial(instance.decode, token, public_key)
+        rows.append((profile, len(token), measure_us(verify, args.samples)))
+    print_table(("profile", "bytes", "verify us"), rows)
+
+
+if __name__ == "__main__":
+    main()
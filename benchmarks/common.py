@@ -0,0 +1,41 @@
+import argparse
+import time
+from typing import Any, Callable, Iterable, Sequence
+
+from backauth.config.setting import TokenSettings
+
+
+def measure_us(call: Callable[[], Any], samples: int) -> float:
+    """Average microseconds per call of ``call`` over ``samples`` runs."""
+    start = time.perf_counter()
+    for _ in range(samples):
+        call()
+    return (time.perf_counter() - start) * 1e6 / samples
+
+
+def print_table(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """Prints right-aligned columns; floats get two decimals."""
+    rows = [
+        [f"{value:.2f}" if isinstance(value, float) else str(value) for value in row]
+        for row in rows
+    ]
+    widths = [
+        max([len(column), *(len(row[i]) for row in rows)])
+        for i, column in enumerate(columns)
+    ]
+    for row in [list(columns), *rows]:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def add_key_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--private-key", required=True)
+    parser.add_argument("--public-key", required=True)
+    parser.add_argument("--algorithm", default="RS256")
+
+
+def token_settings(args: argparse.Namespace) -> TokenSettings:
+    return TokenSettings(
+        private_key_path=args.private_key,
+        public_key_path=args.public_key,
+        algorithm=args.algorithm,
+    )
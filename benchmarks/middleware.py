@@ -0,0 +1,114 @@
+"""Per-request auth overhead of the middleware vs a FastAPI dependency.
+
+Calls the ASGI apps directly, without a server, so the numbers are the cost
+of the auth layer and routing alone.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+
+from backauth.asgi import ASGIApp, Message
+from backauth.auth.middleware import AuthenticationMiddleware
+from backauth.auth.model.token import TokenOrm
+from backauth.auth.service.token_service import TokenService
+from backauth.config.setting import Config
+from benchmarks.common import add_key_arguments, print_table, token_settings
+
+
+async def measure_us(app: ASGIApp, token: str, requests: int) -> float:
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"Benchmark request failed with {message['status']}")
+
+    base = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/protected",
+        "raw_path": b"/protected",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    for _ in range(min(requests, 100)):
+        await app(dict(base), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(base), receive, send)
+    return (time.perf_counter() - start) * 1e6 / requests
+
+
+def make_app(dependencies: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/protected", dependencies=dependencies)
+    async def protected() -> dict:
+        return {"ok": True}
+
+    return app
+
+
+async def run(configuration: Config, requests: int) -> None:
+    service = TokenService(None, TokenOrm, configuration)  # type: ignore[arg-type]
+    token = service.create_access_token(
+        {"user_id": str(uuid.uuid4()), "scopes": []}, jti=uuid.uuid4()
+    )
+    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+    async def is_authenticated(token: str = Depends(oauth2_scheme)) -> None:
+        if not await service.validate_token(token):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+    apps: dict[str, ASGIApp] = {
+        "none": make_app([]),
+        "dependency": make_app([Depends(is_authenticated)]),
+        "middleware": AuthenticationMiddleware(
+            make_app([]), configuration, token_service=service
+        ),
+    }
+    results = {
+        name: await measure_us(app, token, requests) for name, app in apps.items()
+    }
+    print_table(
+        ("auth", "us/request", "overhead us"),
+        (
+            (name, per_request, per_request - results["none"])
+            for name, per_request in results.items()
+        ),
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.middleware", description=__doc__
+    )
+    add_key_arguments(parser)
+    parser.add_argument(
+        "--state-backend", choices=("memory", "redis"), default="memory"
+    )
+    parser.add_argument("--redis", default="redis://localhost:6379")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args(argv)
+    configuration = Config(
+        redirect_uri="",
+        redis=args.redis,
+        state_backend=args.state_backend,
+        token=token_settings(args),
+    )
+    asyncio.run(run(configuration, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""bcrypt verify time per cost level and the cost calibration picks."""
+
+import argparse
+
+from backauth.config.setting import PasswordSettings
+from backauth.user.password import get_rounds, measure_verify_ms
+from benchmarks.common import print_table
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.password", description=__doc__
+    )
+    parser.add_argument("--min-rounds", type=int, default=4)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args(argv)
+    print_table(
+        ("cost", "verify ms"),
+        [
+            (rounds, measure_verify_ms(rounds, args.samples))
+            for rounds in range(args.min_rounds, args.max_rounds + 1)
+        ],
+    )
+    print(f"calibrated cost: {get_rounds(PasswordSettings())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Serialization time per endpoint.
+
+Compares provider payloads parsed from a decoded dict vs straight from the
+response bytes, and responses rendered through the json module vs orjson.
+"""
+
+import argparse
+import json
+import uuid
+from datetime import datetime, UTC
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from backauth.auth.schemas import (
+    DiscordAssessToken,
+    GithubAssessToken,
+    GoogleAssessToken,
+    UserDiscord,
+    UserGithub,
+    UserGoogle,
+    github_emails_adapter,
+)
+from backauth.user.router import PAYLOAD_FIELDS
+from backauth.user.schema import UserPayloadSchema, UserResponseSchema
+from benchmarks.common import measure_us, print_table
+
+PROFILE = {"avatar_url": "https://example.com/a.png", "bio": None, "public_repos": 12}
+
+PROVIDER_PAYLOADS: list[tuple[str, Any, Any]] = [
+    (
+        "github token",
+        GithubAssessToken,
+        {
+            "access_token": "gho_" + "x" * 36,
+            "scope": "user:email",
+            "token_type": "bearer",
+        },
+    ),
+    (
+        "github user",
+        UserGithub,
+        {
+            "login": "someone",
+            "email": "someone@example.com",
+            "name": "Some One",
+            **PROFILE,
+        },
+    ),
+    (
+        "github emails",
+        github_emails_adapter,
+        [{"email": f"someone{i}@example.com", "primary": i == 0} for i in range(3)],
+    ),
+    (
+        "google token",
+        GoogleAssessToken,
+        {
+            "access_token": "ya29." + "x" * 160,
+            "expires_in": 3599,
+            "id_token": "x" * 900,
+            "refresh_token": "1//" + "x" * 100,
+            "scope": "openid email profile",
+            "token_type": "Bearer",
+        },
+    ),
+    (
+        "google user",
+        UserGoogle,
+        {
+            "sub": "1" * 21,
+            "name": "Some One",
+            "given_name": "Some",
+            "family_name": "One",
+            "picture": "https://example.com/a.png",
+            "email": "someone@example.com",
+            "email_verified": True,
+        },
+    ),
+    (
+        "discord token",
+        DiscordAssessToken,
+        {
+            "access_token": "x" * 30,
+            "expires_in": 604800,
+            "refresh_token": "x" * 30,
+            "scope": "identify email",
+            "token_type": "Bearer",
+        },
+    ),
+    (
+        "discord user",
+        UserDiscord,
+        {
+            "id": "1" * 18,
+            "username": "someone",
+            "email": "someone@example.com",
+            "avatar": "x" * 32,
+            "locale": "en-US",
+            "mfa_enabled": False,
+            "verified": True,
+            "global_name": "Some One",
+        },
+    ),
+]
+
+
+def parse_dict(model: Any, body: bytes) -> Any:
+    if isinstance(model, TypeAdapter):
+        return model.validate_python(json.loads(body))
+    return model.model_validate(json.loads(body))
+
+
+def parse_bytes(model: Any, body: bytes) -> Any:
+    if isinstance(model, TypeAdapter):
+        return model.validate_json(body)
+    return model.model_validate_json(body)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.serialization", description=__doc__
+    )
+    parser.add_argument("--scopes", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    cases: list[tuple[str, Callable[[], Any], Callable[[], Any]]] = []
+    for name, model, data in PROVIDER_PAYLOADS:
+        body = json.dumps(data).encode()
+        cases.append(
+            (
+                f"/oauth {name}",
+                partial(parse_dict, model, body),
+                partial(parse_bytes, model, body),
+            )
+        )
+
+    user_id = uuid.uuid4()
+    claims: dict[str, Any] = {
+        "user_id": str(user_id),
+        "username": "someone",
+        "email": "someone@example.com",
+        "first_name": "Some",
+        "last_name": "One",
+        "scopes": [f"scope:{i}" for i in range(args.scopes)],
+        "type": "access",
+        "jti": str(uuid.uuid4()),
+    }
+    cases.append(
+        (
+            "/users/@me",
+            lambda: JSONResponse(
+                UserPayloadSchema.model_validate(claims).model_dump(mode="json")
+            ),
+            lambda: ORJSONResponse(
+                {field: claims.get(field) for field in PAYLOAD_FIELDS}
+            ),
+        )
+    )
+
+    now = datetime.now(UTC)
+    user = SimpleNamespace(
+        **{field: claims[field] for field in PAYLOAD_FIELDS if field != "user_id"},
+        id=user_id,
+        is_active=True,
+        is_superuser=False,
+        oauth_provider=None,
+        oauth_id=None,
+        created_at=now,
+        updated_at=now,
+    )
+
+    def dump_user() -> dict:
+        return UserResponseSchema.model_validate(user).model_dump(mode="json")
+
+    cases.append(
+        (
+            "/users/{id}",
+            lambda: JSONResponse(dump_user()),
+            lambda: ORJSONResponse(dump_user()),
+        )
+    )
+
+    print_table(
+        ("endpoint", "before us", "after us"),
+        (
+            (name, measure_us(before, args.samples), measure_us(after, args.samples))
+            for name, before, after in cases
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
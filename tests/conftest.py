@@ -0,0 +1,104 @@
+from typing import Any, AsyncIterator, Callable
+from uuid import UUID
+
+import fakeredis
+import pytest
+import redis.asyncio
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy import TypeDecorator, Uuid
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from backauth import Config, ScopeOrm, TokenOrm, UserOrm, UserScopeOrm
+from backauth.auth.repository import statestore, watermarkrepository
+from backauth.config import redis as redis_config
+from backauth.config.setting import PasswordSettings, TokenSettings
+
+
+class Base(DeclarativeBase): ...
+
+
+class Scope(ScopeOrm, Base): ...
+
+
+class UserScope(UserScopeOrm, Base): ...
+
+
+class User(UserOrm, Base):
+    scopes: Mapped[list[Scope]] = relationship(secondary="user_scope", lazy="joined")
+
+
+class _Uuid(TypeDecorator):
+    """Accepts subjects passed as strings, which SQLite's ``Uuid`` does not."""
+
+    impl = Uuid
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> UUID | None:
+        return UUID(str(value)) if value is not None else None
+
+
+class Token(TokenOrm, Base):
+    subject: Mapped[UUID] = mapped_column(_Uuid)
+
+
+@pytest.fixture(scope="session")
+def keys(tmp_path_factory: pytest.TempPathFactory) -> tuple[str, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    directory = tmp_path_factory.mktemp("keys")
+    private_path, public_path = directory / "private.pem", directory / "public.pem"
+    private_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    public_path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+    return str(private_path), str(public_path)
+
+
+@pytest.fixture(autouse=True)
+def redis_server(monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeServer:
+    """Replaces every Redis client with an in-process fake sharing one server."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.asyncio.Redis,
+        "from_url",
+        staticmethod(lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server)),
+    )
+    monkeypatch.setattr(redis_config, "_routers", {})
+    monkeypatch.setattr(statestore, "_memory_stores", {})
+    watermarkrepository._cache.clear()
+    return server
+
+
+@pytest.fixture
+def make_config(keys: tuple[str, str]) -> Callable[..., Config]:
+    def make(token: dict[str, Any] | None = None, **kwargs: Any) -> Config:
+        kwargs.setdefault("password", PasswordSettings(bcrypt_rounds=4))
+        return Config(
+            redirect_uri="http://localhost/callback",
+            token=TokenSettings(
+                private_key_path=keys[0], public_key_path=keys[1], **(token or {})
+            ),
+            **kwargs,
+        )
+
+    return make
+
+
+@pytest.fixture
+async def session() -> AsyncIterator[AsyncSession]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any
+
+from backauth.audit import service as audit
+from backauth.audit.service import AuditLog
+from backauth.config.setting import AuditSettings
+
+
+class SlowSink:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writing = asyncio.Event()
+        self.events: list[dict[str, Any]] = []
+
+    async def write(self, events: list[dict[str, Any]]) -> None:
+        # Stored before returning, like an INSERT awaiting its COMMIT.
+        self.events.extend(events)
+        self.writing.set()
+        await asyncio.sleep(self.delay)
+
+
+async def test_close_writes_every_event_once():
+    sink = SlowSink(delay=0.05)
+    log = AuditLog(sink, AuditSettings(batch_size=3, flush_interval_seconds=0.01))
+    async with log:
+        for i in range(10):
+            await audit.emit(audit.LOGIN, count=i)
+        await sink.writing.wait()
+    assert [event["data"]["count"] for event in sink.events] == list(range(10))
+    assert audit._audit_log is None
+
+
+async def test_close_after_idle_writer():
+    sink = SlowSink(delay=0)
+    log = AuditLog(sink, AuditSettings())
+    await log.start()
+    await asyncio.sleep(0)
+    await log.close()
+    await log.emit(audit.LOGIN)
+    await log.close()
+    assert len(sink.events) == 1
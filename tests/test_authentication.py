@@ -0,0 +1,57 @@
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+
+from backauth import AuthenticationMiddleware, TokenService
+from tests.conftest import Token
+
+
+def access_token(service: TokenService) -> str:
+    return service.create_access_token(
+        {"user_id": str(uuid.uuid4()), "scopes": []}, jti=uuid.uuid4()
+    )
+
+
+async def test_authenticate_accepts_access_tokens(make_config, session):
+    service = TokenService(session, Token, make_config())
+    claims = await service.authenticate(access_token(service))
+    assert claims is not None and claims["type"] == "access"
+
+
+async def test_authenticate_rejects_state_tokens(make_config, session):
+    service = TokenService(session, Token, make_config())
+    state = service.create_state_token(
+        {"service": "github", "redirect_url": "http://localhost"}
+    )
+    assert await service.authenticate(state) is None
+    assert await service.validate_state_token(state)
+    assert not await service.validate_state_token(access_token(service))
+
+
+async def test_authenticate_rejects_tokens_without_user_or_jti(make_config, session):
+    service = TokenService(session, Token, make_config())
+    assert await service.authenticate(service.create_access_token({"foo": 1})) is None
+
+
+async def test_middleware_rejects_state_tokens(make_config, session):
+    conf = make_config()
+    service = TokenService(session, Token, conf)
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(request: Request) -> dict:
+        return {"user_id": request.auth["user_id"]}
+
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(
+            app=AuthenticationMiddleware(app, conf, token_service=service)
+        ),
+        base_url="http://test",
+    )
+    state = service.create_state_token({"service": "github", "redirect_url": ""})
+    response = await client.get("/me", headers={"Authorization": f"Bearer {state}"})
+    assert response.status_code == 401
+    token = access_token(service)
+    response = await client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
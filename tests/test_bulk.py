@@ -0,0 +1,151 @@
+import asyncio
+import csv
+import io
+import json
+import sys
+
+import pytest
+from bcrypt import checkpw
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backauth.user import bulk
+from backauth.user.bulk import UserImporter, export_lines
+from backauth.user.repository import UserRepository
+from tests.conftest import Base, User
+
+
+async def lines_of(text: str):
+    for line in text.splitlines():
+        yield line
+
+
+async def rows_of(rows: list[dict]):
+    for row in rows:
+        yield row
+
+
+async def collect(lines) -> str:
+    return "".join([line async for line in lines])
+
+
+async def run_import(session, text: str, fmt: bulk.Format, **kwargs):
+    return await UserImporter(session, User, rounds=4, **kwargs).run(
+        lines_of(text), fmt
+    )
+
+
+async def test_ndjson_import_reports_bad_lines(session):
+    session.add(User(email="taken@example.com", username="taken"))
+    await session.commit()
+    text = "\n".join(
+        [
+            json.dumps({"email": "a@example.com", "username": "a", "password": "pw"}),
+            "{not json",
+            "[1, 2]",
+            "",
+            json.dumps({"email": "b@example.com"}),
+            json.dumps({"email": "taken@example.com", "username": "other"}),
+            json.dumps({"email": "c@example.com", "username": "c"}),
+        ]
+    )
+    report = await run_import(session, text, "ndjson", batch_size=2)
+
+    assert report.inserted == 2
+    assert [(error.line, error.error) for error in report.errors] == [
+        (2, "Invalid JSON"),
+        (3, "Expected a JSON object"),
+        (5, "username: Field required"),
+        (6, "Email or username already exists"),
+    ]
+    user = await UserRepository(session, User).get_by_email("a@example.com")
+    assert checkpw(b"pw", user.hashed_password)
+
+
+async def test_csv_import_keeps_quoted_newlines(session):
+    text = (
+        "email,username,first_name,last_name\n"
+        'a@example.com,a,"Ann\nMarie","Smith, Jr."\n'
+        "b@example.com,b\n"
+        '"c@example.com",c,"He said ""hi""",\n'
+        'd@example.com,d,"never closed\n'
+        "e@example.com,e,E,\n"
+    )
+    report = await run_import(session, text, "csv")
+
+    assert report.inserted == 2
+    assert [(error.line, error.error) for error in report.errors] == [
+        (4, "Expected 4 columns, got 2"),
+        (6, "Unterminated quoted field"),
+    ]
+    repository = UserRepository(session, User)
+    a = await repository.get_by_email("a@example.com")
+    assert (a.first_name, a.last_name) == ("Ann\nMarie", "Smith, Jr.")
+    c = await repository.get_by_email("c@example.com")
+    assert (c.first_name, c.last_name) == ('He said "hi"', None)
+
+
+async def test_export_lines_writes_csv_and_ndjson():
+    rows = [
+        {"email": "a@example.com", "first_name": "Ann\nMarie", "scopes": ["x", "y"]},
+        {"email": "b@example.com", "first_name": None, "scopes": []},
+    ]
+    ndjson = await collect(export_lines(rows_of(rows), "ndjson"))
+    assert [json.loads(line) for line in ndjson.splitlines()] == rows
+
+    text = await collect(export_lines(rows_of(rows), "csv"))
+    assert list(csv.reader(io.StringIO(text))) == [
+        ["email", "first_name", "scopes"],
+        ["a@example.com", "Ann\nMarie", "x y"],
+        ["b@example.com", "", ""],
+    ]
+
+
+async def test_csv_export_imports_back(session, tmp_path):
+    session.add(User(email="a@example.com", username="a", first_name="Ann\nMarie"))
+    await session.commit()
+    rows = bulk._iter_user_rows(UserRepository(session, User), 100)
+    text = await collect(export_lines(rows, "csv"))
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'copy.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine)() as copy:
+        report = await run_import(copy, text, "csv")
+        user = await UserRepository(copy, User).get_by_email("a@example.com")
+    await engine.dispose()
+    assert report.inserted == 1 and not report.errors
+    assert user.first_name == "Ann\nMarie"
+
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    return f"sqlite+aiosqlite:///{tmp_path / 'bulk.db'}"
+
+
+def cli(database: str, *args: str) -> int:
+    return bulk.main(
+        [*args, "--database-url", database, "--user-model", "tests.conftest:User"]
+    )
+
+
+def test_cli_export_to_stdout_leaves_it_open(database, tmp_path, capsys):
+    source = tmp_path / "users.ndjson"
+    source.write_text(
+        json.dumps({"email": "a@example.com", "username": "a"}) + "\n"
+    )
+
+    async def create_tables():
+        engine = create_async_engine(database)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_tables())
+    assert cli(database, "import", str(source), "--workers", "1") == 0
+    capsys.readouterr()
+
+    assert cli(database, "export", "-", "--format", "csv") == 0
+    assert not sys.stdout.closed
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("id,email,username")
+    assert "a@example.com" in lines[1]
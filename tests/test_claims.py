@@ -0,0 +1,58 @@
+import uuid
+
+import pytest
+
+from backauth import TokenService
+from backauth.auth.claims import (
+    PROFILE_FIELDS,
+    check_size,
+    compact_claims,
+    expand_claims,
+)
+from tests.conftest import Token
+
+PAYLOAD = {
+    "user_id": str(uuid.uuid4()),
+    "scopes": ["read", "write"],
+    "email": "someone@example.com",
+    "username": "someone",
+    "first_name": "Some",
+    "last_name": "One",
+}
+
+
+@pytest.mark.parametrize("profile", ["minimal", "standard", "full"])
+def test_compact_claims_round_trip(profile):
+    fields = PROFILE_FIELDS.get(profile, tuple(PAYLOAD))
+    expected = {field: PAYLOAD[field] for field in fields}
+    assert expand_claims(compact_claims(PAYLOAD, profile)) == expected
+
+
+def test_empty_fields_are_left_out():
+    claims = compact_claims({"user_id": "1", "scopes": [], "email": None}, "standard")
+    assert claims == {"uid": "1"}
+    assert expand_claims(claims) == {"user_id": "1", "scopes": []}
+
+
+@pytest.mark.parametrize("profile", ["minimal", "standard", "full"])
+async def test_signed_token_round_trip(make_config, session, profile):
+    configuration = make_config(token={"claim_profile": profile})
+    service = TokenService(session, Token, configuration)
+    token = service.create_access_token(PAYLOAD, jti=uuid.uuid4())
+    claims = await service.authenticate(token)
+    assert claims is not None
+    for field in PROFILE_FIELDS.get(profile, tuple(PAYLOAD)):
+        assert claims[field] == PAYLOAD[field]
+
+
+def test_check_size():
+    assert check_size("x" * 10, 10) == "x" * 10
+    assert check_size("x" * 10, None) == "x" * 10
+    with pytest.raises(ValueError, match="over the budget of 9"):
+        check_size("x" * 10, 9)
+
+
+async def test_token_over_the_budget_is_rejected(make_config, session):
+    service = TokenService(session, Token, make_config(token={"max_token_bytes": 200}))
+    with pytest.raises(ValueError, match="over the budget"):
+        service.create_access_token(PAYLOAD, jti=uuid.uuid4())
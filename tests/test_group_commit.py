@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backauth.auth.repository import groupcommit
+from backauth.auth.repository.groupcommit import GroupCommitWriter
+from backauth.auth.repository.tokenrepository import TokenRepository
+from tests.conftest import Base, Token
+
+
+@pytest.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tokens.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    opened: list[None] = []
+
+    def counting():
+        opened.append(None)
+        return factory()
+
+    counting.opened = opened  # type: ignore[attr-defined]
+    counting.plain = factory  # type: ignore[attr-defined]
+    yield counting
+    await engine.dispose()
+
+
+def row(_id: uuid.UUID | None = None) -> dict:
+    return {
+        "id": _id or uuid.uuid4(),
+        "subject": uuid.uuid4(),
+        "refresh_token": "token",
+        "expires_at": 0,
+    }
+
+
+async def count_rows(factory) -> int:
+    async with factory.plain() as session:
+        return await session.scalar(select(func.count()).select_from(Token))
+
+
+async def test_concurrent_submits_share_one_transaction(factory):
+    writer = GroupCommitWriter(factory, Token, max_delay_ms=20)
+    await asyncio.gather(*(writer.submit(row()) for _ in range(10)))
+    assert len(factory.opened) == 1
+    assert await count_rows(factory) == 10
+
+
+async def test_full_batch_is_written_without_waiting(factory):
+    writer = GroupCommitWriter(factory, Token, max_delay_ms=10_000, max_batch=3)
+    await asyncio.wait_for(
+        asyncio.gather(*(writer.submit(row()) for _ in range(6))), timeout=5
+    )
+    assert len(factory.opened) == 2
+    assert await count_rows(factory) == 6
+
+
+async def test_close_flushes_pending_rows(factory):
+    writer = GroupCommitWriter(factory, Token, max_delay_ms=10_000)
+    submit = asyncio.create_task(writer.submit(row()))
+    await asyncio.sleep(0)
+    await writer.close()
+    assert submit.done() and submit.exception() is None
+    assert await count_rows(factory) == 1
+
+
+async def test_failed_insert_fails_every_submitter(factory):
+    writer = GroupCommitWriter(factory, Token, max_delay_ms=20)
+    duplicate = uuid.uuid4()
+    results = await asyncio.gather(
+        writer.submit(row(duplicate)),
+        writer.submit(row(duplicate)),
+        writer.submit(row()),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, IntegrityError) for result in results)
+    assert await count_rows(factory) == 0
+
+
+async def test_repository_hands_inserts_to_the_active_writer(factory):
+    async with factory.plain() as session:
+        repository = TokenRepository(session, Token)
+        async with GroupCommitWriter(factory, Token, max_delay_ms=1):
+            await repository.create(row())
+        assert groupcommit.get_writer() is None
+    assert len(factory.opened) == 1
+    assert await count_rows(factory) == 1
@@ -0,0 +1,82 @@
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+
+from backauth import database, health
+from backauth.auth.repository import watermarkrepository
+from backauth.auth.service import signing
+from tests.conftest import Token, User
+
+
+@pytest.fixture
+def get_session(session):
+    async def get_session():
+        yield session
+
+    return get_session
+
+
+@pytest.fixture(autouse=True)
+def warmup_state(monkeypatch):
+    monkeypatch.setattr(health, "_warmup", {"done": False, "stages": {}, "errors": {}})
+    monkeypatch.setattr(health, "_warm_bcrypt", lambda configuration: None)
+
+
+def client(router) -> httpx.AsyncClient:
+    app = FastAPI()
+    app.include_router(router)
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+async def test_ready_reports_only_the_warmup_error_type(
+    make_config, get_session, monkeypatch
+):
+    def fail(service):
+        raise ValueError("/secrets/private.pem is unreadable")
+
+    monkeypatch.setattr(health, "_sign_and_verify", fail)
+    configuration = make_config()
+    await health.warmup(get_session, Token, User, configuration)
+
+    router = health.health_router(get_session, Token, User, configuration)
+    async with client(router) as http:
+        response = await http.get("/health/ready")
+    assert response.json()["warmup"]["errors"] == {"jwt": "ValueError"}
+    assert "secrets" not in response.text
+
+
+async def test_dependencies_guard_the_endpoints(make_config, get_session):
+    def deny():
+        raise HTTPException(status_code=403)
+
+    router = health.health_router(
+        get_session, Token, User, make_config(), dependencies=[Depends(deny)]
+    )
+    async with client(router) as http:
+        assert (await http.get("/health/live")).status_code == 403
+        assert (await http.get("/health/ready")).status_code == 403
+
+
+async def test_ready_uses_the_session_dependency(make_config, session):
+    async def unused():
+        raise AssertionError("overridden")
+        yield
+
+    async def override():
+        yield session
+
+    configuration = make_config(warmup={"enabled": False})
+    app = FastAPI()
+    app.include_router(health.health_router(unused, Token, User, configuration))
+    app.dependency_overrides[unused] = override
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as http:
+        response = await http.get("/health/ready")
+    assert response.status_code == 200
+    caches = response.json()["caches"]
+    assert caches["statements"] == database.statement_cache_size()
+    assert caches["watermarks"] == watermarkrepository.cache_size()
+    assert caches["signing_keys"] == signing.loaded_key_count()
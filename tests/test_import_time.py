@@ -0,0 +1,51 @@
+"""Import budget of the package, measured with ``-X importtime``.
+
+Every check runs in a fresh interpreter, so modules imported by other tests
+cannot hide a regression.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative microseconds; ``import backauth`` takes ~15ms on a laptop.
+IMPORT_BUDGET_US = 150_000
+HEAVY_MODULES = ("fastapi", "httpx", "redis", "jwt", "pydantic.v1", "watchfiles")
+
+
+def run(code: str, *options: str) -> str:
+    result = subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout + result.stderr
+
+
+def import_time_us(module: str) -> int:
+    # Lines look like "import time:  self [us] | cumulative | imported package".
+    for line in run(f"import {module}", "-X", "importtime").splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} missing from -X importtime output")
+
+
+def test_import_stays_within_budget():
+    assert import_time_us("backauth") < IMPORT_BUDGET_US
+
+
+@pytest.mark.parametrize("module", ["backauth", "backauth.user.bulk"])
+def test_import_skips_heavy_dependencies(module):
+    loaded = run(
+        f"import sys, {module}; "
+        f"print(*(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    assert loaded.strip() == ""
+
+
+def test_public_names_load_on_access():
+    output = run("import backauth; print(backauth.TokenService.__name__)")
+    assert output.strip() == "TokenService"
@@ -0,0 +1,76 @@
+"""Runs the token service on the memory state backend, without any Redis."""
+
+import time
+import uuid
+
+import pytest
+import redis.asyncio
+
+from backauth import TokenService
+from backauth.auth.repository.statestore import MemoryStateStore
+from tests.conftest import Token
+
+
+@pytest.fixture(autouse=True)
+def no_redis(redis_server, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Points every Redis client at a closed port, so any use of it fails."""
+    monkeypatch.setattr(
+        redis.asyncio.Redis,
+        "from_url",
+        staticmethod(lambda url, **kwargs: redis.asyncio.Redis(port=1)),
+    )
+
+
+@pytest.fixture
+def service(make_config, session) -> TokenService:
+    return TokenService(
+        session, Token, make_config(state_backend="memory", state_max_entries=2)
+    )
+
+
+async def test_memory_store_expires_entries(monkeypatch):
+    store = MemoryStateStore()
+    await store.set("a", "1", ex=10)
+    assert await store.get("a") == b"1"
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert await store.get("a") is None
+    await store.set("b", "1", ex=10)
+    assert len(store) == 1
+
+
+async def test_memory_store_keeps_entries_beyond_max_entries():
+    store = MemoryStateStore(max_entries=2)
+    await store.set_many(["a", "b", "c"], "block", ex=60)
+    await store.set("a", "block", ex=60)
+    assert await store.get_many(["a", "b", "c"]) == [b"block"] * 3
+    assert store.overflows == 1
+
+
+async def test_revocations_survive_a_full_store(service):
+    payload = {"user_id": str(uuid.uuid4()), "scopes": []}
+    jtis = [uuid.uuid4() for _ in range(4)]
+    tokens = [service.create_access_token(payload, jti=jti) for jti in jtis]
+    for jti in jtis:
+        await service.create_refresh_token(jti, payload)
+    await service.blacklist_access_token(payload["user_id"])
+    for token in tokens:
+        assert await service.authenticate(token) is None
+    assert service.state.overflows == 2
+
+
+async def test_payload_cache(service):
+    payload = {"user_id": str(uuid.uuid4()), "scopes": ["read"]}
+    await service.cache_payload(payload)
+    assert await service.get_cached_payload(payload["user_id"]) == payload
+    await service.state.delete(service._payload_key(payload["user_id"]))
+    assert await service.get_cached_payload(payload["user_id"]) is None
+
+
+def test_memory_backend_rejects_redis_features(make_config, session):
+    with pytest.raises(ValueError):
+        TokenService(
+            session,
+            Token,
+            make_config(state_backend="memory", token={"session_store": "redis"}),
+        )
@@ -0,0 +1,92 @@
+import uuid
+
+import fakeredis
+import pytest
+
+from backauth import TokenService
+from backauth.auth.repository.familyrepository import RefreshFamilyRepository
+from backauth.auth.repository.tokenrepository import TokenRepository
+from backauth.config.redis import RedisRouter
+from tests.conftest import Token
+
+
+def payloads(count: int) -> list[dict]:
+    return [{"user_id": str(uuid.uuid4()), "scopes": []} for _ in range(count)]
+
+
+@pytest.fixture
+def batches(monkeypatch) -> list[int]:
+    """Rows per session write, for either refresh mode."""
+    sizes: list[int] = []
+    create_many = TokenRepository.create_many
+    create_families = RefreshFamilyRepository.create_many
+
+    async def record_rows(self, rows):
+        sizes.append(len(rows))
+        await create_many(self, rows)
+
+    async def record_families(self, families, ttl):
+        sizes.append(len(families))
+        await create_families(self, families, ttl)
+
+    monkeypatch.setattr(TokenRepository, "create_many", record_rows)
+    monkeypatch.setattr(RefreshFamilyRepository, "create_many", record_families)
+    return sizes
+
+
+async def mint(service: TokenService, users: list[dict], **kwargs) -> list:
+    return [token async for token in service.mint_tokens(users, **kwargs)]
+
+
+async def test_tokens_come_in_order_and_verify(make_config, session, batches):
+    service = TokenService(session, Token, make_config())
+    users = payloads(8)
+    tokens = await mint(service, users, batch_size=3, concurrency=2)
+
+    assert batches == [3, 3, 2]
+    for user, token in zip(users, tokens, strict=True):
+        claims = await service.authenticate(token.access_token)
+        assert claims is not None and claims["user_id"] == user["user_id"]
+        stored = await service.token_repository.get_by_refresh_token(
+            token.refresh_token
+        )
+        assert str(stored.subject) == user["user_id"]
+        assert str(stored.id) == claims["jti"]
+
+
+async def test_default_concurrency_follows_the_cpu_count(
+    make_config, session, batches, monkeypatch
+):
+    monkeypatch.setattr("os.cpu_count", lambda: None)
+    service = TokenService(session, Token, make_config())
+    assert len(await mint(service, payloads(5), batch_size=2)) == 5
+    assert batches == [2, 2, 1]
+
+
+async def test_stateless_mode_stores_families_per_batch(
+    make_config, session, batches
+):
+    service = TokenService(
+        session, Token, make_config(token={"refresh_mode": "stateless"})
+    )
+    users = payloads(5)
+    tokens = await mint(service, users, batch_size=2)
+
+    assert batches == [2, 2, 1]
+    for user, token in zip(users, tokens, strict=True):
+        assert await service.authenticate(token.access_token) is not None
+        claims = await service.rotate_stateless_refresh_token(token.refresh_token)
+        assert claims["sub"] == user["user_id"]
+    subject = uuid.UUID(users[0]["user_id"])
+    assert await service.token_repository.get_by_sub(subject) == []
+
+
+async def test_family_writes_are_split_per_node():
+    nodes = [fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()) for _ in range(2)]
+    repository = RefreshFamilyRepository(RedisRouter(nodes))
+    families = [(uuid.uuid4(), str(uuid.uuid4()), uuid.uuid4()) for _ in range(8)]
+    await repository.create_many(families, 60)
+
+    for family, subject, jti in families:
+        assert await repository.get_jti_by_sub(subject) == [str(jti)]
+    assert all([await node.dbsize() for node in nodes])
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+
+from backauth import UserService
+from backauth.auth.service import resilience
+from backauth.auth.service.auth_service import AuthService
+from backauth.config.setting import GithubOAuth
+from tests.conftest import Token, User
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Records provider requests and answers them with ``provider.status``."""
+    requests: list[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(handle.status, json={})  # type: ignore[attr-defined]
+
+    handle.status = 503  # type: ignore[attr-defined]
+    handle.requests = requests  # type: ignore[attr-defined]
+    monkeypatch.setattr(AuthService, "transport", httpx.MockTransport(handle))
+    monkeypatch.setattr(resilience, "_breakers", {})
+    return handle
+
+
+@pytest.fixture
+def service(make_config, session) -> UserService:
+    github = GithubOAuth(client_id="id", client_secret="secret", enabled=True)
+    return UserService(session, User, Token, make_config(github=github))
+
+
+def state_for(service: UserService) -> str:
+    return service.token_service.create_state_token(
+        {"service": "github", "redirect_url": "http://localhost"}
+    )
+
+
+@pytest.mark.parametrize("kind", ["garbage", "access", "blacklisted"])
+async def test_invalid_state_never_spends_the_code(service, provider, kind):
+    tokens = service.token_service
+    if kind == "garbage":
+        state = "not.a.jwt"
+    elif kind == "access":
+        state = tokens.create_access_token(
+            {"user_id": "00000000-0000-0000-0000-000000000000", "scopes": []}
+        )
+    else:
+        state = state_for(service)
+        await tokens._blacklist([tokens.get_token_info(state)["jti"]])
+
+    with pytest.raises(ValueError, match="Invalid state"):
+        await service.create_user_from_oauth("code", state)
+    assert provider.requests == []
+
+
+async def test_code_exchange_is_not_retried(service, provider):
+    with pytest.raises(Exception, match="Invalid code"):
+        await service.create_user_from_oauth("code", state_for(service))
+    assert len(provider.requests) == 1
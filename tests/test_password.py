@@ -0,0 +1,118 @@
+import threading
+
+from fastapi import BackgroundTasks
+
+from bcrypt import gensalt, hashpw
+
+from backauth.config.setting import DatabaseSettings, PasswordSettings
+from backauth.user import password
+from backauth.user.password import get_cost, get_rounds, load_rounds, needs_rehash
+from backauth.user.schema import UserLoginSchema, UserRegisterSchema
+from backauth.user.repository import UserRepository
+from backauth.user.service import UserService
+from tests.conftest import Token, User
+
+
+def test_needs_rehash_only_upgrades():
+    hashed = hashpw(b"secret", gensalt(5))
+    assert needs_rehash(hashed, 6)
+    assert not needs_rehash(hashed, 5)
+    assert not needs_rehash(hashed, 4)
+
+
+def test_calibrated_rounds_never_drop_below_default(monkeypatch):
+    monkeypatch.setattr(password, "_calibrated", {})
+    monkeypatch.setattr(password, "calibrate_rounds", lambda *args: 10)
+    assert get_rounds(PasswordSettings()) == password.MIN_CALIBRATED_ROUNDS
+    assert get_rounds(PasswordSettings(bcrypt_rounds=4)) == 4
+
+
+async def test_load_rounds_calibrates_in_a_thread(monkeypatch):
+    main = threading.get_ident()
+    threads = []
+
+    def calibrate(*args):
+        threads.append(threading.get_ident())
+        return 13
+
+    monkeypatch.setattr(password, "_calibrated", {})
+    monkeypatch.setattr(password, "calibrate_rounds", calibrate)
+    assert await load_rounds(PasswordSettings()) == 13
+    assert await load_rounds(PasswordSettings()) == 13
+    assert len(threads) == 1 and threads[0] != main
+
+
+async def test_login_upgrades_weaker_hashes(make_config, session):
+    service = UserService(
+        session, User, Token, make_config(password=PasswordSettings(bcrypt_rounds=5))
+    )
+    await service.register(
+        UserRegisterSchema(
+            email="a@example.com",
+            username="a",
+            password="secret",
+            confirm_password="secret",
+        )
+    )
+    user = await service.user_repository.get_by_email("a@example.com")
+    assert get_cost(user.hashed_password) == 5
+
+    service.conf.password.bcrypt_rounds = 6
+    await service.login(UserLoginSchema(email="a@example.com", password="secret"))
+    session.expire_all()
+    user = await service.user_repository.get_by_email("a@example.com")
+    assert get_cost(user.hashed_password) == 6
+
+
+async def register_weak(make_config, session, **kwargs) -> UserService:
+    service = UserService(
+        session,
+        User,
+        Token,
+        make_config(password=PasswordSettings(bcrypt_rounds=5), **kwargs),
+    )
+    await service.register(
+        UserRegisterSchema(
+            email="a@example.com",
+            username="a",
+            password="secret",
+            confirm_password="secret",
+        )
+    )
+    service.conf.password.bcrypt_rounds = 6
+    return service
+
+
+async def test_login_defers_rehash_to_background_tasks(make_config, session):
+    service = await register_weak(make_config, session)
+    background_tasks = BackgroundTasks()
+    login = UserLoginSchema(email="a@example.com", password="secret")
+    assert await service.login(login, background_tasks)
+    assert len(background_tasks.tasks) == 1
+    user = await service.user_repository.get_by_email("a@example.com")
+    assert get_cost(user.hashed_password) == 5
+
+    await background_tasks()
+    session.expire_all()
+    user = await service.user_repository.get_by_email("a@example.com")
+    assert get_cost(user.hashed_password) == 6
+
+
+async def test_failed_rehash_keeps_the_login(make_config, session, monkeypatch):
+    service = await register_weak(
+        make_config, session, database=DatabaseSettings(unit_of_work=True)
+    )
+
+    async def update(self, _id, data):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(UserRepository, "update", update)
+    token = await service.login(
+        UserLoginSchema(email="a@example.com", password="secret")
+    )
+    assert token.refresh_token
+    assert await service.token_service.token_repository.get_by_refresh_token(
+        token.refresh_token
+    )
+    user = await service.user_repository.get_by_email("a@example.com")
+    assert get_cost(user.hashed_password) == 5
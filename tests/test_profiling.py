@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import time
+from types import FrameType
+
+from backauth.config.setting import ProfilingSettings
+from backauth.profiling import ProfilingMiddleware, _Profile, _Sampler
+
+TOKEN = "let-me-profile"
+
+
+def busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def slow_app(scope, receive, send):
+    busy(0.02)
+    await asyncio.sleep(0.02)
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": b"done"})
+
+
+def http_scope(headers=()) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/users/slow",
+        "headers": list(headers),
+    }
+
+
+async def call(app, scope) -> list[dict]:
+    sent: list[dict] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def test_header_token_writes_a_folded_profile(tmp_path):
+    settings = ProfilingSettings(
+        enabled=True, header_token=TOKEN, output_dir=str(tmp_path)
+    )
+    app = ProfilingMiddleware(slow_app, settings)
+    sent = await call(app, http_scope([(b"x-backauth-profile", TOKEN.encode())]))
+    assert sent[0]["status"] == 201
+
+    [profile] = tmp_path.iterdir()
+    assert profile.name.endswith("-GET-users_slow-201.folded")
+    lines = profile.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("GET /users/slow 201;")
+        assert int(count) > 0
+    assert any("busy" in line for line in lines)
+
+
+async def test_wrong_header_token_is_not_profiled(tmp_path):
+    settings = ProfilingSettings(
+        enabled=True, header_token=TOKEN, output_dir=str(tmp_path)
+    )
+    app = ProfilingMiddleware(slow_app, settings)
+    await call(app, http_scope([(b"x-backauth-profile", b"guess")]))
+    assert not tmp_path.exists() or not list(tmp_path.iterdir())
+
+
+async def test_disabled_passes_the_request_on_untouched(tmp_path):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append((scope, receive, send))
+
+    settings = ProfilingSettings(
+        enabled=False, sample_rate=1.0, header_token=TOKEN, output_dir=str(tmp_path)
+    )
+    middleware = ProfilingMiddleware(app, settings)
+    scope = http_scope([(b"x-backauth-profile", TOKEN.encode())])
+
+    async def receive(): ...
+
+    async def send(message): ...
+
+    await middleware(scope, receive, send)
+    assert calls == [(scope, receive, send)]
+    assert middleware._sampler is None
+    assert not list(tmp_path.iterdir())
+
+
+def finished_frame() -> FrameType:
+    return sys._getframe()
+
+
+def wait_for_samples(profile: _Profile) -> None:
+    deadline = time.monotonic() + 2
+    while not profile.stacks and time.monotonic() < deadline:
+        time.sleep(0.0005)
+
+
+class RacingProfiles(set):
+    """Adds ``arriving`` right after the sampler thread found no profiles."""
+
+    def __init__(self, sampler: _Sampler):
+        super().__init__()
+        self.sampler = sampler
+        self.arriving: list[_Profile] = []
+
+    def __bool__(self) -> bool:
+        empty = not len(self)
+        if empty and self.arriving:
+            self.sampler.add(self.arriving.pop())
+        return not empty
+
+
+def test_sampler_wakes_up_for_a_profile_added_during_its_check():
+    sampler = _Sampler(0.0005)
+    sampler.profiles = RacingProfiles(sampler)
+    # Never on the stack, so every sample counts as awaiting.
+    first, second = _Profile(finished_frame()), _Profile(finished_frame())
+    sampler.add(first)
+    wait_for_samples(first)
+    sampler.profiles.arriving.append(second)
+    sampler.remove(first)
+    wait_for_samples(second)
+    assert first.stacks and second.stacks
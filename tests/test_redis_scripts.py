@@ -0,0 +1,43 @@
+"""Scripts must work on a node whose script cache is empty, e.g. a new
+cluster node, so every test flushes it before calling them."""
+
+import uuid
+
+import pytest
+
+from backauth import TokenService
+from backauth.auth.repository.watermarkrepository import ACCESS, REFRESH
+from tests.conftest import Token
+
+
+@pytest.fixture
+async def service(make_config, session) -> TokenService:
+    service = TokenService(
+        session,
+        Token,
+        make_config(token={"revocation_mode": "watermark", "refresh_mode": "stateless"}),
+    )
+    for client in service.redis.clients:
+        await client.script_flush()
+    return service
+
+
+async def test_watermarks_are_raised_for_every_field(service):
+    subject, before = uuid.uuid4(), service._now_ms()
+    watermarks = service.watermark_repository
+    await watermarks.revoke_subject(subject, before, refresh=True)
+    await watermarks.revoke_subject(subject, before - 1, refresh=True)
+    assert await watermarks.get_watermark(subject, ACCESS) == before
+    assert await watermarks.get_watermark(subject, REFRESH) == before
+
+
+async def test_revoke_by_sub_revokes_every_family(service):
+    families = service.family_repository
+    subject, jtis = uuid.uuid4(), [uuid.uuid4(), uuid.uuid4()]
+    for jti in jtis:
+        await families.create(uuid.uuid4(), subject, jti, 60)
+    await families.create(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), 60)
+
+    assert sorted(await families.revoke_by_sub(subject)) == sorted(map(str, jtis))
+    assert await families.revoke_by_sub(subject) == []
+    assert await families.get_jti_by_sub(subject) == []
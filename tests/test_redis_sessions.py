@@ -0,0 +1,191 @@
+import uuid
+
+import pytest
+from redis.crc import key_slot
+
+from backauth import TokenService
+from backauth.auth.repository import redistokenrepository
+from backauth.config.redis import tag
+from tests.conftest import Token
+
+
+# Prepended to every script: fails the call when a command touches a key that
+# was not passed in KEYS, which Redis Cluster does not allow.
+DECLARED_KEYS_ONLY = """
+redis.unguarded_call = redis.unguarded_call or redis.call
+local call = redis.unguarded_call
+local declared = {}
+for _, key in ipairs(KEYS) do
+    declared[key] = true
+end
+redis.call = function(command, ...)
+    local args = {...}
+    local keys = command == 'DEL' and #args or 1
+    for i = 1, keys do
+        if not declared[args[i]] then
+            error('undeclared key ' .. tostring(args[i]))
+        end
+    end
+    return call(command, ...)
+end
+"""
+
+
+@pytest.fixture
+async def service(make_config, session, monkeypatch) -> TokenService:
+    for name in (
+        "_CREATE_SCRIPT",
+        "_POP_SCRIPT",
+        "_BLOCK_SCRIPT",
+        "_BLOCK_ONE_SCRIPT",
+        "_DELETE_BY_SUB_SCRIPT",
+    ):
+        script = getattr(redistokenrepository, name)
+        monkeypatch.setattr(redistokenrepository, name, DECLARED_KEYS_ONLY + script)
+    configuration = make_config(token={"session_store": "redis"})
+    service = TokenService(session, Token, configuration)
+    for client in service.redis.clients:
+        await client.script_flush()
+    return service
+
+
+async def create(service: TokenService, subject: uuid.UUID) -> tuple[uuid.UUID, str]:
+    jti = uuid.uuid4()
+    payload = {"user_id": str(subject), "scopes": []}
+    return jti, await service.create_refresh_token(jti, payload)
+
+
+async def keys(service: TokenService) -> list[bytes]:
+    return [key for client in service.redis.clients for key in await client.keys()]
+
+
+async def test_every_session_key_shares_the_subject_slot(service):
+    subject = uuid.uuid4()
+    _, refresh_token = await create(service, subject)
+
+    assert refresh_token.startswith(f"{subject}.")
+    found = await keys(service)
+    assert len(found) == 3
+    assert all(tag(subject).encode() in key for key in found)
+    assert {key_slot(key) for key in found} == {key_slot(tag(subject).encode())}
+
+
+async def test_refresh_token_is_single_use(service):
+    subject = uuid.uuid4()
+    jti, refresh_token = await create(service, subject)
+
+    token = await service.token_repository.get_by_refresh_token(refresh_token)
+    assert token is not None and token.id == jti and token.subject == subject
+    popped = await service.pop_refresh_token(refresh_token)
+    assert popped.id == jti and popped.refresh_token == refresh_token
+    with pytest.raises(ValueError):
+        await service.pop_refresh_token(refresh_token)
+    assert await keys(service) == []
+
+
+@pytest.mark.parametrize("refresh_token", ["", "no-subject", ".abc", "abc."])
+async def test_malformed_refresh_token_is_unknown(service, refresh_token):
+    repository = service.token_repository
+    assert await repository.get_by_refresh_token(refresh_token) is None
+    assert await repository.pop_by_refresh_token(refresh_token) is None
+
+
+async def test_full_block_drops_refresh_tokens(service):
+    subject = uuid.uuid4()
+    sessions = [await create(service, subject) for _ in range(2)]
+    _, other = await create(service, uuid.uuid4())
+
+    blocked = await service.token_repository.full_block(subject)
+    assert {token.id for token in blocked} == {jti for jti, _ in sessions}
+    repository = service.token_repository
+    for _, refresh_token in sessions:
+        assert await repository.get_by_refresh_token(refresh_token) is None
+    assert await repository.get_by_refresh_token(other) is not None
+
+
+async def test_full_block_one_drops_its_refresh_token(service):
+    subject = uuid.uuid4()
+    (jti, blocked), (_, kept) = [await create(service, subject) for _ in range(2)]
+    repository = service.token_repository
+
+    assert await repository.full_block_one(subject, jti)
+    assert not await repository.full_block_one(subject, jti)
+    assert await repository.pop_by_refresh_token(blocked) is None
+    assert await repository.pop_by_refresh_token(kept) is not None
+
+
+async def test_delete_by_sub_removes_every_key(service):
+    subject = uuid.uuid4()
+    for _ in range(2):
+        await create(service, subject)
+    _, other = await create(service, uuid.uuid4())
+
+    await service.token_repository.delete_by_sub(subject)
+    assert not any(tag(subject).encode() in key for key in await keys(service))
+    assert await service.token_repository.get_by_refresh_token(other) is not None
+
+
+async def test_evicted_sessions_lose_their_refresh_token(service):
+    service.conf.token.max_sessions_per_subject = 1
+    subject = uuid.uuid4()
+    _, evicted = await create(service, subject)
+    _, kept = await create(service, subject)
+
+    assert await service.token_repository.get_by_refresh_token(evicted) is None
+    assert await service.token_repository.get_by_refresh_token(kept) is not None
+    found = [key for key in await keys(service) if tag(subject).encode() in key]
+    assert len(found) == 3
+
+
+async def test_rotation_keeps_the_subject_prefix(service):
+    subject = uuid.uuid4()
+    _, refresh_token = await create(service, subject)
+    entity = await service.pop_refresh_token(refresh_token)
+    token = await service.create_access_token_by_refresh(
+        entity, {"user_id": str(subject), "scopes": []}
+    )
+    assert token.refresh_token.startswith(f"{subject}.")
+    assert await service.token_repository.get_by_refresh_token(token.refresh_token)
+
+
+async def test_page_by_sub_skips_no_live_session_behind_expired_ones(service):
+    subject, repository = uuid.uuid4(), service.token_repository
+    ids = [uuid.uuid4() for _ in range(8)]
+    for issued_at, _id in enumerate(ids, start=1):
+        await repository.create(
+            {
+                "id": _id,
+                "subject": subject,
+                "refresh_token": repository.new_refresh_token(subject),
+                "expires_at": 2**31 - 1,
+                "issued_at": issued_at,
+            }
+        )
+    # The three newest sessions expire and fill most of the first chunk.
+    for _id in ids[-3:]:
+        key = repository._session_key(subject, _id)
+        await repository.redis.for_key(key).delete(key)
+
+    page = await repository.get_page_by_sub(subject, now=0, limit=2)
+    assert [token.id for token in page] == [ids[4], ids[3]]
+    after = (page[-1].issued_at, page[-1].id)
+    page = await repository.get_page_by_sub(subject, now=0, limit=2, after=after)
+    assert [token.id for token in page] == [ids[2], ids[1]]
+    assert len(await repository.get_by_sub(subject)) == 5
+
+
+async def test_scripts_retry_when_a_session_is_added_meanwhile(service, monkeypatch):
+    subject, repository = uuid.uuid4(), service.token_repository
+    first, _ = await create(service, subject)
+    known_sessions = repository._known_sessions
+    added: list[uuid.UUID] = []
+
+    async def read_then_add(sub):
+        known = await known_sessions(sub)
+        if not added:
+            added.append((await create(service, subject))[0])
+        return known
+
+    monkeypatch.setattr(repository, "_known_sessions", read_then_add)
+    blocked = await repository.full_block(subject)
+    assert {token.id for token in blocked} == {first, *added}
@@ -0,0 +1,43 @@
+import random
+import uuid
+
+import pytest
+
+from backauth import TokenService
+from tests.conftest import Token
+
+
+@pytest.fixture
+def stateless(make_config, session) -> TokenService:
+    return TokenService(
+        session, Token, make_config(token={"refresh_mode": "stateless"})
+    )
+
+
+async def test_authenticate_rejects_stateless_refresh_tokens(stateless):
+    payload = {"user_id": str(uuid.uuid4()), "scopes": []}
+    refresh_token = await stateless.create_refresh_token(uuid.uuid4(), payload)
+    assert await stateless.authenticate(refresh_token) is None
+    assert not await stateless.validate_token(refresh_token)
+
+
+async def test_replayed_refresh_token_blacklists_current_access_token(stateless):
+    payload = {"user_id": str(uuid.uuid4()), "scopes": []}
+    refresh_token = await stateless.create_refresh_token(uuid.uuid4(), payload)
+    claims = await stateless.rotate_stateless_refresh_token(refresh_token)
+    tokens = await stateless.create_access_token_by_stateless_refresh(claims, payload)
+    assert await stateless.authenticate(tokens.access_token) is not None
+
+    with pytest.raises(ValueError):
+        await stateless.rotate_stateless_refresh_token(refresh_token)
+    assert await stateless.authenticate(tokens.access_token) is None
+    with pytest.raises(ValueError):
+        await stateless.rotate_stateless_refresh_token(tokens.refresh_token)
+
+
+def test_refresh_tokens_come_from_the_system_csprng(monkeypatch):
+    monkeypatch.setattr(random, "choices", None)
+    monkeypatch.setattr(random, "choice", None)
+    token = TokenService.generate_random_string()
+    assert len(token) == 128 and token.isalnum()
+    assert token != TokenService.generate_random_string()
@@ -0,0 +1,49 @@
+import uuid
+
+from backauth import database
+from backauth.auth.repository.tokenrepository import TokenRepository
+from backauth.user.repository import UserRepository
+from tests.conftest import Token, User
+
+
+async def test_cached_user_statements_bind_each_call(session):
+    repository = UserRepository(session, User)
+    session.add_all(
+        [
+            User(email="a@example.com", username="a"),
+            User(email="b@example.com", username="b"),
+        ]
+    )
+    await session.commit()
+
+    first = await repository.get_by_email("a@example.com")
+    cached = database._statements[(User, "get_by_email")]
+    second = await repository.get_by_email("b@example.com")
+    assert database._statements[(User, "get_by_email")] is cached
+    assert (first.username, second.username) == ("a", "b")
+    assert await repository.get_by_email("c@example.com") is None
+
+    users = await repository.get_by_email_or_username("a@example.com", "b")
+    assert sorted(user.username for user in users) == ["a", "b"]
+    assert await repository.get_by_email_or_username("c@example.com", "c") == []
+
+
+async def test_cached_token_statements_bind_each_call(session):
+    repository = TokenRepository(session, Token)
+    subjects = [uuid.uuid4(), uuid.uuid4()]
+    for subject, refresh_token in zip(subjects, ["first", "second"]):
+        await repository.create(
+            {
+                "id": uuid.uuid4(),
+                "subject": subject,
+                "refresh_token": refresh_token,
+                "expires_at": 2**31 - 1,
+            }
+        )
+
+    for subject, refresh_token in zip(subjects, ["first", "second"]):
+        token = await repository.get_by_refresh_token(refresh_token)
+        assert token.subject == subject
+        assert [
+            token.refresh_token for token in await repository.get_by_sub(subject)
+        ] == [refresh_token]
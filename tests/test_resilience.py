@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backauth.auth.service.resilience import CircuitBreaker, call_with_retry
+from backauth.error.exception import ProviderUnavailable
+
+
+def client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://provider"
+    )
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("provider", threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    return breaker
+
+
+async def test_retries_server_errors_then_succeeds():
+    statuses = iter([503, 502, 200])
+    breaker = CircuitBreaker("provider", threshold=5, reset_seconds=30)
+    async with client(lambda request: httpx.Response(next(statuses))) as http:
+        response = await call_with_retry(lambda: http.get("/"), breaker, 2, 0)
+    assert response.status_code == 200
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+async def test_transport_errors_open_the_breaker():
+    def fail(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("down", request=request)
+
+    breaker = CircuitBreaker("provider", threshold=1, reset_seconds=30)
+    async with client(fail) as http:
+        with pytest.raises(httpx.ConnectError):
+            await call_with_retry(lambda: http.get("/"), breaker, 1, 0)
+        with pytest.raises(ProviderUnavailable):
+            await call_with_retry(lambda: http.get("/"), breaker, 1, 0)
+    assert breaker.state == "open"
+
+
+async def test_unexpected_error_ends_the_half_open_trial():
+    def fail(request: httpx.Request) -> httpx.Response:
+        raise ValueError("malformed")
+
+    breaker = open_breaker()
+    async with client(fail) as http:
+        with pytest.raises(ValueError):
+            await call_with_retry(lambda: http.get("/"), breaker, 0, 0)
+    assert not breaker.trial_running
+    assert breaker.state == "half-open"
+
+
+async def test_cancelled_trial_lets_the_next_call_through():
+    started = asyncio.Event()
+
+    async def hang(request: httpx.Request) -> httpx.Response:
+        started.set()
+        await asyncio.sleep(60)
+        return httpx.Response(200)
+
+    breaker = open_breaker()
+    async with client(hang) as http:
+        task = asyncio.create_task(
+            call_with_retry(lambda: http.get("/"), breaker, 0, 0)
+        )
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert not breaker.trial_running
+
+    async with client(lambda request: httpx.Response(200)) as http:
+        response = await call_with_retry(lambda: http.get("/"), breaker, 0, 0)
+    assert response.status_code == 200
+    assert breaker.state == "closed"
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backauth import TokenService
+from backauth.auth.revocation import RevocationClient, RevocationSet
+from backauth.auth.router import revocation_router
+from backauth.config.setting import RevocationStreamSettings
+from tests.conftest import Token
+
+
+@pytest.fixture
+def service(make_config, session) -> TokenService:
+    configuration = make_config(
+        revocation_stream=RevocationStreamSettings(enabled=True, block_ms=10)
+    )
+    return TokenService(session, Token, configuration)
+
+
+def parse(body: str) -> list[dict[str, str]]:
+    """Splits a server-sent event body into events with their fields."""
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines() if ": " in line
+        )
+        if "data" in fields:
+            events.append(fields)
+    return events
+
+
+async def stream(app: FastAPI, count: int, headers=(), query: bytes = b"") -> str:
+    """Reads ``/auth/revocations`` until ``count`` events came, then disconnects."""
+    body: list[str] = []
+    done = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b"").decode())
+            if len(parse("".join(body))) >= count:
+                done.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/auth/revocations",
+        "raw_path": b"/auth/revocations",
+        "query_string": query,
+        "root_path": "",
+        "headers": [(b"host", b"test"), *headers],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    return "".join(body)
+
+
+async def publish(service: TokenService) -> tuple[list[str], uuid.UUID]:
+    jtis = [str(uuid.uuid4()), str(uuid.uuid4())]
+    subject = uuid.uuid4()
+    await service._blacklist(jtis)
+    await service._revoke_subject(subject)
+    return jtis, subject
+
+
+def app_for(service: TokenService) -> FastAPI:
+    app = FastAPI()
+    app.include_router(revocation_router(service.conf))
+    return app
+
+
+async def test_published_revocations_stream_in_order(service):
+    jtis, subject = await publish(service)
+    events = parse(await stream(app_for(service), 3))
+
+    data = [json.loads(event["data"]) for event in events]
+    assert [(item["type"], item.get("jti")) for item in data] == [
+        ("jti", jtis[0]),
+        ("jti", jtis[1]),
+        ("watermark", None),
+    ]
+    assert (data[2]["key"], data[2]["field"]) == (str(subject), "access")
+    assert all(event["event"] == "revoke" for event in events)
+    assert len({event["id"] for event in events}) == 3
+
+
+async def test_last_event_id_resumes_after_it(service):
+    await publish(service)
+    app = app_for(service)
+    first, *rest = parse(await stream(app, 3))
+
+    resumed = parse(
+        await stream(app, 2, headers=[(b"last-event-id", first["id"].encode())])
+    )
+    assert [event["id"] for event in resumed] == [event["id"] for event in rest]
+
+    query = f"after={rest[0]['id']}".encode()
+    assert [event["id"] for event in parse(await stream(app, 1, query=query))] == [
+        rest[1]["id"]
+    ]
+
+
+async def test_invalid_last_event_id_is_rejected(service):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app_for(service)), base_url="http://test"
+    ) as http:
+        response = await http.get(
+            "/auth/revocations", headers={"Last-Event-ID": "nonsense"}
+        )
+    assert response.status_code == 400
+
+
+async def test_client_follows_the_stream_into_its_set(service):
+    jtis, subject = await publish(service)
+    body = await stream(app_for(service), 3)
+    seen_headers: list[httpx.Headers] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(request.headers)
+        return httpx.Response(
+            200, text=body, headers={"Content-Type": "text/event-stream"}
+        )
+
+    revocations = RevocationSet()
+    client = RevocationClient(
+        "http://test/auth/revocations", revocations, headers={"X-Service": "api"}
+    )
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as http:
+        await client._follow(http)
+        await client._follow(http)
+
+    assert set(revocations.jtis) == set(jtis)
+    [(key, (before, _))] = revocations.watermarks.items()
+    assert key == (str(subject), "access")
+    claims = {"jti": str(uuid.uuid4()), "user_id": str(subject)}
+    assert revocations.is_revoked({**claims, "iat": before // 1000 - 1})
+    assert client.retry_seconds == 1.0
+    last_id = parse(body)[-1]["id"]
+    assert client.last_event_id == last_id
+    assert "last-event-id" not in seen_headers[0]
+    assert seen_headers[1]["last-event-id"] == last_id
+    assert seen_headers[1]["x-service"] == "api"
+    assert seen_headers[1]["accept"] == "text/event-stream"
+
+
+async def test_client_raises_on_error_status():
+    def handle(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    client = RevocationClient("http://test/auth/revocations")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as http:
+        with pytest.raises(httpx.HTTPStatusError):
+            await client._follow(http)
+    assert len(client.revocations) == 0
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import uuid
+from typing import AsyncIterator
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backauth import TokenService
+from backauth.config.setting import TokenSettings
+from tests.conftest import Base, Token
+
+
+@pytest.mark.parametrize("store", ["sql", "redis"])
+async def test_session_cap_evicts_the_oldest_sessions(make_config, session, store):
+    service = TokenService(
+        session,
+        Token,
+        make_config(token={"session_store": store, "max_sessions_per_subject": 2}),
+    )
+    subject = uuid.uuid4()
+    payload = {"user_id": str(subject), "scopes": []}
+    jtis = [uuid.uuid4() for _ in range(3)]
+    access_tokens = []
+    for issued_at, jti in enumerate(jtis):
+        access_tokens.append(service.create_access_token(payload, jti=jti))
+        await service.create_refresh_token(jti, payload)
+        # Sessions created within one second would tie on issued_at.
+        if store == "sql":
+            token = await session.get(Token, jti)
+            token.issued_at = issued_at
+            await session.commit()
+        else:
+            key = service.token_repository._subject_key(subject)
+            await service.redis.for_key(key).zadd(key, {str(jti): issued_at})
+
+    sessions = await service.token_repository.get_by_sub(subject)
+    assert {token.id for token in sessions} == set(jtis[1:])
+    assert await service.authenticate(access_tokens[0]) is None
+    assert await service.authenticate(access_tokens[2]) is not None
+
+
+def test_session_cap_must_be_positive():
+    with pytest.raises(ValidationError):
+        TokenSettings(max_sessions_per_subject=0)
+
+
+@pytest.fixture(
+    params=[
+        "sqlite",
+        pytest.param(
+            "postgresql",
+            marks=pytest.mark.skipif(
+                not os.environ.get("TEST_POSTGRES_URL"),
+                reason="TEST_POSTGRES_URL is not set",
+            ),
+        ),
+    ]
+)
+async def session_factory(request, tmp_path) -> AsyncIterator[async_sessionmaker]:
+    if request.param == "sqlite":
+        url = f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}"
+    else:
+        url = os.environ["TEST_POSTGRES_URL"]
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def test_session_cap_holds_under_concurrent_logins(make_config, session_factory):
+    configuration = make_config(token={"max_sessions_per_subject": 2})
+    subject = uuid.uuid4()
+
+    async def login() -> None:
+        async with session_factory() as session:
+            service = TokenService(session, Token, configuration)
+            payload = {"user_id": str(subject), "scopes": []}
+            await service.create_refresh_token(uuid.uuid4(), payload)
+
+    await asyncio.gather(*(login() for _ in range(10)))
+    async with session_factory() as session:
+        repository = TokenService(session, Token, configuration).token_repository
+        assert len(await repository.get_by_sub(subject)) == 2
@@ -0,0 +1,137 @@
+from functools import partial
+
+import httpx
+import pytest
+
+from backauth import UserService, tracing
+from backauth.auth.service import resilience
+from backauth.auth.service.auth_service import AuthService
+from backauth.config.setting import GithubOAuth, TracingSettings
+from backauth.tracing import InMemoryExporter, Span
+from backauth.user.schema import UserLoginSchema, UserRegisterSchema
+from tests.conftest import Token, User
+
+PASSWORD = "correct horse battery staple"
+CODE = "single-use-oauth-code"
+PROVIDER_TOKEN = "gho_provider_access_token"
+
+
+@pytest.fixture
+def traced_config(make_config, monkeypatch):
+    """Builds configs with ``tracing.exporter`` set to memory.
+
+    The services set tracing up from their config; it is turned off again
+    after the test.
+    """
+    monkeypatch.setattr(tracing, "_settings", None)
+    yield partial(make_config, tracing=TracingSettings(exporter="memory"))
+    tracing.configure(None)
+
+
+def memory_exporter() -> InMemoryExporter:
+    exporter = tracing.get_exporter()
+    assert isinstance(exporter, InMemoryExporter)
+    exporter.clear()
+    return exporter
+
+
+def children(spans: list[Span], parent: Span) -> list[str]:
+    return [span.name for span in spans if span.parent_id == parent.span_id]
+
+
+def by_name(spans: list[Span], name: str) -> Span:
+    return next(span for span in spans if span.name == name)
+
+
+def assert_no_secrets(spans: list[Span], *secrets: str) -> None:
+    for span in spans:
+        values = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        for secret in secrets:
+            assert secret not in values, (span.name, secret)
+
+
+async def login(traced_config, session, **settings):
+    service = UserService(session, User, Token, traced_config(token=settings))
+    await service.register(
+        UserRegisterSchema(
+            email="a@example.com",
+            username="a",
+            password=PASSWORD,
+            confirm_password=PASSWORD,
+        )
+    )
+    exporter = memory_exporter()
+    token = await service.login(
+        UserLoginSchema(email="a@example.com", password=PASSWORD)
+    )
+    return token, exporter.spans
+
+
+async def test_login_span_tree(traced_config, session):
+    token, spans = await login(traced_config, session)
+    root = by_name(spans, "UserService.login")
+    assert root.parent_id is None
+    assert {span.trace_id for span in spans} == {root.trace_id}
+    assert children(spans, root) == [
+        "UserRepository.get_by_email",
+        "bcrypt.verify",
+        "jwt.sign",
+        "TokenRepository.create",
+    ]
+    assert_no_secrets(spans, PASSWORD, token.access_token, token.refresh_token)
+
+
+async def test_login_redis_spans_nest_under_the_repository(traced_config, session):
+    token, spans = await login(traced_config, session, session_store="redis")
+    root = by_name(spans, "UserService.login")
+    repository = by_name(spans, "RedisTokenRepository.create")
+    assert repository.parent_id == root.span_id
+    redis_spans = [span for span in spans if span.name.startswith("redis ")]
+    assert redis_spans
+    for span in redis_spans:
+        assert span.parent_id == repository.span_id
+        assert span.attributes["db.system"] == "redis"
+    assert_no_secrets(spans, PASSWORD, token.access_token, token.refresh_token)
+
+
+async def test_oauth_spans_keep_the_code_and_tokens_out(
+    traced_config, session, monkeypatch
+):
+    def handle(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/login/oauth/access_token":
+            return httpx.Response(
+                200,
+                json={
+                    "access_token": PROVIDER_TOKEN,
+                    "scope": "read:user",
+                    "token_type": "bearer",
+                },
+            )
+        if request.url.path == "/user":
+            return httpx.Response(
+                200, json={"login": "a", "email": "a@example.com", "name": None}
+            )
+        return httpx.Response(404)
+
+    monkeypatch.setattr(AuthService, "transport", httpx.MockTransport(handle))
+    monkeypatch.setattr(resilience, "_breakers", {})
+    github = GithubOAuth(client_id="id", client_secret="secret", enabled=True)
+    service = UserService(session, User, Token, traced_config(github=github))
+    state = service.token_service.create_state_token(
+        {"service": "github", "redirect_url": "http://localhost"}
+    )
+    exporter = memory_exporter()
+    _, token = await service.create_user_from_oauth(CODE, state)
+
+    spans = exporter.spans
+    assert by_name(spans, "UserService.create_user_from_oauth").parent_id is None
+    assert [span.attributes["http.url"] for span in spans if span.name == "http GET"]
+    assert_no_secrets(
+        spans,
+        CODE,
+        state,
+        PROVIDER_TOKEN,
+        "secret",
+        token.access_token,
+        token.refresh_token,
+    )
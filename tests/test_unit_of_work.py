@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy import event
+
+from backauth import TokenService, UserService
+from backauth.config.setting import DatabaseSettings
+from backauth.database import after_commit, unit_of_work
+from backauth.user.repository import UserRepository
+from backauth.user.schema import UserLoginSchema, UserRegisterSchema, UserUpdateSchema
+from tests.conftest import Token, User
+
+
+@pytest.fixture
+def events(session) -> list[str]:
+    """Records every commit of ``session`` in order with other test events."""
+    recorded: list[str] = []
+    event.listen(
+        session.sync_session, "after_commit", lambda _: recorded.append("commit")
+    )
+    return recorded
+
+
+@pytest.fixture
+async def service(make_config, session) -> UserService:
+    configuration = make_config(database=DatabaseSettings(unit_of_work=True))
+    service = UserService(session, User, Token, configuration)
+    await service.register(
+        UserRegisterSchema(
+            email="a@example.com",
+            username="a",
+            password="secret",
+            confirm_password="secret",
+        )
+    )
+    return service
+
+
+async def login(service: UserService):
+    return await service.login(
+        UserLoginSchema(email="a@example.com", password="secret")
+    )
+
+
+async def test_update_user_commits_once_then_revokes(service, events, monkeypatch):
+    await login(service)
+    user = await service.user_repository.get_by_email("a@example.com")
+
+    async def blacklist(self, jtis):
+        events.append("blacklist")
+
+    monkeypatch.setattr(TokenService, "_blacklist", blacklist)
+    events.clear()
+    await service.update_user(
+        user.id,
+        UserUpdateSchema(username=None, email=None, first_name="A", last_name=None),
+    )
+    assert events == ["commit", "blacklist"]
+
+
+async def test_refresh_rotation_commits_once(service, events):
+    token = await login(service)
+    events.clear()
+    rotated = await service.get_token_by_refresh(token.refresh_token)
+    assert events == ["commit"]
+    assert await service.token_service.token_repository.get_by_refresh_token(
+        rotated.refresh_token
+    )
+    assert not await service.token_service.token_repository.get_by_refresh_token(
+        token.refresh_token
+    )
+
+
+async def test_callbacks_run_only_after_the_commit(session, events):
+    async def callback():
+        events.append("callback")
+
+    async with unit_of_work(session):
+        session.add(User(email="b@example.com", username="b"))
+        await after_commit(session, callback)
+        await after_commit(session, callback)
+        assert events == []
+    assert events == ["commit", "callback", "callback"]
+
+
+async def test_failed_commit_drops_the_callbacks(session, events, monkeypatch):
+    async def callback():
+        events.append("callback")
+
+    async def commit():
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(session, "commit", commit)
+    with pytest.raises(RuntimeError, match="commit failed"):
+        async with unit_of_work(session):
+            await after_commit(session, callback)
+    assert events == []
+
+
+async def test_rollback_drops_the_callbacks_and_the_writes(session, events):
+    async def callback():
+        events.append("callback")
+
+    with pytest.raises(ValueError):
+        async with unit_of_work(session):
+            session.add(User(email="b@example.com", username="b"))
+            await session.flush()
+            await after_commit(session, callback)
+            raise ValueError
+    async with unit_of_work(session):
+        pass
+    assert events == ["commit"]
+    assert await UserRepository(session, User).get_by_email("b@example.com") is None
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backauth import (
+    TokenService,
+    UserRegisterSchema,
+    UserResponseSchema,
+    UserUpdateSchema,
+    users_router,
+)
+from tests.conftest import Base, Token, User
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    # A file database gets a real connection pool, so leaks show up.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+def make_client(engine, configuration) -> httpx.AsyncClient:
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_session():
+        async with factory() as session:
+            yield session
+
+    async def allow() -> None:
+        return None
+
+    router = users_router(
+        get_session,
+        Token,
+        User,
+        UserResponseSchema,
+        UserUpdateSchema,
+        UserRegisterSchema,
+        {"is_authenticated": allow, "update_delete_get": allow, "is_admin": allow},
+        configuration,
+    )
+    app = FastAPI()
+    app.include_router(router)
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+@pytest.fixture
+def client(engine, make_config) -> httpx.AsyncClient:
+    return make_client(engine, make_config())
+
+
+async def add_users(engine, count: int) -> None:
+    async with async_sessionmaker(engine)() as session:
+        session.add_all(
+            User(email=f"user{i}@example.com", username=f"user{i}")
+            for i in range(count)
+        )
+        await session.commit()
+
+
+async def test_export_streams_on_its_own_session(engine, client):
+    await add_users(engine, 3)
+    async with client as http:
+        response = await http.get("/users/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["username"] for row in rows) == ["user0", "user1", "user2"]
+    assert engine.sync_engine.pool.checkedout() == 0
+
+
+async def test_import_reads_the_streamed_body(engine, client):
+    body = (
+        "email,username,first_name\n"
+        'a@example.com,a,"Ann\r\nMarie"\r\n'
+        "b@example.com\n"
+        "c@example.com,c,\n"
+    )
+    async with client as http:
+        response = await http.post("/users/import?format=csv", content=body)
+    assert response.status_code == 200
+    assert response.json() == {
+        "inserted": 2,
+        "errors": [{"line": 4, "error": "Expected 3 columns, got 1"}],
+    }
+    async with async_sessionmaker(engine)() as session:
+        user = await session.scalar(select(User).where(User.username == "a"))
+    assert user.first_name == "Ann\nMarie"
+
+
+async def test_export_writes_csv(engine, client):
+    await add_users(engine, 2)
+    async with client as http:
+        response = await http.get("/users/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted(row["email"] for row in rows) == [
+        "user0@example.com",
+        "user1@example.com",
+    ]
+
+
+@pytest.mark.parametrize("profile", ["minimal", "standard", "full"])
+async def test_me_returns_every_field_for_any_claim_profile(
+    engine, make_config, profile
+):
+    configuration = make_config(token={"claim_profile": profile})
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        user = User(email="a@example.com", username="a", first_name="Ann")
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        service = TokenService(session, Token, configuration)
+        token = service.create_access_token(await service.get_payload(user))
+        state = service.create_state_token(await service.get_payload(user))
+
+    async with make_client(engine, configuration) as http:
+        response = await http.get(
+            "/users/@me", headers={"Authorization": f"Bearer {token}"}
+        )
+        rejected = await http.get(
+            "/users/@me", headers={"Authorization": f"Bearer {state}"}
+        )
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": str(user.id),
+        "username": "a",
+        "email": "a@example.com",
+        "first_name": "Ann",
+        "last_name": None,
+        "scopes": [],
+    }
+    assert rejected.status_code == 401
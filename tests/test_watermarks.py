@@ -0,0 +1,74 @@
+import uuid
+from datetime import UTC, datetime
+
+import pytest
+
+from backauth import TokenService
+from backauth.auth.revocation import RevocationSet
+from tests.conftest import Token
+
+
+@pytest.fixture
+def service(make_config, session) -> TokenService:
+    return TokenService(
+        session, Token, make_config(token={"revocation_mode": "watermark"})
+    )
+
+
+def payload(subject: str) -> dict:
+    return {"user_id": subject, "scopes": ["admin"]}
+
+
+def watermark_event(subject: str, before: int, expires_at: int) -> dict:
+    return {
+        "type": "watermark",
+        "key": subject,
+        "field": "access",
+        "before": before,
+        "exp": expires_at,
+    }
+
+
+def freeze(monkeypatch: pytest.MonkeyPatch, milliseconds: int) -> None:
+    monkeypatch.setattr(TokenService, "_now_ms", staticmethod(lambda: milliseconds))
+
+
+async def test_revocation_covers_tokens_issued_before_it(service):
+    subject = str(uuid.uuid4())
+    token = service.create_access_token(payload(subject), jti=uuid.uuid4())
+    await service._revoke_subject(subject)
+    assert await service.authenticate(token) is None
+
+
+async def test_token_issued_later_in_the_same_second_is_accepted(service, monkeypatch):
+    subject = str(uuid.uuid4())
+    now = int(datetime.now(UTC).timestamp() * 1000)
+    freeze(monkeypatch, now - 1)
+    await service._revoke_subject(subject)
+    await service.revoke_scope("admin")
+    token = service.create_access_token(payload(subject), jti=uuid.uuid4())
+    claims = await service.authenticate(token)
+    assert claims is not None
+
+    revocations = RevocationSet()
+    revocations.apply(watermark_event(subject, now - 1, claims["exp"]))
+    assert not revocations.is_revoked(claims)
+    del claims["iat_ms"]
+    revocations.apply(watermark_event(subject, claims["iat"] * 1000, claims["exp"]))
+    assert revocations.is_revoked(claims)
+
+
+async def test_revoke_all_with_a_timestamp_covers_that_whole_second(service):
+    token = service.create_access_token(payload(str(uuid.uuid4())), jti=uuid.uuid4())
+    await service.revoke_all(int(datetime.now(UTC).timestamp()))
+    assert await service.authenticate(token) is None
+
+
+async def test_second_resolution_watermarks_are_still_honoured(service, redis_server):
+    subject = str(uuid.uuid4())
+    token = service.create_access_token(payload(subject), jti=uuid.uuid4())
+    key = service.watermark_repository._subject_key(subject)
+    await service.redis.for_key(key).hset(
+        key, "access", int(datetime.now(UTC).timestamp())
+    )
+    assert await service.authenticate(token) is None